@@ -1,16 +1,22 @@
 import json
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 
-from .models import User, Brand, Product, ListImg, Variant, Order, OrderDetail, Comment, Discount, Cart, CartItem
+from . import bulk_edit
+from .admin_utils import AutocompleteFilter, ScalableChangeListMixin
+from .models import User, Brand, Product, ListImg, Variant, Order, OrderDetail, Comment, Discount, Cart, CartItem, \
+    CustomerRFM, CohortRetention, ArchivedOrder, ArchivedOrderDetail, ImageUpload
 
 
 # Inline cho Variant và ListImg trong Product
 class VariantInline(admin.TabularInline):
     model = Variant
     extra = 1  # Số dòng trống khi thêm mới
+    readonly_fields = ('StockShards',)  # Đổi bằng lệnh shard_stock
 
 
 class ListImgInline(admin.TabularInline):
@@ -21,6 +27,7 @@ class ListImgInline(admin.TabularInline):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('id', 'Name', 'Brand', 'created_date', 'update_date')
+    list_select_related = ('Brand',)
     search_fields = ('Name', 'Brand__Name')
     list_filter = ('Brand', 'created_date')
     autocomplete_fields = ['Brand']
@@ -34,8 +41,9 @@ class CartItemInline(admin.TabularInline):
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'User', 'created_date', 'update_date')
+    list_select_related = ('User',)
     search_fields = ('User__username',)
     list_filter = ('created_date',)
     inlines = [CartItemInline]  # Inline CartItem vào Cart
@@ -48,11 +56,14 @@ class OrderDetailInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'User', 'Discount', 'ShipAddress', 'ShipDate', 'created_date')
+class OrderAdmin(ScalableChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'User', 'Discount', 'ShipAddress', 'ShipDate', 'Total', 'ItemCount', 'Status',
+                    'created_date')
+    list_select_related = ('User', 'Discount')
     search_fields = ('User__username', 'ShipAddress', 'Discount__Code')
-    list_filter = ('created_date',)
+    list_filter = (('User', AutocompleteFilter), 'created_date')
     autocomplete_fields = ['User', 'Discount']
+    readonly_fields = ('Total', 'ItemCount', 'Status')
     inlines = [OrderDetailInline]  # Inline OrderDetail vào Order
 
 
@@ -103,10 +114,11 @@ class BrandAdmin(admin.ModelAdmin):
 
 # Comment Admin
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'User', 'Variant', 'Star', 'created_date')
+    list_select_related = ('User', 'Variant')
     search_fields = ('User__username', 'Variant__SKU')
-    list_filter = ('Star', 'created_date')
+    list_filter = (('Variant', AutocompleteFilter), 'Star', 'created_date')
     autocomplete_fields = ['User', 'Variant']
 
 
@@ -120,24 +132,135 @@ class DiscountAdmin(admin.ModelAdmin):
 
 # CartItem Admin (nếu cần)
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'Cart', 'Variant', 'Quantity', 'created_date', 'update_date')
+    # CartItem.__str__ dùng cả Variant.SKU và Cart, Cart.__str__ dùng User.username
+    list_select_related = ('Cart__User', 'Variant')
     search_fields = ('Cart__User__username', 'Variant__SKU')
-    list_filter = ('created_date',)
+    list_filter = (('Variant', AutocompleteFilter), 'created_date')
 
 
 # OrderDetail Admin
 @admin.register(OrderDetail)
-class OrderDetailAdmin(admin.ModelAdmin):
+class OrderDetailAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'Order', 'Variant', 'Quantity', 'Price', 'Status', 'created_date')
+    list_select_related = ('Order', 'Variant')
     search_fields = ('Order__id', 'Variant__SKU')
-    list_filter = ('Status', 'created_date')
+    list_filter = (('Variant', AutocompleteFilter), 'Status', 'created_date')
     autocomplete_fields = ['Order', 'Variant']
 
 
+class BulkEditActionForm(ActionForm):
+    # Các ô hiện cạnh danh sách action của VariantAdmin, dùng cho action apply_bulk_edit
+    operation = forms.ChoiceField(required=False, choices=[
+        ('', '---------'),
+        ('price_percent', 'Giá: tăng/giảm %'),
+        ('price_absolute', 'Giá: cộng/trừ số tiền'),
+        ('stock_set', 'Tồn kho: đặt bằng'),
+        ('stock_adjust', 'Tồn kho: cộng/trừ'),
+    ])
+    field = forms.ChoiceField(required=False, choices=[(name, name) for name in bulk_edit.PRICE_FIELDS])
+    value = forms.FloatField(required=False)
+    dry_run = forms.BooleanField(required=False, initial=True, label='Xem trước')
+
+
 @admin.register(Variant)
-class VariantAdmin(admin.ModelAdmin):
+class VariantAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'Product', 'SKU', 'Memory', 'Color', 'Quantity', 'Price', 'created_date')
+    list_select_related = ('Product',)
     search_fields = ('Product__Name', 'SKU', 'Color')
-    list_filter = ('Product', 'Memory', 'Color', 'created_date')
+    list_filter = (('Product', AutocompleteFilter), 'Memory', 'Color', 'created_date')
     autocomplete_fields = ['Product']
+    readonly_fields = ('StockShards',)  # Đổi bằng lệnh shard_stock
+    action_form = BulkEditActionForm
+    actions = ['apply_bulk_edit']
+
+    @admin.action(description="Sửa giá/tồn kho hàng loạt các variant đã chọn", permissions=['change'])
+    def apply_bulk_edit(self, request, queryset):
+        form = BulkEditActionForm(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid() or not form.cleaned_data['operation'] or form.cleaned_data['value'] is None:
+            self.message_user(request, "Chọn thao tác và nhập giá trị.", messages.ERROR)
+            return
+        data = form.cleaned_data
+        target, mode = data['operation'].split('_')
+        if target == 'price':
+            result = bulk_edit.reprice(queryset, data['field'] or 'Price', mode, data['value'],
+                                       dry_run=data['dry_run'])
+        else:
+            result = bulk_edit.adjust_stock(queryset, mode, int(data['value']), dry_run=data['dry_run'])
+        if data['dry_run']:
+            sample = ', '.join(f"{row['SKU']}: {row['old']} → {row['new']}" for row in result['preview'][:10])
+            self.message_user(request, f"Xem trước {result['matched']} variant (chưa ghi): {sample}", messages.INFO)
+        else:
+            self.message_user(request, f"Đã cập nhật {result['updated']} variant.", messages.SUCCESS)
+
+
+class ComputedSummaryAdmin(admin.ModelAdmin):
+    """Bảng do job ghi lại (build_customer_analytics, apply_retention, process_image_uploads), staff chỉ được xem."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CustomerRFM)
+class CustomerRFMAdmin(ScalableChangeListMixin, ComputedSummaryAdmin):
+    list_display = ('User', 'RScore', 'FScore', 'MScore', 'Recency', 'Frequency', 'Monetary', 'LastOrderDate',
+                    'ComputedAt')
+    list_select_related = ('User',)
+    search_fields = ('User__username',)
+    list_filter = ('RScore', 'FScore', 'MScore')
+    ordering = ('-MScore', '-FScore', '-RScore')
+
+
+@admin.register(CohortRetention)
+class CohortRetentionAdmin(ComputedSummaryAdmin):
+    list_display = ('Cohort', 'MonthOffset', 'Customers', 'CohortSize', 'retention', 'ComputedAt')
+    list_filter = ('Cohort',)
+    ordering = ('-Cohort', 'MonthOffset')
+
+    @admin.display(description='Retention')
+    def retention(self, obj):
+        return f"{obj.Retention:.1%}"
+
+
+class ArchivedOrderDetailInline(admin.TabularInline):
+    model = ArchivedOrderDetail
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ScalableChangeListMixin, ComputedSummaryAdmin):
+    list_display = ('id', 'User', 'ShipDate', 'Total', 'ItemCount', 'Status', 'created_date', 'ArchivedAt')
+    list_select_related = ('User',)
+    search_fields = ('=id', 'User__username')
+    list_filter = (('User', AutocompleteFilter), 'created_date')
+    inlines = [ArchivedOrderDetailInline]
+
+
+@admin.register(ImageUpload)
+class ImageUploadAdmin(ScalableChangeListMixin, ComputedSummaryAdmin):
+    list_display = ('id', 'Model', 'ObjectId', 'Status', 'Attempts', 'NextAttemptAt', 'LastError', 'update_date')
+    search_fields = ('=ObjectId', 'LocalPath')
+    list_filter = ('Status', 'Model')
+    ordering = ('-id',)
+    actions = ['retry_failed']
+
+    @admin.action(description="Thử tải lên lại các ảnh lỗi đã chọn")
+    def retry_failed(self, request, queryset):
+        retried = queryset.filter(Status=ImageUpload.FAILED).update(Status=ImageUpload.PENDING, Attempts=0,
+                                                                    NextAttemptAt=timezone.now())
+        self.message_user(request, f"Đã đưa {retried} ảnh trở lại hàng đợi.", messages.SUCCESS)
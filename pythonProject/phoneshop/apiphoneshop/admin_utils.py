@@ -0,0 +1,91 @@
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using='default'):
+    """Đọc số dòng ước lượng từ thống kê của database (None nếu backend không hỗ trợ)."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator cho changelist: với bảng lớn không có bộ lọc thì dùng số dòng ước lượng
+    thay vì chạy COUNT(*) trên toàn bộ bảng.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        threshold = getattr(settings, 'ADMIN_COUNT_ESTIMATE_THRESHOLD', 10000)
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate > threshold:
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Bộ lọc theo khóa ngoại dùng widget autocomplete của admin, chỉ tải đối tượng đang được chọn
+    thay vì liệt kê toàn bộ bảng liên kết trong sidebar.
+    Model liên kết phải được đăng ký trong admin với search_fields.
+    """
+    template = 'admin/apiphoneshop/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = '%s__%s__exact' % (field_path, field.target_field.name)
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.title = getattr(field, 'verbose_name', field_path)
+        self.widget_id = 'filter_%s' % self.lookup_kwarg
+        self.other_params = [
+            (key, value) for key, value in request.GET.items()
+            if key not in (self.lookup_kwarg, 'p', 'e')
+        ]
+        form_field = forms.ModelChoiceField(
+            queryset=field.related_model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'id': self.widget_id}),
+            required=False,
+        )
+        self.rendered_widget = form_field.widget.render(self.lookup_kwarg, self.lookup_val or [])
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+        }
+
+
+class ScalableChangeListMixin:
+    """
+    Cấu hình chung cho changelist của các bảng lớn: không đếm lại toàn bộ bảng,
+    dùng số dòng ước lượng và nạp media cho AutocompleteFilter.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media
@@ -0,0 +1,176 @@
+"""
+Kiểm soát số đơn hàng được xử lý đồng thời cho mỗi variant (flash sale).
+
+Khi bật ORDER_ADMISSION['ENABLED'], mỗi variant chỉ có tối đa MAX_INFLIGHT_PER_VARIANT request
+chạy toàn bộ luồng tạo đơn cùng lúc; các request vượt quá được cấp một OrderTicket (hàng đợi
+giới hạn MAX_QUEUE) để worker `process_order_queue` xử lý dần, client hỏi kết quả qua
+GET /order/tickets/<id>/.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from .models import OrderTicket
+from .orders import place_order
+from .serializers import OrderSerializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_INFLIGHT_PER_VARIANT': 8,
+    'MAX_QUEUE': 5000,
+    # Slot bị giữ quá thời gian này (process chết giữa chừng) sẽ tự được giải phóng
+    'SLOT_TIMEOUT': 60,
+    'RETRY_AFTER': 5,
+    # Ticket "processing" lâu hơn số giây này (worker bị dừng giữa chừng) được xử lý lại
+    'STALE_AFTER': 10 * 60,
+}
+
+INFLIGHT_KEY = 'order-admission:inflight:%s'
+
+# Bộ đếm slot cần incr/decr nguyên tử và dùng chung giữa mọi process: LocMemCache đếm riêng từng worker,
+# DatabaseCache đọc rồi ghi (không nguyên tử)
+SHARED_COUNTER_BACKENDS = ('RedisCache', 'PyMemcacheCache', 'PyLibMCCache')
+
+
+def admission_settings():
+    return {**DEFAULTS, **getattr(settings, 'ORDER_ADMISSION', {})}
+
+
+def counter_cache_problem():
+    """Lý do cache 'default' không dùng được cho bộ đếm slot, None nếu dùng được."""
+    backend = type(caches['default']).__name__
+    if backend not in SHARED_COUNTER_BACKENDS:
+        return (f"ORDER_ADMISSION needs a shared cache with atomic counters ({', '.join(SHARED_COUNTER_BACKENDS)}), "
+                f"the default cache is {backend}.")
+    return None
+
+
+def enabled():
+    """ORDER_ADMISSION['ENABLED'], từ chối bật khi giới hạn đồng thời không thể áp dụng cho toàn site."""
+    if not admission_settings()['ENABLED']:
+        return False
+    problem = counter_cache_problem()
+    if problem:
+        raise ImproperlyConfigured(problem)
+    return True
+
+
+def try_acquire(variant_id):
+    conf = admission_settings()
+    key = INFLIGHT_KEY % variant_id
+    cache.add(key, 0, timeout=conf['SLOT_TIMEOUT'])
+    try:
+        inflight = cache.incr(key)
+    except ValueError:
+        # Key vừa hết hạn giữa add() và incr()
+        cache.add(key, 1, timeout=conf['SLOT_TIMEOUT'])
+        return True
+    if inflight > conf['MAX_INFLIGHT_PER_VARIANT']:
+        release(variant_id)
+        return False
+    return True
+
+
+def release(variant_id):
+    try:
+        cache.decr(INFLIGHT_KEY % variant_id)
+    except ValueError:
+        pass
+
+
+def enqueue(user, order_data):
+    """Tạo ticket cho yêu cầu đặt hàng; trả về None nếu hàng đợi đã đầy."""
+    if OrderTicket.objects.filter(Status=OrderTicket.QUEUED).count() >= admission_settings()['MAX_QUEUE']:
+        return None
+    return OrderTicket.objects.create(User=user, Variant_id=order_data['variant_id'], Payload=order_data)
+
+
+def queue_position(ticket):
+    if ticket.Status != OrderTicket.QUEUED:
+        return 0
+    return OrderTicket.objects.filter(Status=OrderTicket.QUEUED, id__lt=ticket.id).count() + 1
+
+
+def _finish(ticket, order):
+    ticket.Status, ticket.ResponseStatus, ticket.Order = OrderTicket.DONE, 201, order
+    ticket.Result = OrderSerializer(order).data
+
+
+def run_ticket(ticket):
+    def link(order):
+        # Ghi đơn vào ticket trong cùng transaction: ticket bị bỏ dở vẫn biết đơn đã được tạo hay chưa
+        OrderTicket.objects.filter(id=ticket.id).update(Order=order)
+
+    try:
+        order = place_order(ticket.User, **ticket.Payload, on_created=link)
+    except Http404:
+        ticket.Status, ticket.ResponseStatus = OrderTicket.FAILED, 404
+        ticket.Result = {'detail': 'No Variant matches the given query.'}
+    except APIException as e:
+        ticket.Status, ticket.ResponseStatus = OrderTicket.FAILED, e.status_code
+        ticket.Result = {'detail': e.detail}
+    else:
+        _finish(ticket, order)
+    ticket.save(update_fields=['Status', 'ResponseStatus', 'Order', 'Result', 'update_date'])
+
+
+def _recover(ticket):
+    """Ghi kết quả cho ticket bị bỏ dở: DONE nếu đơn đã được lưu, ngược lại FAILED."""
+    ticket.refresh_from_db()
+    if ticket.Order is not None:
+        _finish(ticket, ticket.Order)
+    else:
+        ticket.Status, ticket.ResponseStatus = OrderTicket.FAILED, 500
+        ticket.Result = {'detail': 'Order could not be processed, please retry.'}
+    ticket.save(update_fields=['Status', 'ResponseStatus', 'Order', 'Result', 'update_date'])
+
+
+def requeue_stale(now=None):
+    """
+    Ticket "processing" quá STALE_AFTER giây (worker chết giữa chừng): hoàn tất nếu đơn đã được tạo,
+    ngược lại đưa lại hàng đợi. Trả về số ticket đã xử lý.
+    """
+    now = now or timezone.now()
+    stale = OrderTicket.objects.filter(Status=OrderTicket.PROCESSING,
+                                       update_date__lt=now - timedelta(seconds=admission_settings()['STALE_AFTER']))
+    finished = 0
+    for ticket in stale.filter(Order__isnull=False).select_related('Order'):
+        _finish(ticket, ticket.Order)
+        ticket.save(update_fields=['Status', 'ResponseStatus', 'Order', 'Result', 'update_date'])
+        finished += 1
+    return finished + stale.filter(Order__isnull=True).update(Status=OrderTicket.QUEUED, update_date=now)
+
+
+def process_queue(batch_size=50):
+    """
+    Xử lý tối đa `batch_size` ticket theo thứ tự đến, vẫn tôn trọng giới hạn đồng thời của từng variant.
+    Có thể chạy nhiều worker song song: mỗi ticket chỉ được nhận bởi một worker. Trả về số ticket đã xử lý.
+    """
+    requeue_stale()
+    processed = 0
+    tickets = OrderTicket.objects.filter(Status=OrderTicket.QUEUED).select_related('User').order_by('id')
+    for ticket in tickets[:batch_size]:
+        if not try_acquire(ticket.Variant_id):
+            continue
+        try:
+            claimed = (OrderTicket.objects.filter(id=ticket.id, Status=OrderTicket.QUEUED)
+                       .update(Status=OrderTicket.PROCESSING, update_date=timezone.now()))
+            if claimed:
+                try:
+                    run_ticket(ticket)
+                except Exception:
+                    # Lỗi ngoài dự kiến: ghi kết quả để client không phải chờ mãi, worker tiếp tục với ticket khác
+                    logger.exception("Order ticket %s failed", ticket.id)
+                    _recover(ticket)
+                processed += 1
+        finally:
+            release(ticket.Variant_id)
+    return processed
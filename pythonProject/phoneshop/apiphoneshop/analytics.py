@@ -0,0 +1,180 @@
+"""
+Thống kê bán hàng dựa trên bảng tổng hợp DailyVariantSales (một dòng cho mỗi ngày x variant).
+
+Mỗi lần ghi OrderDetail, phần chênh lệch (số lượng, doanh thu, số đơn) được cộng vào dòng tổng hợp
+của (ngày đặt đơn, variant) sau commit.
+Lệnh rollup_sales tính lại cả một khoảng ngày (dùng khi khởi tạo hoặc sau khi sửa dữ liệu hàng loạt).
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Brand, OrderDetail, Variant, DailyVariantSales
+from .retention import order_details
+
+# Chiều thống kê -> cột nhóm trong DailyVariantSales
+DIMENSIONS = {
+    'variant': 'Variant_id',
+    'brand': 'Brand_id',
+    'color': 'Color',
+    'memory': 'Memory',
+}
+METRICS = {
+    'units': 'Units',
+    'revenue': 'Revenue',
+}
+
+
+def day_range(start, end):
+    """Khoảng thời gian [00:00 ngày start, 00:00 ngày sau end) theo múi giờ hiện tại."""
+    tz = timezone.get_current_timezone()
+    return (timezone.make_aware(datetime.combine(start, time.min), tz),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz))
+
+
+def _rollup(details):
+    return (details.annotate(day=TruncDate('Order__created_date'))
+            .values('day', 'Variant_id', 'Variant__Product__Brand_id', 'Variant__Color', 'Variant__Memory')
+            .order_by()
+            .annotate(units=Sum('Quantity'), revenue=Sum('Price'), orders=Count('Order_id', distinct=True)))
+
+
+def _groups(**filters):
+    """Rollup của cả OrderDetail và ArchivedOrderDetail; một ngày có thể nằm ở cả hai bảng nên cộng dồn theo khóa."""
+    merged = {}
+    for details in order_details(**filters):
+        for group in _rollup(details):
+            key = (group['day'], group['Variant_id'])
+            if key in merged:
+                for field in ('units', 'revenue', 'orders'):
+                    merged[key][field] = (merged[key][field] or 0) + (group[field] or 0)
+            else:
+                merged[key] = group
+    return list(merged.values())
+
+
+def _row(group):
+    return DailyVariantSales(Date=group['day'], Variant_id=group['Variant_id'],
+                             Brand_id=group['Variant__Product__Brand_id'], Color=group['Variant__Color'],
+                             Memory=group['Variant__Memory'], Units=group['units'] or 0,
+                             Revenue=group['revenue'] or 0, Orders=group['orders'])
+
+
+def record_sale(variant_id, day, units, revenue, orders):
+    """
+    Cộng thay đổi (có thể âm) của một dòng OrderDetail vào dòng tổng hợp (ngày, variant) bằng một UPDATE,
+    tạo dòng nếu chưa có. Không đọc lại OrderDetail và không khóa Variant.
+    """
+    rows = DailyVariantSales.objects.filter(Date=day, Variant_id=variant_id)
+    updated = rows.update(Units=F('Units') + units, Revenue=F('Revenue') + revenue, Orders=F('Orders') + orders)
+    if not updated:
+        if orders <= 0 and units <= 0:
+            # Dòng đã bị rebuild xóa: không còn gì để trừ
+            return
+        variant = Variant.objects.select_related('Product').only('Color', 'Memory', 'Product__Brand_id') \
+            .filter(id=variant_id).first()
+        if variant is None:
+            return
+        try:
+            with transaction.atomic():
+                DailyVariantSales.objects.create(Date=day, Variant_id=variant_id, Brand_id=variant.Product.Brand_id,
+                                                 Color=variant.Color, Memory=variant.Memory, Units=units,
+                                                 Revenue=revenue, Orders=orders)
+        except IntegrityError:
+            # Một giao dịch khác vừa tạo dòng này
+            record_sale(variant_id, day, units, revenue, orders)
+    elif orders < 0:
+        rows.filter(Orders__lte=0).delete()
+
+
+def schedule_sale(detail_id, order_id, variant_id, quantity, price, created, sign):
+    """Sau commit, cộng (sign=1) hoặc trừ (sign=-1) một dòng OrderDetail vào tổng hợp của ngày đặt đơn."""
+    # Mỗi đơn chỉ được đếm một lần cho một variant: chỉ dòng đầu tiên/cuối cùng của (đơn, variant) đổi số đơn
+    only_line = not OrderDetail.objects.filter(Order_id=order_id, Variant_id=variant_id).exclude(id=detail_id).exists()
+    day = timezone.localdate(created)
+    transaction.on_commit(lambda: record_sale(variant_id, day, sign * (quantity or 0), sign * (price or 0),
+                                              sign * only_line))
+
+
+def rebuild(start, end):
+    """Tính lại mọi dòng tổng hợp trong khoảng ngày [start, end] bằng một truy vấn GROUP BY. Trả về số dòng."""
+    range_start, range_end = day_range(start, end)
+    rows = [_row(group) for group in _groups(Order__created_date__gte=range_start, Order__created_date__lt=range_end)]
+    with transaction.atomic():
+        DailyVariantSales.objects.filter(Date__range=(start, end)).delete()
+        DailyVariantSales.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def _totals(start, end, by, keys=None):
+    rows = DailyVariantSales.objects.filter(Date__range=(start, end))
+    if keys is not None:
+        rows = rows.filter(**{f'{DIMENSIONS[by]}__in': keys})
+    return rows.values(DIMENSIONS[by]).order_by().annotate(units=Sum('Units'), revenue=Sum('Revenue'))
+
+
+def _labels(by, keys):
+    if by == 'variant':
+        variants = Variant.objects.select_related('Product').defer('Product__Description').in_bulk(keys)
+        return {key: {'id': key, 'SKU': variants[key].SKU, 'Name': variants[key].Product.Name}
+                for key in keys if key in variants}
+    if by == 'brand':
+        brands = Brand.objects.in_bulk(keys)
+        return {key: {'id': key, 'Name': brands[key].Name} for key in keys if key in brands}
+    return {key: key for key in keys}
+
+
+def _change(current, previous):
+    return round((current - previous) / previous * 100, 2) if previous else None
+
+
+def top_sellers(start, end, by='variant', metric='revenue', limit=10):
+    """
+    Top `limit` theo `by` trong [start, end], kèm số liệu của kỳ liền trước có cùng độ dài
+    và chênh lệch giữa hai kỳ.
+    """
+    column = DIMENSIONS[by]
+    length = end - start + timedelta(days=1)
+    previous_start, previous_end = start - length, start - timedelta(days=1)
+
+    current = list(_totals(start, end, by).order_by(f'-{metric}', column)[:limit])
+    keys = [row[column] for row in current]
+    previous = {row[column]: row for row in _totals(previous_start, previous_end, by, keys)}
+    labels = _labels(by, keys)
+
+    def period_total(first, last):
+        return DailyVariantSales.objects.filter(Date__range=(first, last)).aggregate(
+            units=Sum('Units'), revenue=Sum('Revenue'))
+
+    results = []
+    for row in current:
+        before = previous.get(row[column], {})
+        entry = {by: labels.get(row[column], row[column])}
+        for name in METRICS:
+            entry[name] = row[name] or 0
+            entry[f'previous_{name}'] = before.get(name) or 0
+            entry[f'{name}_delta'] = entry[name] - entry[f'previous_{name}']
+            entry[f'{name}_change_pct'] = _change(entry[name], entry[f'previous_{name}'])
+        results.append(entry)
+
+    totals, previous_totals = period_total(start, end), period_total(previous_start, previous_end)
+    return {
+        'start': start,
+        'end': end,
+        'previous_start': previous_start,
+        'previous_end': previous_end,
+        'by': by,
+        'metric': metric,
+        'totals': {
+            name: {
+                'current': totals[name] or 0,
+                'previous': previous_totals[name] or 0,
+                'change_pct': _change(totals[name] or 0, previous_totals[name] or 0),
+            }
+            for name in METRICS
+        },
+        'results': results,
+    }
@@ -0,0 +1,103 @@
+"""
+Phiên bản async (chạy dưới phoneshop.asgi) của các endpoint đọc catalog.
+
+Truy vấn dùng async ORM của Django; serializer chỉ chạy trên dữ liệu đã được nạp sẵn
+(select_related/prefetch_related) nên không chạm tới database trong event loop. Serializer có gọi cache
+(mô tả sản phẩm đã lọc) chạy qua sync_to_async.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from . import read_plans
+from .db_router import _replica_alias, is_pinned_to_primary, replica_pool
+from .models import Product, Variant, Comment
+from .pagination import CommentFeedPagination, filter_comment_feed
+from .renderers import ORJSONRenderer
+from .serializers import ProductSerializer, ProductListSerializer, VariantSerializer, CommentSerializer, \
+    CommentFeedQuerySerializer
+
+
+def product_queryset():
+    return Product.objects.select_related('Brand').prefetch_related('images', 'variants')
+
+
+def json_response(data, status=200):
+    return HttpResponse(ORJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def not_found(model):
+    # Cùng nội dung với lỗi 404 của DRF (get_object_or_404)
+    return json_response({'detail': f'No {model._meta.object_name} matches the given query.'}, status=404)
+
+
+def catalog_read(view):
+    """Chỉ nhận GET/HEAD và đọc từ replica như ReplicaReadMixin (người dùng vừa ghi vẫn đọc từ primary)."""
+
+    @require_safe
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        alias = None
+        user = await request.auser()
+        if not await sync_to_async(is_pinned_to_primary)(user):
+            alias = await sync_to_async(replica_pool.choose)()
+        token = _replica_alias.set(alias)
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            _replica_alias.reset(token)
+
+    return wrapper
+
+
+@catalog_read
+async def product_list(request):
+    if read_plans.enabled():
+        return json_response(await sync_to_async(read_plans.product_list)(product_queryset()))
+    products = [product async for product in product_queryset().defer('Description')]
+    return json_response(ProductListSerializer(products, many=True).data)
+
+
+@catalog_read
+async def product_detail(request, pk):
+    try:
+        product = await product_queryset().aget(pk=pk)
+    except Product.DoesNotExist:
+        return not_found(Product)
+    # Mô tả đã lọc được đọc/ghi qua cache đồng bộ (vd. DatabaseCache), không gọi được trong event loop
+    return json_response(await sync_to_async(lambda: ProductSerializer(product).data)())
+
+
+@catalog_read
+async def variant_detail(request, pk):
+    try:
+        variant = await Variant.objects.select_related('Product').defer('Product__Description').aget(pk=pk)
+    except Variant.DoesNotExist:
+        return not_found(Variant)
+    return json_response(VariantSerializer(variant).data)
+
+
+def comment_page(request):
+    """Một trang feed bình luận giống CommentViewSet.list: cùng bộ lọc, cursor và lỗi. Trả về (data, status)."""
+    request = Request(request)
+    query = CommentFeedQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return query.errors, 400
+    paginator = CommentFeedPagination()
+    try:
+        page = paginator.paginate_queryset(
+            filter_comment_feed(Comment.objects.select_related('User'), query.validated_data), request)
+    except APIException as e:
+        return {'detail': e.detail}, e.status_code
+    return paginator.get_paginated_response(CommentSerializer(page, many=True).data).data, 200
+
+
+@catalog_read
+async def comment_list(request):
+    # CursorPagination chỉ có bản đồng bộ
+    data, status = await sync_to_async(comment_page)(request)
+    return json_response(data, status=status)
@@ -0,0 +1,192 @@
+"""
+Sửa giá và tồn kho Variant hàng loạt: /variants/bulk-price/, /variants/bulk-stock/ và action trong VariantAdmin.
+
+Giá được đổi bằng UPDATE theo tập (F expression) trên từng lô id, tồn kho từ CSV được gom theo số lượng
+thành UPDATE theo tập và bulk_update theo lô; không có Variant.save() nào cho từng dòng.
+Mọi thao tác đều có dry-run trả về bản xem trước.
+Vì UPDATE không gửi signal, update_date được đặt thủ công (feed /sync/catalog/), ảnh chụp catalog
+được đánh dấu cần tạo lại và giá trong cache của apiphoneshop.pricing bị xóa.
+
+Variant chia shard bị bỏ qua khi sửa tồn kho: tồn kho thật nằm ở VariantStockShard (xem lệnh shard_stock).
+"""
+import csv
+import io
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Variant
+from .pricing import forget_prices
+from .snapshot import mark_dirty
+
+PRICE_FIELDS = ('Price', 'CompareAtPrice')
+PERCENT = 'percent'
+ABSOLUTE = 'absolute'
+STOCK_SET = 'set'
+STOCK_ADJUST = 'adjust'
+
+CHUNK_SIZE = 2000
+BULK_UPDATE_BATCH = 100
+PREVIEW_ROWS = 20
+
+
+class BulkEditError(ValueError):
+    pass
+
+
+def _id_chunks(queryset, chunk_size):
+    """id của queryset theo từng lô tăng dần (keyset theo id, không dùng OFFSET)."""
+    last = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def new_price(old, mode, value):
+    return max(old * (1 + value / 100) if mode == PERCENT else old + value, 0)
+
+
+def reprice(queryset, field, mode, value, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Tăng/giảm `field` theo phần trăm hoặc một số tiền cố định (không xuống dưới 0)."""
+    if field not in PRICE_FIELDS or mode not in (PERCENT, ABSOLUTE):
+        raise BulkEditError(f"Unsupported price change {field}/{mode}.")
+    # CompareAtPrice trống nghĩa là không có giá so sánh, giữ nguyên
+    queryset = queryset.filter(**{f'{field}__isnull': False})
+    if dry_run:
+        rows = queryset.order_by('id').values_list('id', 'SKU', field)[:PREVIEW_ROWS]
+        return {'matched': queryset.count(), 'updated': 0,
+                'preview': [{'id': pk, 'SKU': sku, 'old': old, 'new': new_price(old, mode, value)}
+                            for pk, sku, old in rows]}
+
+    expression = F(field) * (1 + value / 100) if mode == PERCENT else F(field) + value
+    now = timezone.now()
+    updated = 0
+    for ids in _id_chunks(queryset, chunk_size):
+        updated += Variant.objects.filter(id__in=ids).update(**{field: Greatest(expression, Value(0.0))},
+                                                              update_date=now)
+        forget_prices(ids)
+    if updated:
+        mark_dirty()
+    return {'matched': updated, 'updated': updated, 'preview': []}
+
+
+def _stock_value(mode, value):
+    return value if mode == STOCK_SET else Greatest(F('Quantity') + value, Value(0))
+
+
+def _new_quantity(old, mode, value):
+    return value if mode == STOCK_SET else max(old + value, 0)
+
+
+def adjust_stock(queryset, mode, value, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Đặt tồn kho bằng `value` hoặc cộng/trừ `value` cho mọi variant (không chia shard) trong queryset."""
+    if mode not in (STOCK_SET, STOCK_ADJUST):
+        raise BulkEditError(f"Unsupported stock change {mode}.")
+    queryset = queryset.filter(StockShards=0)
+    if dry_run:
+        rows = queryset.order_by('id').values_list('id', 'SKU', 'Quantity')[:PREVIEW_ROWS]
+        return {'matched': queryset.count(), 'updated': 0,
+                'preview': [{'id': pk, 'SKU': sku, 'old': old, 'new': _new_quantity(old, mode, value)}
+                            for pk, sku, old in rows]}
+
+    now = timezone.now()
+    updated = 0
+    for ids in _id_chunks(queryset, chunk_size):
+        updated += Variant.objects.filter(id__in=ids).update(Quantity=_stock_value(mode, value), update_date=now)
+    if updated:
+        mark_dirty()
+    return {'matched': updated, 'updated': updated, 'preview': []}
+
+
+def parse_stock_csv(text):
+    """
+    Đọc CSV có header gồm cột `sku` hoặc `id` và cột `quantity`.
+    Trả về (tên cột khóa, [(khóa, số lượng)], [lỗi theo dòng]).
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+    key = 'sku' if 'sku' in columns else 'id' if 'id' in columns else None
+    if key is None or 'quantity' not in columns:
+        raise BulkEditError("CSV must have a header with a 'sku' or 'id' column and a 'quantity' column.")
+
+    rows, errors = [], []
+    for line, record in enumerate(reader, start=2):
+        raw_key = (record[columns[key]] or '').strip()
+        try:
+            quantity = int((record[columns['quantity']] or '').strip())
+            rows.append((int(raw_key) if key == 'id' else raw_key, quantity))
+        except ValueError:
+            errors.append({'line': line, 'error': "Invalid id or quantity."})
+    return key, rows, errors
+
+
+@transaction.atomic
+def _write_stock(changes, mode, now):
+    """
+    Ghi {số lượng: [id]}: mỗi giá trị dùng chung bởi nhiều variant là một UPDATE, các giá trị còn lại
+    đi qua bulk_update (CASE WHEN) với lô nhỏ vì chi phí dựng CASE tăng theo kích thước lô.
+    """
+    updated = 0
+    singles = []
+    for value, ids in changes.items():
+        if len(ids) > 1:
+            updated += Variant.objects.filter(id__in=ids).update(Quantity=_stock_value(mode, value), update_date=now)
+        else:
+            singles.append(Variant(id=ids[0], Quantity=value if mode == STOCK_SET else F('Quantity') + value))
+    if singles:
+        ids = [variant.id for variant in singles]
+        updated += Variant.objects.bulk_update(singles, ['Quantity'], batch_size=BULK_UPDATE_BATCH)
+        # update_date giống nhau cho mọi dòng, và tồn kho âm được đưa về 0 một lần thay vì GREATEST trong CASE
+        Variant.objects.filter(id__in=ids).update(update_date=now)
+        if mode == STOCK_ADJUST:
+            Variant.objects.filter(id__in=ids, Quantity__lt=0).update(Quantity=0)
+    return updated
+
+
+def import_stock(rows, key='sku', mode=STOCK_SET, dry_run=False, chunk_size=CHUNK_SIZE):
+    """
+    Ghi tồn kho theo danh sách (sku hoặc id, số lượng), mỗi lần đọc/ghi chunk_size dòng.
+    Với mode=adjust số lượng được cộng bằng F('Quantity') nên không mất các lượt đặt hàng xen giữa.
+    """
+    if mode not in (STOCK_SET, STOCK_ADJUST):
+        raise BulkEditError(f"Unsupported stock change {mode}.")
+    lookup = 'SKU' if key == 'sku' else 'id'
+    wanted = dict(rows)
+    result = {'matched': 0, 'updated': 0, 'missing': [], 'skipped': [], 'preview': []}
+    now = timezone.now()
+    keys = list(wanted)
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        found = {}
+        for pk, sku, quantity, shards in (Variant.objects.filter(**{f'{lookup}__in': chunk})
+                                          .values_list('id', 'SKU', 'Quantity', 'StockShards')):
+            found.setdefault(sku if key == 'sku' else pk, []).append((pk, sku, quantity, shards))
+
+        changes = defaultdict(list)
+        for item in chunk:
+            matches = found.get(item)
+            if not matches:
+                result['missing'].append(item)
+            elif len(matches) > 1:
+                result['skipped'].append({'key': item, 'reason': "SKU matches several variants."})
+            elif matches[0][3]:
+                result['skipped'].append({'key': item, 'reason': "Variant stock is sharded."})
+            else:
+                pk, sku, quantity, _ = matches[0]
+                result['matched'] += 1
+                if not dry_run:
+                    changes[wanted[item]].append(pk)
+                elif len(result['preview']) < PREVIEW_ROWS:
+                    result['preview'].append({'id': pk, 'SKU': sku, 'old': quantity,
+                                              'new': _new_quantity(quantity, mode, wanted[item])})
+        if changes:
+            result['updated'] += _write_stock(changes, mode, now)
+    if result['updated']:
+        mark_dirty()
+    return result
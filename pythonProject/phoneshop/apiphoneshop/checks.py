@@ -0,0 +1,14 @@
+from django.core.checks import Error, register
+
+from . import admission
+
+
+@register()
+def check_order_admission(app_configs, **kwargs):
+    if not admission.admission_settings()['ENABLED']:
+        return []
+    problem = admission.counter_cache_problem()
+    if problem:
+        return [Error(problem, hint="Set REDIS_URL or disable ORDER_ADMISSION['ENABLED'].",
+                      id='apiphoneshop.E001')]
+    return []
@@ -0,0 +1,122 @@
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework import permissions
+
+# Alias replica được chọn cho request hiện tại (None = đọc từ primary)
+_replica_alias = ContextVar('replica_alias', default=None)
+
+PIN_CACHE_KEY = 'db-router:pin:%s'
+
+
+def pin_to_primary(user):
+    """Ghim người dùng vào primary trong REPLICA_PIN_SECONDS giây sau khi ghi (read-your-writes)."""
+    cache.set(PIN_CACHE_KEY % user.pk, True, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+
+
+def is_pinned_to_primary(user):
+    return bool(user and user.is_authenticated and cache.get(PIN_CACHE_KEY % user.pk))
+
+
+class ReplicaPool:
+    """Chọn replica theo vòng tròn (round-robin), bỏ qua replica không kết nối được."""
+
+    def __init__(self):
+        self._counter = itertools.count()
+        self._health = {}
+        self._lock = threading.Lock()
+
+    @property
+    def aliases(self):
+        return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+    def check(self, alias):
+        try:
+            connections[alias].ensure_connection()
+            return True
+        except Exception:
+            return False
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 5)
+        now = time.monotonic()
+        healthy, checked_at = self._health.get(alias, (None, 0))
+        if healthy is None or now - checked_at >= interval:
+            healthy = self.check(alias)
+            with self._lock:
+                self._health[alias] = (healthy, now)
+        return healthy
+
+    def mark_unhealthy(self, alias):
+        with self._lock:
+            self._health[alias] = (False, time.monotonic())
+
+    def choose(self):
+        aliases = self.aliases
+        if not aliases:
+            return None
+        start = next(self._counter)
+        for i in range(len(aliases)):
+            alias = aliases[(start + i) % len(aliases)]
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+
+replica_pool = ReplicaPool()
+
+
+class ReplicaRouter:
+    """
+    Đọc từ replica khi request hiện tại đã được ReplicaReadMixin chọn replica,
+    mọi thao tác ghi đều đi vào primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Bảng của DatabaseCache chỉ được ghi vào primary: đọc từ replica sẽ không thấy giá trị vừa ghi (vd. ghim primary)
+        if model._meta.app_label == 'django_cache':
+            return 'default'
+        return _replica_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary và replica chứa cùng một dữ liệu
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Cho các viewset chỉ đọc catalog: các action trong `replica_actions` với phương thức an toàn
+    được phục vụ từ replica, trừ khi người dùng vừa ghi và đang được ghim vào primary.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in permissions.SAFE_METHODS and self.action in self.replica_actions
+                and not is_pinned_to_primary(request.user)):
+            self._replica_token = _replica_alias.set(replica_pool.choose())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_alias.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PrimaryStickyWriteMixin:
+    """Sau mỗi thao tác ghi thành công, ghim người dùng vào primary để đọc lại được dữ liệu vừa ghi."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (request.method not in permissions.SAFE_METHODS and response.status_code < 400
+                and request.user.is_authenticated):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
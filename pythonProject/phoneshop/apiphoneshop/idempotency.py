@@ -0,0 +1,122 @@
+"""
+Hỗ trợ header Idempotency-Key cho các API ghi (đặt hàng, giỏ hàng).
+
+Request đầu tiên với một khóa được thực thi và response được lưu lại trong IDEMPOTENCY_KEY_TTL giây;
+các lần gửi lại cùng khóa nhận đúng response đó mà không ghi gì vào database. Request trùng khóa
+đến khi request đầu còn đang chạy nhận 409, khóa dùng lại cho nội dung khác nhận 422. View ghi dữ liệu rồi mới gọi
+ra ngoài (vd. đặt hàng rồi gọi MoMo) lưu response bằng complete() trong chính transaction ghi dữ liệu; request lỗi
+trước khi có kết quả được commit sẽ giải phóng khóa để client thử lại.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def replay(record, fingerprint):
+    if record.Fingerprint != fingerprint:
+        return Response({"detail": "Idempotency-Key was already used for a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if record.Status != IdempotencyKey.COMPLETED:
+        return Response({"detail": "A request with this Idempotency-Key is still being processed."},
+                        status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+    return Response(record.ResponseBody, status=record.ResponseStatus, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view_method):
+    """Decorator cho action của viewset; request không có header Idempotency-Key được xử lý như bình thường."""
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('Key').max_length:
+            return Response({"detail": "Idempotency-Key is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        now = timezone.now()
+        records = IdempotencyKey.objects.filter(User=request.user, Key=key)
+        record = records.filter(ExpiresAt__gt=now).first()
+        if record:
+            return replay(record, fingerprint)
+
+        records.filter(ExpiresAt__lte=now).delete()
+        ttl = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(User=request.user, Key=key, Fingerprint=fingerprint,
+                                                       ExpiresAt=now + ttl)
+        except IntegrityError:
+            # Một request khác cùng khóa vừa bắt đầu
+            record = records.first()
+            if record is None:
+                return Response({"detail": "A request with this Idempotency-Key is still being processed."},
+                                status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+            return replay(record, fingerprint)
+
+        request.idempotency_record = record
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            _release(record)
+            raise
+        if response.status_code >= 500:
+            # Lỗi phía server: cho phép client thử lại với cùng khóa
+            _release(record)
+        else:
+            complete(request, response.status_code, response.data)
+        return response
+
+    return wrapper
+
+
+def pending(request):
+    """Request có Idempotency-Key chưa được ghi nhận kết quả."""
+    record = getattr(request, 'idempotency_record', None)
+    return record is not None and record.Status != IdempotencyKey.COMPLETED
+
+
+def complete(request, response_status, body):
+    """
+    Lưu response cho Idempotency-Key của request. Gọi trong transaction ghi dữ liệu của view (trước các lời gọi
+    ra ngoài như cổng thanh toán): khi transaction commit, request gửi lại nhận response này thay vì ghi lần nữa.
+    """
+    record = getattr(request, 'idempotency_record', None)
+    if record is None:
+        return
+    record.Status = IdempotencyKey.COMPLETED
+    record.ResponseStatus = response_status
+    record.ResponseBody = body
+    record.save(update_fields=['Status', 'ResponseStatus', 'ResponseBody', 'update_date'])
+
+
+def _release(record):
+    # Khóa đã được complete() cùng transaction với dữ liệu đã commit thì giữ lại: thử lại nhận response đó
+    IdempotencyKey.objects.filter(id=record.id, Status=IdempotencyKey.IN_PROGRESS).delete()
+
+
+def purge_expired(batch_size=1000):
+    """Xóa các khóa đã hết hạn theo từng lô. Trả về số dòng đã xóa."""
+    purged = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(ExpiresAt__lte=timezone.now())
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
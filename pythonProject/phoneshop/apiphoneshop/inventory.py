@@ -0,0 +1,185 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import StockReservation, Variant, VariantStockShard
+
+
+class InsufficientStock(Exception):
+    def __init__(self, available):
+        super().__init__(f"Only {available} item(s) available.")
+        self.available = max(available, 0)
+
+
+def reservation_expiry(now=None):
+    return (now or timezone.now()) + timedelta(seconds=getattr(settings, 'CART_RESERVATION_TTL', 15 * 60))
+
+
+def reserved_quantity(variant_id, exclude_cart=None, now=None):
+    """Tổng số lượng đang được giữ (chưa hết hạn) của variant, tính trên index (Variant, ExpiresAt, Quantity)."""
+    reservations = StockReservation.objects.filter(Variant_id=variant_id, ExpiresAt__gt=now or timezone.now())
+    if exclude_cart is not None:
+        reservations = reservations.exclude(Cart=exclude_cart)
+    return reservations.aggregate(total=Sum('Quantity'))['total'] or 0
+
+
+def on_hand(variant):
+    """Tồn kho thực tế: Variant.Quantity, hoặc tổng các shard nếu variant đang chia shard."""
+    if variant.StockShards:
+        return VariantStockShard.objects.filter(Variant=variant).aggregate(total=Sum('Quantity'))['total'] or 0
+    return variant.Quantity
+
+
+def available_to_sell(variant, exclude_cart=None, now=None):
+    return on_hand(variant) - reserved_quantity(variant.id, exclude_cart=exclude_cart, now=now)
+
+
+def lock_variant(variant_id):
+    """
+    Khóa dòng Variant để giữ chỗ và đặt hàng chưa giữ chỗ của cùng variant chạy tuần tự (kiểm tra rồi ghi).
+    Với variant chia shard, tồn kho nằm ở VariantStockShard nên khóa này không chặn các lệnh trừ shard của
+    những đơn đã giữ đủ chỗ (xem consume).
+    """
+    return Variant.objects.select_for_update().get(id=variant_id)
+
+
+def decrement_stock(variant_id, quantity, shards=0):
+    """
+    Trừ tồn kho bằng UPDATE có điều kiện (không bao giờ âm).
+    Với variant chia shard, thử các shard theo thứ tự ngẫu nhiên; nếu không shard nào đủ hàng
+    thì khóa toàn bộ shard của variant và lấy dần từ nhiều shard.
+    """
+    if not shards:
+        updated = (Variant.objects.filter(id=variant_id, Quantity__gte=quantity)
+                   .update(Quantity=F('Quantity') - quantity))
+        if not updated:
+            raise InsufficientStock(0)
+        return
+
+    order = list(range(shards))
+    random.shuffle(order)
+    for shard in order:
+        updated = (VariantStockShard.objects.filter(Variant_id=variant_id, Shard=shard, Quantity__gte=quantity)
+                   .update(Quantity=F('Quantity') - quantity))
+        if updated:
+            return
+
+    with transaction.atomic():
+        rows = list(VariantStockShard.objects.select_for_update().filter(Variant_id=variant_id).order_by('Shard'))
+        total = sum(row.Quantity for row in rows)
+        if total < quantity:
+            raise InsufficientStock(total)
+        remaining = quantity
+        for row in rows:
+            taken = min(row.Quantity, remaining)
+            if taken:
+                row.Quantity -= taken
+                row.save(update_fields=['Quantity'])
+                remaining -= taken
+            if not remaining:
+                break
+
+
+@transaction.atomic
+def enable_sharding(variant_id, shards):
+    """Chia tồn kho hiện tại của variant đều cho `shards` dòng đếm; shards=0 gộp lại vào Variant.Quantity."""
+    variant = Variant.objects.select_for_update().get(id=variant_id)
+    total = on_hand(variant)
+    VariantStockShard.objects.filter(Variant=variant).delete()
+    if shards:
+        base, extra = divmod(total, shards)
+        VariantStockShard.objects.bulk_create([
+            VariantStockShard(Variant=variant, Shard=i, Quantity=base + (1 if i < extra else 0))
+            for i in range(shards)
+        ])
+    variant.StockShards = shards
+    variant.Quantity = total
+    variant.save(update_fields=['StockShards', 'Quantity', 'update_date'])
+    return variant
+
+
+def sync_sharded_quantities():
+    """Cập nhật Variant.Quantity (giá trị hiển thị) từ tổng các shard. Trả về số variant đã đồng bộ."""
+    totals = (VariantStockShard.objects.filter(Variant__StockShards__gt=0)
+              .values('Variant_id').annotate(total=Sum('Quantity')))
+    for row in totals:
+        Variant.objects.filter(id=row['Variant_id']).update(Quantity=row['total'])
+    return len(totals)
+
+
+@transaction.atomic
+def reserve(cart, variant_id, quantity):
+    """
+    Giữ `quantity` sản phẩm (tổng số lượng của variant trong giỏ) cho giỏ hàng trong CART_RESERVATION_TTL giây.
+    Gọi lại sẽ thay thế số lượng đang giữ và gia hạn thời gian giữ.
+    """
+    if quantity < 1:
+        # Số âm sẽ làm tăng số lượng còn bán được của các giỏ khác
+        raise ValueError("Reserved quantity must be at least 1.")
+    now = timezone.now()
+    variant = lock_variant(variant_id)
+    available = available_to_sell(variant, exclude_cart=cart, now=now)
+    if quantity > available:
+        raise InsufficientStock(available)
+    StockReservation.objects.update_or_create(
+        Cart=cart, Variant=variant, defaults={'Quantity': quantity, 'ExpiresAt': reservation_expiry(now)}
+    )
+
+
+def release(cart, variant_id):
+    StockReservation.objects.filter(Cart=cart, Variant_id=variant_id).delete()
+
+
+@transaction.atomic
+def consume(cart, variant_id, quantity):
+    """
+    Trừ tồn kho khi đặt hàng, ưu tiên dùng phần đã giữ chỗ của giỏ hàng.
+    Khóa theo cùng thứ tự với reserve() (dòng Variant rồi StockReservation) để đặt hàng và thêm vào giỏ
+    cùng lúc không deadlock. Riêng variant chia shard đã giữ đủ chỗ thì không khóa dòng Variant: chỉ khóa
+    phần giữ chỗ rồi trừ shard bằng UPDATE có điều kiện.
+    """
+    now = timezone.now()
+    reservations = (StockReservation.objects.filter(Cart=cart, Variant_id=variant_id, ExpiresAt__gt=now)
+                    if cart is not None else StockReservation.objects.none())
+    shards = Variant.objects.values_list('StockShards', flat=True).get(id=variant_id)
+
+    if shards and reservations.filter(Quantity__gte=quantity).exists():
+        reservation = reservations.select_for_update().first()
+        if reservation is None or reservation.Quantity < quantity:
+            # Giỏ hàng vừa đổi số lượng giữ trong lúc đặt hàng
+            raise InsufficientStock(reservation.Quantity if reservation else 0)
+    else:
+        variant = lock_variant(variant_id)
+        reservation = reservations.select_for_update().first()
+        held = min(reservation.Quantity, quantity) if reservation else 0
+        if quantity > held:
+            # Phần chưa được giữ chỗ phải nằm trong số lượng còn bán được
+            available = available_to_sell(variant, exclude_cart=cart, now=now) - held
+            if quantity - held > available:
+                raise InsufficientStock(available + held)
+        shards = variant.StockShards
+
+    decrement_stock(variant_id, quantity, shards=shards)
+
+    if reservation:
+        if reservation.Quantity > quantity:
+            reservation.Quantity -= quantity
+            reservation.save(update_fields=['Quantity', 'update_date'])
+        else:
+            reservation.delete()
+
+
+def release_expired(batch_size=1000, now=None):
+    """Xóa các giữ chỗ đã hết hạn theo từng lô để không khóa bảng lâu. Trả về số dòng đã xóa."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        ids = list(StockReservation.objects.filter(ExpiresAt__lte=now)
+                   .order_by('ExpiresAt').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return released
+        released += StockReservation.objects.filter(id__in=ids).delete()[0]
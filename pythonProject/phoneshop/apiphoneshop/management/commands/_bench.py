@@ -0,0 +1,37 @@
+"""Tiện ích dùng chung cho các lệnh benchmark (bench_*)."""
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def cpu_ms(func, repeat):
+    """Thời gian CPU trung bình (ms) của một lần gọi func, cùng kết quả của lần gọi cuối."""
+    start = time.process_time()
+    for _ in range(repeat):
+        result = func()
+    return (time.process_time() - start) / repeat * 1000, result
+
+
+def format_report(label, latencies, elapsed):
+    """Một dòng kết quả: số request, thông lượng và độ trễ p50/p99/max (ms)."""
+    count = len(latencies)
+    return (
+        f"{label:<24} n={count:<6} {count / elapsed if elapsed else 0:>9.1f} req/s  "
+        f"p50={percentile(latencies, 50) * 1000:>8.1f}ms  p99={percentile(latencies, 99) * 1000:>8.1f}ms  "
+        f"max={max(latencies, default=0) * 1000:>8.1f}ms"
+    )
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apiphoneshop import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Xóa giỏ hàng bỏ quên quá ORDER_RETENTION['CART_IDLE_DAYS'] ngày và chuyển đơn hàng cũ hơn "
+        "ORDER_RETENTION['ARCHIVE_AFTER_DAYS'] ngày sang ArchivedOrder/ArchivedOrderDetail, theo từng lô."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--skip-carts', action='store_true')
+        parser.add_argument('--skip-orders', action='store_true')
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục như một tiến trình nền")
+        parser.add_argument('--interval', type=int, default=60 * 60, help="Số giây giữa hai lần chạy khi dùng --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            carts = 0 if options['skip_carts'] else retention.purge_carts(batch_size=options['batch_size'])
+            orders = 0 if options['skip_orders'] else retention.archive_orders(batch_size=options['batch_size'])
+            self.stdout.write(f"Đã xóa {carts} giỏ hàng bỏ quên, lưu trữ {orders} đơn hàng.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
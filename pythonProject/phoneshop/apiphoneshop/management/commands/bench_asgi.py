@@ -0,0 +1,134 @@
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from apiphoneshop.models import Product, Variant
+
+from ._bench import Timer, format_report
+
+
+def request_host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def wsgi_call(app, path, host, client_delay, submitted):
+    """
+    Một request qua WSGI: thread worker bị giữ suốt thời gian client gửi và nhận chậm.
+    Độ trễ tính từ lúc request được gửi tới (submitted), gồm cả thời gian xếp hàng chờ thread.
+    """
+    environ = {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': host,
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    status = []
+    time.sleep(client_delay / 2)
+    result = app(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        b''.join(result)
+    finally:
+        result.close()
+    time.sleep(client_delay / 2)
+    return time.perf_counter() - submitted, status[0]
+
+
+async def asgi_call(app, path, host, client_delay, submitted):
+    """Một request qua ASGI: thời gian chờ client chậm không chiếm thread nào."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', host.encode())], 'client': ('127.0.0.1', 50000), 'server': (host, 80),
+    }
+    body_read = False
+    finished = asyncio.Event()
+    status = []
+
+    async def receive():
+        nonlocal body_read
+        if not body_read:
+            body_read = True
+            await asyncio.sleep(client_delay / 2)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            await asyncio.sleep(client_delay / 2)
+            finished.set()
+
+    await app(scope, receive, send)
+    return time.perf_counter() - submitted, status[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "So sánh khả năng chịu tải đồng thời của catalog qua WSGI (view DRF đồng bộ, thread pool) "
+        "và ASGI (view async trong apiphoneshop.async_views) trên cùng dữ liệu, "
+        "với client chậm được mô phỏng bằng --client-delay."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=200, help="Số kết nối đồng thời")
+        parser.add_argument('--threads', type=int, default=4, help="Số thread của worker WSGI")
+        parser.add_argument('--client-delay', type=float, default=0.2, help="Số giây client gửi/nhận chậm")
+        parser.add_argument('--seed-products', type=int, default=0,
+                            help="Tạo thêm dữ liệu bằng seed_catalog trước khi chạy")
+
+    def handle(self, *args, **options):
+        if options['seed_products']:
+            call_command('seed_catalog', products=options['seed_products'], stdout=self.stdout)
+        product = Product.objects.order_by('id').first()
+        variant = Variant.objects.order_by('id').first()
+        if product is None or variant is None:
+            self.stderr.write("Chưa có dữ liệu catalog, chạy với --seed-products N.")
+            return
+
+        from phoneshop.asgi import application as asgi_app
+        from phoneshop.wsgi import application as wsgi_app
+
+        host = request_host()
+        endpoints = [
+            ('product list', '/products/', '/async/products/'),
+            ('product detail', f'/products/{product.id}/', f'/async/products/{product.id}/'),
+            ('variant detail', f'/variants/{variant.id}/', f'/async/variants/{variant.id}/'),
+        ]
+        total, delay = options['requests'], options['client_delay']
+        self.stdout.write(
+            f"{total} requests, {options['concurrency']} kết nối đồng thời, client delay {delay}s, "
+            f"WSGI {options['threads']} thread"
+        )
+        for label, wsgi_path, asgi_path in endpoints:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool, Timer() as timer:
+                results = list(pool.map(lambda _: wsgi_call(wsgi_app, wsgi_path, host, delay, timer.start),
+                                        range(total)))
+            self.report(f'WSGI {label}', results, timer.elapsed)
+
+            async def run_asgi():
+                limit = asyncio.Semaphore(options['concurrency'])
+
+                async def one():
+                    async with limit:
+                        return await asgi_call(asgi_app, asgi_path, host, delay, timer.start)
+
+                return await asyncio.gather(*(one() for _ in range(total)))
+
+            with Timer() as timer:
+                results = asyncio.run(run_asgi())
+            self.report(f'ASGI {label}', results, timer.elapsed)
+
+    def report(self, label, results, elapsed):
+        errors = sum(1 for _, status in results if not str(status).startswith('200'))
+        line = format_report(label, [latency for latency, _ in results], elapsed)
+        self.stdout.write(line + (f'  errors={errors}' if errors else ''))
@@ -0,0 +1,70 @@
+import io
+import shutil
+import tempfile
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from apiphoneshop.images import FakeCloudinary, pillow, process_uploads
+from apiphoneshop.models import Brand, Product, ListImg, ImageUpload
+
+from ._bench import Timer, format_report
+
+
+def sample_image(size=(1600, 1200)):
+    Image = pillow()
+    if Image is None:
+        return b'\xff\xd8' + bytes(200 * 1024)
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (30, 120, 200)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thời gian lưu sản phẩm có nhiều ảnh (chỉ ghi file cục bộ) và thông lượng của worker upload "
+        "với số thread khác nhau, dùng Cloudinary giả có độ trễ --latency. Ảnh được ghi vào thư mục tạm."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=40)
+        parser.add_argument('--workers', default='1,4,8', help="Danh sách số thread, phân tách bởi dấu phẩy")
+        parser.add_argument('--latency', type=float, default=0.5, help="Số giây mỗi lần upload giả")
+        parser.add_argument('--failure-rate', type=float, default=0.0)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        content = sample_image()
+        brand, _ = Brand.objects.get_or_create(Name='Benchmark')
+        product = Product.objects.create(Name='Benchmark phone', Brand=brand, Description='')
+        started = timezone.now()
+        upload = FakeCloudinary(options['latency'], options['failure_rate'])
+        try:
+            with override_settings(MEDIA_ROOT=media_root, IMAGE_INGEST={'RETRY_DELAY': 0}):
+                for workers in [int(value) for value in options['workers'].split(',')]:
+                    self.run(product, content, options['images'], workers, upload)
+        finally:
+            ImageUpload.objects.filter(Model='listimg', created_date__gte=started).delete()
+            product.delete()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def run(self, product, content, images, workers, upload):
+        saves = []
+        for index in range(images):
+            start = time.perf_counter()
+            ListImg.objects.create(Product=product,
+                                   TitlePhoto=SimpleUploadedFile(f'bench-{index}.jpg', content, 'image/jpeg'))
+            saves.append(time.perf_counter() - start)
+        self.stdout.write(format_report(f'save workers={workers}', saves, sum(saves)))
+
+        done = failed = 0
+        with Timer() as timer:
+            while ImageUpload.objects.filter(Status=ImageUpload.PENDING).exists():
+                batch_done, batch_failed = process_uploads(batch_size=images, workers=workers, upload=upload)
+                done, failed = done + batch_done, failed + batch_failed
+        self.stdout.write(f"{'upload workers=' + str(workers):<24} {done} ảnh trong {timer.elapsed:.2f}s "
+                          f"({done / timer.elapsed if timer.elapsed else 0:.1f} ảnh/s), {failed} lần lỗi")
+        product.images.all().delete()
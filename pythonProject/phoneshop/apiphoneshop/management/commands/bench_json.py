@@ -0,0 +1,68 @@
+import gzip
+import io
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apiphoneshop.middleware import brotli, compression_settings
+from apiphoneshop.models import Product
+from apiphoneshop.renderers import ORJSONRenderer, ORJSONParser
+from apiphoneshop.serializers import ProductSerializer
+
+from ._bench import cpu_ms
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo CPU khi render/parse danh sách ProductSerializer bằng JSONRenderer của DRF so với orjson, "
+        "và số byte truyền đi khi không nén, nén gzip và brotli (cấu hình RESPONSE_COMPRESSION)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100, help="Số sản phẩm trong danh sách")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed-products', type=int, default=0,
+                            help="Tạo thêm dữ liệu bằng seed_catalog trước khi chạy")
+
+    def handle(self, *args, **options):
+        if options['seed_products']:
+            call_command('seed_catalog', products=options['seed_products'], stdout=self.stdout)
+        products = list(Product.objects.select_related('Brand').prefetch_related('images', 'variants')
+                        .order_by('id')[:options['products']])
+        if not products:
+            self.stderr.write("Chưa có dữ liệu catalog, chạy với --seed-products N.")
+            return
+        repeat = options['repeat']
+
+        serialize_ms, data = cpu_ms(lambda: ProductSerializer(products, many=True).data, repeat)
+        self.stdout.write(f"{len(products)} sản phẩm, ProductSerializer(many=True).data: {serialize_ms:.2f}ms CPU")
+
+        rows = []
+        for label, renderer, parser in [('json (DRF)', JSONRenderer(), JSONParser()),
+                                        ('orjson', ORJSONRenderer(), ORJSONParser())]:
+            render_ms, body = cpu_ms(lambda: renderer.render(data, 'application/json'), repeat)
+            parse_ms, _ = cpu_ms(lambda: parser.parse(io.BytesIO(body)), repeat)
+            rows.append((label, render_ms, parse_ms, len(body)))
+        self.stdout.write(f"{'':<12} {'render':>10} {'parse':>10} {'bytes':>10}")
+        for label, render_ms, parse_ms, size in rows:
+            self.stdout.write(f"{label:<12} {render_ms:>8.2f}ms {parse_ms:>8.2f}ms {size:>10}")
+        self.stdout.write(f"orjson nhanh hơn {rows[0][1] / rows[1][1]:.1f}x khi render, "
+                          f"{rows[0][2] / rows[1][2]:.1f}x khi parse")
+
+        conf = compression_settings()
+        codecs = [('identity', lambda raw: raw),
+                  (f"gzip -{conf['GZIP_LEVEL']}",
+                   lambda raw: gzip.compress(raw, compresslevel=conf['GZIP_LEVEL'], mtime=0))]
+        if brotli is not None:
+            codecs.append((f"br q{conf['BROTLI_QUALITY']}",
+                           lambda raw: brotli.compress(raw, quality=conf['BROTLI_QUALITY'])))
+        else:
+            self.stdout.write("brotli chưa được cài, bỏ qua.")
+        body = ORJSONRenderer().render(data)
+        self.stdout.write(f"{'':<12} {'compress':>10} {'bytes':>10} {'ratio':>7}")
+        for label, codec in codecs:
+            compress_ms, compressed = cpu_ms(lambda: codec(body), repeat)
+            self.stdout.write(f"{label:<12} {compress_ms:>8.2f}ms {len(compressed):>10} "
+                              f"{len(compressed) / len(body):>6.1%}")
@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from collections import Counter
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, DatabaseError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from apiphoneshop import admission
+from apiphoneshop.models import Brand, Product, Variant, User, OrderTicket
+
+from ._bench import Timer, format_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test cho POST /order/: so sánh chế độ thường và chế độ admission (hàng đợi + giới hạn "
+        "đồng thời mỗi variant) ở tải bình thường và tải gấp --multiplier lần trên một variant. "
+        "MoMo không được gọi (payment=COD); độ trễ SMTP được mô phỏng bằng --mail-delay. "
+        "Nên chạy trên MySQL: SQLite khóa cả database khi ghi nên phần lớn request đồng thời sẽ lỗi 500."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=4, help="Số client đồng thời ở tải bình thường")
+        parser.add_argument('--multiplier', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=10, help="Số request mỗi client")
+        parser.add_argument('--mail-delay', type=float, default=0.05)
+        parser.add_argument('--max-inflight', type=int, default=4)
+
+    def handle(self, *args, **options):
+        brand, _ = Brand.objects.get_or_create(Name='Benchmark')
+        product = Product.objects.create(Name='Benchmark launch phone', Brand=brand, Description='')
+        variant = Variant.objects.create(Product=product, SKU='BENCH-LAUNCH', Memory='-', Color='-',
+                                         Quantity=10 ** 9, Price=1000, Img='bench.jpg')
+        clients = options['clients'] * options['multiplier']
+        users = [User.objects.create_user(f'bench-order-{variant.id}-{i}', Address='-') for i in range(clients)]
+
+        def slow_mail(*args, **kwargs):
+            time.sleep(options['mail_delay'])
+
+        # Lỗi 5xx được đếm trong kết quả, không cần in traceback
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        try:
+            with mock.patch('apiphoneshop.orders.send_mail', slow_mail), \
+                    override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for label, count in [('1x', options['clients']), (f"{options['multiplier']}x", clients)]:
+                    for enabled in (False, True):
+                        conf = {'ENABLED': enabled, 'MAX_INFLIGHT_PER_VARIANT': options['max_inflight'],
+                                'MAX_QUEUE': 10 ** 6}
+                        with override_settings(ORDER_ADMISSION=conf):
+                            self.run(f"{label} {'admission' if enabled else 'direct'}", variant, users[:count],
+                                     options['requests'])
+        finally:
+            OrderTicket.objects.filter(Variant=variant).delete()
+            product.delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def run(self, label, variant, users, requests):
+        latencies, statuses = [], Counter()
+        lock = threading.Lock()
+        clients_done = threading.Event()
+        payload = {'variant_id': variant.id, 'quantity': 1, 'ship_address': 'Bench', 'payment': 'COD'}
+
+        def client(user):
+            api = APIClient(raise_request_exception=False)
+            api.force_authenticate(user)
+            local = []
+            try:
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    response = api.post('/order/', payload, format='json')
+                    local.append((time.perf_counter() - start, response.status_code))
+            finally:
+                connections.close_all()
+            with lock:
+                for latency, code in local:
+                    latencies.append(latency)
+                    statuses[code] += 1
+
+        def worker():
+            # Worker xử lý hàng đợi chạy song song với client, dừng khi client xong và hàng đợi trống
+            try:
+                while not (clients_done.is_set() and not OrderTicket.objects.filter(
+                        Variant=variant, Status=OrderTicket.QUEUED).exists()):
+                    try:
+                        processed = admission.process_queue(batch_size=50)
+                    except DatabaseError:
+                        processed = 0
+                    if not processed:
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=client, args=(user,)) for user in users]
+        queue_worker = threading.Thread(target=worker)
+        with Timer() as timer:
+            queue_worker.start()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            clients_done.set()
+            queue_worker.join()
+
+        done = statuses[201] + OrderTicket.objects.filter(Variant=variant, Status=OrderTicket.DONE).count()
+        OrderTicket.objects.filter(Variant=variant).delete()
+        self.stdout.write(
+            format_report(label, latencies, timer.elapsed)
+            + f"  orders={done} ({done / timer.elapsed:.1f}/s)  "
+            + ' '.join(f'{code}={n}' for code, n in sorted(statuses.items()))
+        )
@@ -0,0 +1,61 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+
+from apiphoneshop import read_plans
+from apiphoneshop.models import Product, Order, OrderDetail
+from apiphoneshop.serializers import ProductListSerializer, OrderHistorySerializer
+
+from ._bench import cpu_ms
+
+
+class Command(BaseCommand):
+    help = (
+        "So sánh CPU mỗi dòng giữa ModelSerializer và read_plans (values_list + plan) cho danh sách sản phẩm "
+        "và lịch sử đơn hàng, tính cả thời gian đọc database. --min-speedup báo lỗi nếu read_plans không nhanh "
+        "hơn ít nhất chừng ấy lần."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200, help="Số sản phẩm trong danh sách")
+        parser.add_argument('--orders', type=int, default=200, help="Số đơn hàng trong danh sách")
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed-products', type=int, default=0,
+                            help="Tạo thêm dữ liệu bằng seed_catalog trước khi chạy")
+        parser.add_argument('--min-speedup', type=float, default=None)
+
+    def handle(self, *args, **options):
+        if options['seed_products']:
+            call_command('seed_catalog', products=options['seed_products'], stdout=self.stdout)
+        products = (Product.objects.select_related('Brand').prefetch_related('images', 'variants')
+                    .defer('Description').order_by('id')[:options['products']])
+        orders = (Order.objects.order_by('-created_date', '-id')
+                  .prefetch_related(Prefetch('order_details', queryset=OrderDetail.objects
+                                             .select_related('Variant__Product')
+                                             .defer('Variant__Product__Description')))[:options['orders']])
+        # .all() mỗi lần gọi: queryset đã đánh giá sẽ giữ cache, serializer không còn đọc database
+        cases = [
+            ('products', lambda: ProductListSerializer(products.all(), many=True).data,
+             lambda: read_plans.product_list(products.all())),
+            ('my-orders', lambda: OrderHistorySerializer(orders.all(), many=True).data,
+             lambda: read_plans.order_history(read_plans.order_history_queryset(orders.all()))),
+        ]
+
+        self.stdout.write(f"{'':<12} {'rows':>6} {'serializer':>14} {'read_plans':>14} {'speedup':>8}")
+        speedups = []
+        for label, serialize, plan in cases:
+            serializer_ms, expected = cpu_ms(serialize, options['repeat'])
+            if not expected:
+                self.stdout.write(f"{label:<12} không có dữ liệu, bỏ qua (chạy với --seed-products N)")
+                continue
+            plan_ms, data = cpu_ms(plan, options['repeat'])
+            if data != expected:
+                raise CommandError(f"read_plans output differs from the serializer for {label}.")
+            rows = len(data)
+            speedup = serializer_ms / plan_ms if plan_ms else float('inf')
+            speedups.append(speedup)
+            self.stdout.write(f"{label:<12} {rows:>6} {serializer_ms / rows * 1000:>10.1f}µs/row "
+                              f"{plan_ms / rows * 1000:>10.1f}µs/row {speedup:>7.1f}x")
+
+        if options['min_speedup'] is not None and speedups and min(speedups) < options['min_speedup']:
+            raise CommandError(f"read_plans is only {min(speedups):.1f}x faster, expected {options['min_speedup']}x.")
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction, DatabaseError
+
+from apiphoneshop.inventory import InsufficientStock, decrement_stock, enable_sharding, on_hand
+from apiphoneshop.models import Brand, Product, Variant
+
+from ._bench import Timer, format_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thông lượng trừ tồn kho đồng thời trên một variant với số shard khác nhau "
+        "(0 = một dòng Variant). Cần database hỗ trợ khóa theo dòng (MySQL/PostgreSQL); "
+        "SQLite khóa toàn bộ database khi ghi nên sẽ không thấy khác biệt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', default='0,1,4,16', help="Danh sách số shard, phân tách bởi dấu phẩy")
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--orders', type=int, default=2000, help="Số lượt trừ tồn kho mỗi cấu hình")
+
+    def handle(self, *args, **options):
+        brand, _ = Brand.objects.get_or_create(Name='Benchmark')
+        product = Product.objects.create(Name='Benchmark phone', Brand=brand, Description='')
+        try:
+            for shards in [int(value) for value in options['shards'].split(',')]:
+                self.run(product, shards, options['threads'], options['orders'])
+        finally:
+            product.delete()
+
+    def run(self, product, shards, threads, orders):
+        variant = Variant.objects.create(Product=product, SKU=f'BENCH-{shards}', Memory='-', Color='-',
+                                         Quantity=orders, Price=0, Img='bench.jpg')
+        enable_sharding(variant.id, shards)
+        per_thread = orders // threads
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker():
+            local, failed = [], 0
+            try:
+                for _ in range(per_thread):
+                    start = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            decrement_stock(variant.id, 1, shards=shards)
+                    except (InsufficientStock, DatabaseError):
+                        failed += 1
+                    local.append(time.perf_counter() - start)
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(local)
+                errors.append(failed)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        with Timer() as timer:
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+
+        variant.refresh_from_db()
+        remaining = on_hand(variant)
+        self.stdout.write(
+            format_report(f'shards={shards}', latencies, timer.elapsed)
+            + f'  errors={sum(errors)}  remaining={remaining}'
+        )
@@ -0,0 +1,38 @@
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from apiphoneshop import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Ghi ảnh chụp catalog (JSON + .gz + .br) vào CATALOG_SNAPSHOT['DIR']. Với --loop, chạy nền và chỉ ghi "
+        "lại khi catalog thay đổi, sau khoảng debounce. Cần cache dùng chung giữa web và tiến trình này."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Ghi lại dù nội dung không đổi")
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục như một tiến trình nền")
+        parser.add_argument('--interval', type=int, default=5, help="Số giây giữa hai lần kiểm tra khi dùng --loop")
+
+    def handle(self, *args, **options):
+        if options['loop'] and type(caches['default']).__name__ == 'LocMemCache':
+            # Cache riêng của tiến trình này: không bao giờ thấy đánh dấu "dirty" từ web server
+            raise CommandError("--loop needs a cache shared with the web workers, the default cache is LocMemCache.")
+        self.report(snapshot.build(force=options['force']))
+        last_build = time.monotonic()
+        while options['loop']:
+            time.sleep(options['interval'])
+            manifest = snapshot.build_if_due()
+            if manifest is None and time.monotonic() - last_build >= snapshot.snapshot_settings()['REFRESH']:
+                manifest = snapshot.build()
+            if manifest:
+                last_build = time.monotonic()
+                self.report(manifest)
+
+    def report(self, manifest):
+        sizes = ', '.join(f'{encoding} {size}' for encoding, size in manifest['encodings'].items())
+        self.stdout.write(f"Catalog {manifest['version']}: {manifest['products']} sản phẩm, "
+                          f"{manifest['size']} byte ({sizes}) -> {manifest['url']}")
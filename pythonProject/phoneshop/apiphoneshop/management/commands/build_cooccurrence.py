@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apiphoneshop import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại bảng \"thường được mua cùng\" (ProductCooccurrence) từ toàn bộ OrderDetail, "
+        "hoặc chỉ cắt bớt về top-K với --prune-only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None, help="Mặc định COOCCURRENCE_TOP_K")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prune-only', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['prune_only']:
+            deleted = recommendations.prune(options['top_k'])
+            self.stdout.write(f"Đã xóa {deleted} dòng ngoài top-K.")
+            return
+        written = recommendations.rebuild(options['top_k'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi {written} cặp sản phẩm."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apiphoneshop import rfm
+
+from ._bench import Timer
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại điểm RFM của khách hàng (CustomerRFM) và ma trận giữ chân theo cohort tháng (CohortRetention) "
+        "từ toàn bộ đơn hàng. Kết quả xem trong admin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000, help="Số đơn đọc mỗi lần")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        with Timer() as read:
+            facts = rfm.stream_facts(options['chunk_size'])
+        if facts is None:
+            rfm.rebuild(now=now)
+            self.stdout.write("Chưa có đơn hàng.")
+            return
+        with Timer() as compute:
+            scores = rfm.compute_rfm(facts, now)
+        with Timer() as write:
+            rfm.save(scores, facts, now)
+        self.stdout.write(
+            f"{len(scores['users'])} khách hàng, {int(scores['frequency'].sum())} đơn: đọc {read.elapsed:.2f}s, "
+            f"tính {compute.elapsed:.2f}s, ghi {write.elapsed:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS("Đã cập nhật CustomerRFM và CohortRetention."))
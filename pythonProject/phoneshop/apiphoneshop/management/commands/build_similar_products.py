@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apiphoneshop import similarity
+
+from ._bench import Timer
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại bảng \"điện thoại tương tự\" (ProductSimilarity) từ TechnicalSpecifications và giá variant, "
+        "in thời gian của từng bước (đọc dữ liệu, tính k láng giềng, ghi bảng)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None, help="Mặc định SIMILAR_PRODUCTS_TOP_K")
+        parser.add_argument('--batch-size', type=int, default=512,
+                            help="Số sản phẩm mỗi lô khi tính ma trận khoảng cách")
+
+    def handle(self, *args, **options):
+        with Timer() as load:
+            ids, features = similarity.load_features()
+        with Timer() as knn:
+            indices, distances = similarity.nearest_neighbours(features, options['top_k'] or similarity.top_k(),
+                                                               options['batch_size'])
+        with Timer() as save:
+            written = similarity.save(ids, indices, distances)
+        self.stdout.write(
+            f"{len(ids)} sản phẩm x {features.shape[1]} đặc trưng: đọc {load.elapsed:.2f}s, "
+            f"k láng giềng {knn.elapsed:.2f}s, ghi {save.elapsed:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi {written} cặp sản phẩm."))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apiphoneshop.images import process_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Tải ảnh ListImg/Variant đang lưu cục bộ lên Cloudinary bằng nhiều thread song song, "
+        "tạo thumbnail và thử lại với backoff khi lỗi (cấu hình trong IMAGE_INGEST)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--workers', type=int, default=None, help="Số upload chạy song song")
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục như một tiến trình nền")
+        parser.add_argument('--interval', type=int, default=5, help="Số giây chờ khi hàng đợi trống (dùng với --loop)")
+
+    def handle(self, *args, **options):
+        while True:
+            done, failed = process_uploads(batch_size=options['batch_size'], workers=options['workers'])
+            if done or failed or not options['loop']:
+                self.stdout.write(f"Đã tải lên {done} ảnh, {failed} ảnh lỗi.")
+            if not options['loop']:
+                break
+            if not done and not failed:
+                time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apiphoneshop.admission import process_queue
+
+
+class Command(BaseCommand):
+    help = "Xử lý các yêu cầu đặt hàng trong hàng đợi (OrderTicket) khi bật ORDER_ADMISSION."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục như một tiến trình nền")
+        parser.add_argument('--interval', type=float, default=0.5, help="Số giây nghỉ khi hàng đợi trống")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_queue(batch_size=options['batch_size'])
+            if not options['loop']:
+                self.stdout.write(f"Đã xử lý {processed} ticket.")
+                break
+            if not processed:
+                time.sleep(options['interval'])
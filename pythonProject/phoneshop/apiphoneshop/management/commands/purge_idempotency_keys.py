@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apiphoneshop.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Xóa các Idempotency-Key đã hết hạn (IDEMPOTENCY_KEY_TTL) theo từng lô."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        purged = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(f"Đã xóa {purged} khóa hết hạn.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apiphoneshop.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = "Xóa các tombstone của feed /sync/catalog/ cũ hơn SYNC_CATALOG['TOMBSTONE_DAYS'] ngày."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones(batch_size=options['batch_size'])
+        self.stdout.write(f"Đã xóa {deleted} tombstone hết hạn.")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apiphoneshop.inventory import release_expired, sync_sharded_quantities
+
+
+class Command(BaseCommand):
+    help = (
+        "Giải phóng các giữ chỗ tồn kho (StockReservation) đã hết hạn theo từng lô "
+        "và đồng bộ Variant.Quantity của các variant chia shard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục như một tiến trình nền")
+        parser.add_argument('--interval', type=int, default=60, help="Số giây giữa hai lần quét khi dùng --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired(batch_size=options['batch_size'])
+            synced = sync_sharded_quantities()
+            self.stdout.write(f"Đã giải phóng {released} giữ chỗ hết hạn, đồng bộ {synced} variant chia shard.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
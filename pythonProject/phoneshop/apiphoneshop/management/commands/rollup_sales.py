@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apiphoneshop import analytics
+from apiphoneshop.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại bảng tổng hợp doanh số theo ngày x variant (DailyVariantSales) trong một khoảng ngày. "
+        "Mặc định tính từ đơn hàng đầu tiên tới hôm nay; sau đó bảng được cập nhật dần khi ghi OrderDetail."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="YYYY-MM-DD")
+        parser.add_argument('--end', type=date.fromisoformat, help="YYYY-MM-DD, mặc định hôm nay")
+        parser.add_argument('--days', type=int, help="Chỉ tính lại N ngày gần nhất")
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.localdate()
+        if options['days']:
+            start = end - timedelta(days=options['days'] - 1)
+        elif options['start']:
+            start = options['start']
+        else:
+            first = Order.objects.order_by('created_date').values_list('created_date', flat=True).first()
+            if first is None:
+                self.stdout.write("Chưa có đơn hàng.")
+                return
+            start = timezone.localdate(first)
+        if start > end:
+            raise CommandError("--start phải trước --end.")
+        written = analytics.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi {written} dòng tổng hợp cho {start} .. {end}."))
@@ -0,0 +1,83 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apiphoneshop import richtext
+from apiphoneshop.models import Brand, Product, ListImg, Variant, User, Comment
+
+MEMORIES = ['64GB', '128GB', '256GB', '512GB', '1TB']
+COLORS = ['Black', 'White', 'Blue', 'Gold', 'Green']
+CHIPSETS = ['Snapdragon 8 Gen 3', 'Apple A17 Pro', 'Dimensity 9300', 'Exynos 2400', 'Tensor G3']
+
+
+class Command(BaseCommand):
+    help = "Tạo dữ liệu catalog giả (brand, product, variant, ảnh, bình luận) để benchmark và kiểm thử."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--variants', type=int, default=4, help="Số variant mỗi sản phẩm")
+        parser.add_argument('--images', type=int, default=3, help="Số ảnh mỗi sản phẩm")
+        parser.add_argument('--comments', type=int, default=2, help="Số bình luận mỗi variant")
+        parser.add_argument('--description-kb', type=int, default=4, help="Kích thước mô tả HTML mỗi sản phẩm")
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        paragraph = '<p>' + 'Điện thoại chính hãng, bảo hành 12 tháng. ' * 20 + '</p>'
+        description = paragraph * max(1, options['description_kb'] * 1024 // len(paragraph.encode()))
+        # bulk_create không gọi Product.save nên tự tính Excerpt
+        excerpt = richtext.excerpt(description)
+
+        brands = [Brand.objects.get_or_create(Name=name)[0] for name in ['Apple', 'Samsung', 'Xiaomi', 'Oppo', 'Google']]
+        start = Product.objects.count()
+        products = Product.objects.bulk_create([
+            Product(
+                Name=f'Phone {start + i}',
+                Brand=rng.choice(brands),
+                Description=description,
+                Excerpt=excerpt,
+                TechnicalSpecifications={
+                    'RAM': f'{rng.choice([4, 6, 8, 12, 16])}GB',
+                    'Storage': f'{rng.choice([64, 128, 256, 512])}GB',
+                    'Screen': f'{rng.choice([6.1, 6.4, 6.7, 6.8])} inch',
+                    'Battery': f'{rng.randrange(3000, 6000, 100)} mAh',
+                    'Chipset': rng.choice(CHIPSETS),
+                },
+            )
+            for i in range(options['products'])
+        ], batch_size=500)
+
+        ListImg.objects.bulk_create([
+            ListImg(Product=product, TitlePhoto=f'seed/{product.id}-{i}.jpg')
+            for product in products for i in range(options['images'])
+        ], batch_size=1000)
+
+        variants = Variant.objects.bulk_create([
+            Variant(
+                Product=product,
+                SKU=f'SKU-{product.id}-{i}',
+                Memory=rng.choice(MEMORIES),
+                Color=rng.choice(COLORS),
+                Quantity=rng.randint(0, 500),
+                Price=rng.randrange(2_000_000, 40_000_000, 10_000),
+                CompareAtPrice=None,
+                Img=f'seed/{product.id}-v{i}.jpg',
+            )
+            for product in products for i in range(options['variants'])
+        ], batch_size=1000)
+
+        if options['comments']:
+            users = [
+                User.objects.create_user(f'seed-{start}-{i}', Address='Hà Nội', first_name='Seed', last_name=str(i))
+                for i in range(10)
+            ]
+            Comment.objects.bulk_create([
+                Comment(User=rng.choice(users), Variant=variant, Comment='Sản phẩm tốt', Star=rng.randint(1, 5))
+                for variant in variants for _ in range(options['comments'])
+            ], batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã tạo {len(products)} sản phẩm, {len(variants)} variant."
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apiphoneshop.inventory import enable_sharding
+from apiphoneshop.models import Variant
+
+
+class Command(BaseCommand):
+    help = (
+        "Bật/tắt chế độ tồn kho chia shard cho các variant bán chạy (flash sale). "
+        "--shards 0 gộp tồn kho trở lại Variant.Quantity."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('variant_ids', nargs='+', type=int)
+        parser.add_argument('--shards', type=int, default=8)
+
+    def handle(self, *args, **options):
+        if options['shards'] < 0:
+            raise CommandError("--shards phải >= 0.")
+        for variant_id in options['variant_ids']:
+            try:
+                variant = enable_sharding(variant_id, options['shards'])
+            except Variant.DoesNotExist:
+                raise CommandError(f"Variant {variant_id} không tồn tại.")
+            self.stdout.write(f"Variant {variant.SKU}: {variant.StockShards} shard, tồn kho {variant.Quantity}.")
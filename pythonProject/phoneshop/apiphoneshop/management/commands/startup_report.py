@@ -0,0 +1,99 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Chạy trong một tiến trình Python mới (như worker vừa khởi động) với -X importtime
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+loaded = time.perf_counter()
+django.setup()
+ready = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+routed = time.perf_counter()
+sys.stdout.write(json.dumps({'settings': loaded - start, 'apps_ready': ready - loaded,
+                             'urlconf': routed - ready, 'total': routed - start}))
+"""
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """[(module, self µs, cumulative µs, độ sâu)] từ output của -X importtime."""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules.append((name, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return modules
+
+
+def package_totals(modules):
+    """Tổng thời gian import (self) theo package gốc, lớn nhất trước."""
+    totals = defaultdict(int)
+    for name, own, _, _ in modules:
+        totals[name.split('.')[0]] += own
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thời gian khởi động lạnh của một worker: nạp settings, django.setup() (apps ready), nạp URLconf, "
+        "và thời gian import theo package/module. Dùng --max-ms để báo lỗi khi khởi động chậm hơn ngưỡng."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help="Số package/module chậm nhất được liệt kê")
+        parser.add_argument('--runs', type=int, default=3, help="Số lần đo, lấy lần nhanh nhất")
+        parser.add_argument('--json', action='store_true', help="In kết quả dạng JSON để lưu lại và so sánh")
+        parser.add_argument('--max-ms', type=float, default=None, help="Ngưỡng tổng thời gian khởi động (ms)")
+
+    def probe(self):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+               'PYTHONPATH': os.pathsep.join(path for path in sys.path if path)}
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], env=env, cwd=settings.BASE_DIR,
+                                capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+        return json.loads(result.stdout), parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        phases, modules = min((self.probe() for _ in range(max(options['runs'], 1))),
+                              key=lambda run: run[0]['total'])
+        top = options['top']
+        report = {
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in phases.items()},
+            'modules': len(modules),
+            'packages_ms': [[name, round(own / 1000, 1)] for name, own in package_totals(modules)[:top]],
+            'slowest_modules_ms': [[name, round(own / 1000, 1), round(cumulative / 1000, 1)]
+                                   for name, own, cumulative, _ in sorted(modules, key=lambda m: m[1],
+                                                                          reverse=True)[:top]],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write("Giai đoạn (ms):")
+            for name, value in report['phases_ms'].items():
+                self.stdout.write(f"  {name:<12} {value:>8.1f}")
+            self.stdout.write(f"Package import chậm nhất (ms, {report['modules']} module):")
+            for name, value in report['packages_ms']:
+                self.stdout.write(f"  {name:<40} {value:>8.1f}")
+            self.stdout.write("Module chậm nhất (ms, self / cumulative):")
+            for name, own, cumulative in report['slowest_modules_ms']:
+                self.stdout.write(f"  {name:<40} {own:>8.1f} {cumulative:>8.1f}")
+
+        total = report['phases_ms']['total']
+        if options['max_ms'] is not None and total > options['max_ms']:
+            raise CommandError(f"Startup took {total:.1f}ms, over the {options['max_ms']:.1f}ms budget.")
@@ -0,0 +1,84 @@
+"""Nén response (brotli nếu có, nếu không thì gzip) theo Accept-Encoding của client."""
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # brotli là tùy chọn, khi đó chỉ dùng gzip
+    brotli = None
+
+DEFAULTS = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    # Không nén text/html mặc định: trang admin chứa CSRF token (tấn công BREACH)
+    'CONTENT_TYPES': ('application/json', 'application/javascript', 'text/javascript', 'text/css', 'image/svg+xml'),
+}
+
+
+def compression_settings():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_COMPRESSION', {})}
+
+
+def accepted_encodings(header):
+    """{encoding: q} từ header Accept-Encoding, bỏ các encoding có q=0."""
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    # Cùng q thì ưu tiên br (nhỏ hơn gzip ở mức nén tương đương)
+    candidates = [(accepted.get(name, accepted.get('*', 0)), -i, name) for i, name in enumerate(available)]
+    quality, _, name = max(candidates)
+    return name if quality > 0 else None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        conf = compression_settings()
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in conf['CONTENT_TYPES']:
+            return response
+        # Dù có nén hay không, nội dung phụ thuộc Accept-Encoding nên cache trung gian phải phân biệt
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < conf['MIN_SIZE']:
+            return response
+
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=conf['BROTLI_QUALITY'])
+        elif encoding == 'gzip':
+            compressed = gzip.compress(response.content, compresslevel=conf['GZIP_LEVEL'], mtime=0)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # ETag mạnh không còn đúng với nội dung đã nén (giống GZipMiddleware của Django)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
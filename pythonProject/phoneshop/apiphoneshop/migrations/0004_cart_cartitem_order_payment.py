@@ -0,0 +1,57 @@
+# Generated by Django 5.1.3 on 2026-10-19 18:49
+
+import ckeditor_uploader.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0003_alter_variant_compareatprice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='Payment',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='Description',
+            field=ckeditor_uploader.fields.RichTextUploadingField(),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='TechnicalSpecifications',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='Cart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('User', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('Quantity', models.IntegerField(blank=True, null=True)),
+                ('Cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='apiphoneshop.cart')),
+                ('Variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='apiphoneshop.variant')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 18:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0004_cart_cartitem_order_payment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('Quantity', models.IntegerField()),
+                ('ExpiresAt', models.DateTimeField()),
+                ('Cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='apiphoneshop.cart')),
+                ('Variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='apiphoneshop.variant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['Variant', 'ExpiresAt', 'Quantity'], name='reservation_active_idx'), models.Index(fields=['ExpiresAt'], name='reservation_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('Cart', 'Variant'), name='unique_reservation_cart_variant')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-19 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0005_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variant',
+            name='StockShards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='VariantStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Shard', models.PositiveSmallIntegerField()),
+                ('Quantity', models.IntegerField(default=0)),
+                ('Variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='apiphoneshop.variant')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('Variant', 'Shard'), name='unique_variant_stock_shard')],
+            },
+        ),
+    ]
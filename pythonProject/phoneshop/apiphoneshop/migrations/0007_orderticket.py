@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 18:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0006_variant_stock_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('Payload', models.JSONField(default=dict)),
+                ('Status', models.CharField(default='queued', max_length=20)),
+                ('ResponseStatus', models.IntegerField(blank=True, null=True)),
+                ('Result', models.JSONField(blank=True, null=True)),
+                ('Order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='apiphoneshop.order')),
+                ('User', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_tickets', to=settings.AUTH_USER_MODEL)),
+                ('Variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_tickets', to='apiphoneshop.variant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['Status', 'id'], name='orderticket_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 18:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0007_orderticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('Key', models.CharField(max_length=255)),
+                ('Fingerprint', models.CharField(max_length=64)),
+                ('Status', models.CharField(default='in_progress', max_length=20)),
+                ('ResponseStatus', models.IntegerField(blank=True, null=True)),
+                ('ResponseBody', models.JSONField(blank=True, null=True)),
+                ('ExpiresAt', models.DateTimeField(db_index=True)),
+                ('User', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('User', 'Key'), name='unique_idempotency_key_per_user')],
+            },
+        ),
+    ]
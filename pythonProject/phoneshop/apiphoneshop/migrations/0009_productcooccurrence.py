@@ -0,0 +1,27 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0008_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Count', models.IntegerField(default=0)),
+                ('Product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cooccurrences', to='apiphoneshop.product')),
+                ('Related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apiphoneshop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['Product', '-Count'], name='cooccurrence_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('Product', 'Related'), name='unique_product_cooccurrence')],
+            },
+        ),
+    ]
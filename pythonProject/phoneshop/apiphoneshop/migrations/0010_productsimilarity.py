@@ -0,0 +1,27 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0009_productcooccurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Distance', models.FloatField()),
+                ('Product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='apiphoneshop.product')),
+                ('Similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apiphoneshop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['Product', 'Distance'], name='similarity_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('Product', 'Similar'), name='unique_product_similarity')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:07
+
+from django.db import migrations, models
+from django.db.models import Max, Min, Sum
+
+
+def backfill_order_summary(apps, schema_editor):
+    Order = apps.get_model('apiphoneshop', 'Order')
+    OrderDetail = apps.get_model('apiphoneshop', 'OrderDetail')
+    summaries = (OrderDetail.objects.values('Order_id').order_by('Order_id')
+                 .annotate(total=Sum('Price'), items=Sum('Quantity'), first=Min('Status'), last=Max('Status')))
+    batch = []
+    for summary in summaries.iterator(chunk_size=2000):
+        batch.append(Order(id=summary['Order_id'], Total=summary['total'] or 0, ItemCount=summary['items'] or 0,
+                           Status=summary['first'] if summary['first'] == summary['last'] else 'Processing'))
+        if len(batch) == 2000:
+            Order.objects.bulk_update(batch, ['Total', 'ItemCount', 'Status'])
+            batch = []
+    Order.objects.bulk_update(batch, ['Total', 'ItemCount', 'Status'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0010_productsimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='ItemCount',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='Status',
+            field=models.CharField(default='Pending', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='Total',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['User', '-created_date'], name='order_history_idx'),
+        ),
+        migrations.RunPython(backfill_order_summary, migrations.RunPython.noop),
+    ]
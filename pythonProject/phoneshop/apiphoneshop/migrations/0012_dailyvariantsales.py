@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0011_order_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyVariantSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Date', models.DateField()),
+                ('Color', models.CharField(max_length=50)),
+                ('Memory', models.CharField(max_length=50)),
+                ('Units', models.IntegerField(default=0)),
+                ('Revenue', models.FloatField(default=0)),
+                ('Orders', models.IntegerField(default=0)),
+                ('Brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apiphoneshop.brand')),
+                ('Variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='apiphoneshop.variant')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('Date', 'Variant'), name='unique_daily_variant_sales')],
+            },
+        ),
+    ]
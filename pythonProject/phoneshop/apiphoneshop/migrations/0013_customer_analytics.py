@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0012_dailyvariantsales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortRetention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Cohort', models.DateField()),
+                ('MonthOffset', models.PositiveSmallIntegerField()),
+                ('Customers', models.IntegerField()),
+                ('CohortSize', models.IntegerField()),
+                ('ComputedAt', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('Cohort', 'MonthOffset'), name='unique_cohort_month')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerRFM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('FirstOrderDate', models.DateField()),
+                ('LastOrderDate', models.DateField()),
+                ('Recency', models.IntegerField()),
+                ('Frequency', models.IntegerField()),
+                ('Monetary', models.FloatField()),
+                ('RScore', models.PositiveSmallIntegerField()),
+                ('FScore', models.PositiveSmallIntegerField()),
+                ('MScore', models.PositiveSmallIntegerField()),
+                ('ComputedAt', models.DateTimeField()),
+                ('User', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rfm', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:12
+
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+# Bản sao của apiphoneshop.richtext.excerpt tại thời điểm tạo migration: migration không import code
+# đang chạy, để sửa richtext sau này không làm thay đổi hay hỏng việc migrate database mới
+
+
+class _TextExtractor(HTMLParser):
+    INLINE_TAGS = {'a', 'b', 'em', 'i', 'span', 'strong', 'sub', 'sup', 'u'}
+    DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.DROP_CONTENT_TAGS:
+            self.dropping += 1
+        elif tag not in self.INLINE_TAGS:
+            self.text.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in self.DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+        elif tag not in self.INLINE_TAGS:
+            self.text.append(' ')
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.text.append(data)
+
+
+def excerpt(html):
+    parser = _TextExtractor()
+    parser.feed(html or '')
+    parser.close()
+    text = re.sub(r'\s+', ' ', ''.join(parser.text)).strip()
+    return Truncator(text).chars(getattr(settings, 'PRODUCT_EXCERPT_LENGTH', 300))
+
+
+def backfill_excerpt(apps, schema_editor):
+    Product = apps.get_model('apiphoneshop', 'Product')
+    batch = []
+    for product in Product.objects.only('id', 'Description').iterator(chunk_size=500):
+        product.Excerpt = excerpt(product.Description)
+        batch.append(product)
+        if len(batch) == 500:
+            Product.objects.bulk_update(batch, ['Excerpt'])
+            batch = []
+    Product.objects.bulk_update(batch, ['Excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0013_customer_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='Excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(backfill_excerpt, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0014_product_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Model', models.CharField(max_length=20)),
+                ('ObjectId', models.BigIntegerField()),
+                ('DeletedAt', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='brand',
+            index=models.Index(fields=['update_date', 'id'], name='brand_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listimg',
+            index=models.Index(fields=['update_date', 'id'], name='listimg_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['update_date', 'id'], name='product_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(fields=['update_date', 'id'], name='variant_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogtombstone',
+            index=models.Index(fields=['DeletedAt', 'id'], name='tombstone_sync_idx'),
+        ),
+    ]
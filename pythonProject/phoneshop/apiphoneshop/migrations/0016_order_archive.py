@@ -0,0 +1,50 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0015_catalog_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('Note', models.TextField(blank=True)),
+                ('ShipAddress', models.TextField()),
+                ('ShipDate', models.DateTimeField()),
+                ('Payment', models.CharField(blank=True, max_length=50, null=True)),
+                ('Total', models.FloatField(default=0)),
+                ('ItemCount', models.IntegerField(default=0)),
+                ('Status', models.CharField(default='Pending', max_length=50)),
+                ('created_date', models.DateTimeField()),
+                ('update_date', models.DateTimeField()),
+                ('ArchivedAt', models.DateTimeField(auto_now_add=True)),
+                ('Discount', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='apiphoneshop.discount')),
+                ('User', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderDetail',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('Quantity', models.IntegerField()),
+                ('Price', models.FloatField()),
+                ('Status', models.CharField(max_length=50)),
+                ('created_date', models.DateTimeField()),
+                ('update_date', models.DateTimeField()),
+                ('Order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_details', to='apiphoneshop.archivedorder')),
+                ('Variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apiphoneshop.variant')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['User', '-created_date'], name='archived_order_history_idx'),
+        ),
+    ]
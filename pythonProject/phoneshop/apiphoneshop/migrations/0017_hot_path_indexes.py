@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:28
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    # Gộp các dòng CartItem trùng (Cart, Variant) vào dòng có id nhỏ nhất trước khi thêm ràng buộc unique
+    CartItem = apps.get_model('apiphoneshop', 'CartItem')
+    duplicates = (CartItem.objects.values('Cart_id', 'Variant_id').order_by()
+                  .annotate(n=Count('id'), keep=Min('id'), quantity=Sum('Quantity')).filter(n__gt=1))
+    for row in duplicates.iterator():
+        CartItem.objects.filter(id=row['keep']).update(Quantity=row['quantity'])
+        CartItem.objects.filter(Cart_id=row['Cart_id'], Variant_id=row['Variant_id']).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0016_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['ShipDate'], name='archived_order_shipdate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['Variant', '-created_date'], name='comment_variant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discount',
+            index=models.Index(fields=['Code', 'StartDate', 'EndDate'], name='discount_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['ShipDate'], name='order_shipdate_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('Cart', 'Variant'), name='unique_cartitem_cart_variant'),
+        ),
+    ]
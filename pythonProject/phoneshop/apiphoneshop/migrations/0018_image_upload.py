@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-19 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0017_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('Model', models.CharField(max_length=20)),
+                ('ObjectId', models.BigIntegerField()),
+                ('LocalPath', models.CharField(max_length=255)),
+                ('Thumbnail', models.CharField(blank=True, max_length=255)),
+                ('Status', models.CharField(default='pending', max_length=20)),
+                ('Attempts', models.PositiveSmallIntegerField(default=0)),
+                ('NextAttemptAt', models.DateTimeField(auto_now_add=True)),
+                ('LastError', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['Status', 'NextAttemptAt'], name='imageupload_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-19 20:16
+
+from django.db import migrations, models
+
+
+def drop_invalid_reservations(apps, schema_editor):
+    # Giữ chỗ số lượng <= 0 (tạo trước khi add-to-cart kiểm tra quantity) không giữ gì, xóa trước khi thêm ràng buộc
+    StockReservation = apps.get_model('apiphoneshop', 'StockReservation')
+    StockReservation.objects.filter(Quantity__lt=1).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiphoneshop', '0018_image_upload'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_invalid_reservations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stockreservation',
+            name='Quantity',
+            field=models.PositiveIntegerField(),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.contrib.auth.models import AbstractUser
 from cloudinary.models import CloudinaryField
 from ckeditor.fields import RichTextField
 
+from .richtext import excerpt
+
 
 class BaseModel(models.Model):
     created_date = models.DateTimeField(auto_now_add=True)
@@ -25,6 +27,12 @@ class User(AbstractUser):
 class Brand(BaseModel):
     Name = models.CharField(max_length=255)
 
+    class Meta:
+        # Feed đồng bộ /sync/catalog/ đọc theo (update_date, id)
+        indexes = [
+            models.Index(fields=['update_date', 'id'], name='brand_sync_idx'),
+        ]
+
     def __str__(self):
         return f"({self.Name})"
 
@@ -33,16 +41,39 @@ class Product(BaseModel):
     Name = models.CharField(max_length=255)
     Brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='products')
     Description = RichTextUploadingField()
+    # Đoạn văn bản thuần đầu tiên của Description, dùng cho danh sách (Description bị defer)
+    Excerpt = models.TextField(blank=True, editable=False)
     TechnicalSpecifications = models.JSONField(default=dict, blank=True)
 
+    class Meta:
+        # Feed đồng bộ /sync/catalog/ đọc theo (update_date, id)
+        indexes = [
+            models.Index(fields=['update_date', 'id'], name='product_sync_idx'),
+        ]
+
     def __str__(self):
         return f"({self.Name})"
 
+    def save(self, *args, **kwargs):
+        # Không tính lại khi Description chưa được nạp (instance lấy từ queryset đã defer)
+        if 'Description' not in self.get_deferred_fields():
+            self.Excerpt = excerpt(self.Description)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'Description' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'Excerpt'}
+        super().save(*args, **kwargs)
+
 
 class ListImg(BaseModel):
     Product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     TitlePhoto = CloudinaryField('image')
 
+    class Meta:
+        # Feed đồng bộ /sync/catalog/ đọc theo (update_date, id)
+        indexes = [
+            models.Index(fields=['update_date', 'id'], name='listimg_sync_idx'),
+        ]
+
     def __str__(self):
         return f"({self.Product})"
 
@@ -56,18 +87,42 @@ class Variant(BaseModel):
     Price = models.FloatField()
     CompareAtPrice = models.FloatField(max_length=50, null=True, blank=True)
     Img = CloudinaryField('image')
+    # Số shard tồn kho (0 = không chia). Khi chia shard, tồn kho thật nằm ở VariantStockShard
+    # và Quantity chỉ là giá trị hiển thị được đồng bộ định kỳ.
+    StockShards = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        # Feed đồng bộ /sync/catalog/ đọc theo (update_date, id)
+        indexes = [
+            models.Index(fields=['update_date', 'id'], name='variant_sync_idx'),
+        ]
 
     def __str__(self):
         return f"({self.SKU})"
 
 
 class Order(BaseModel):
+    PENDING = 'Pending'
+    # Các dòng của đơn đang ở nhiều trạng thái khác nhau
+    MIXED = 'Processing'
+
     User = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     Discount = models.ForeignKey('Discount', null=True, blank=True, on_delete=models.SET_NULL, related_name='orders')
     Note = models.TextField(blank=True)
     ShipAddress = models.TextField()
     ShipDate = models.DateTimeField()
     Payment = models.CharField(max_length=50, null=True, blank=True)
+    # Tổng hợp từ OrderDetail, được cập nhật mỗi khi ghi OrderDetail (xem apiphoneshop.signals)
+    Total = models.FloatField(default=0)
+    ItemCount = models.IntegerField(default=0)
+    Status = models.CharField(max_length=50, default=PENDING)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['User', '-created_date'], name='order_history_idx'),
+            # Doanh thu theo tháng lọc theo khoảng ShipDate
+            models.Index(fields=['ShipDate'], name='order_shipdate_idx'),
+        ]
 
 
 class OrderDetail(BaseModel):
@@ -78,12 +133,51 @@ class OrderDetail(BaseModel):
     Status = models.CharField(max_length=50)
 
 
+class ArchivedOrder(models.Model):
+    # Đơn hàng cũ được chuyển khỏi bảng Order bởi lệnh apply_retention, giữ nguyên id và mốc thời gian
+    id = models.BigIntegerField(primary_key=True)
+    User = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    Discount = models.ForeignKey('Discount', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    Note = models.TextField(blank=True)
+    ShipAddress = models.TextField()
+    ShipDate = models.DateTimeField()
+    Payment = models.CharField(max_length=50, null=True, blank=True)
+    Total = models.FloatField(default=0)
+    ItemCount = models.IntegerField(default=0)
+    Status = models.CharField(max_length=50, default=Order.PENDING)
+    created_date = models.DateTimeField()
+    update_date = models.DateTimeField()
+    ArchivedAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['User', '-created_date'], name='archived_order_history_idx'),
+            models.Index(fields=['ShipDate'], name='archived_order_shipdate_idx'),
+        ]
+
+
+class ArchivedOrderDetail(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    Order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='order_details')
+    Variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='+')
+    Quantity = models.IntegerField()
+    Price = models.FloatField()
+    Status = models.CharField(max_length=50)
+    created_date = models.DateTimeField()
+    update_date = models.DateTimeField()
+
+
 class Comment(BaseModel):
     User = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     Variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='comments')
     Comment = models.TextField()
     Star = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['Variant', '-created_date'], name='comment_variant_idx'),
+        ]
+
 
 class Discount(BaseModel):
     Code = models.CharField(max_length=100)
@@ -92,6 +186,12 @@ class Discount(BaseModel):
     StartDate = models.DateField()
     EndDate = models.DateField()
 
+    class Meta:
+        # Tra mã giảm giá còn hiệu lực: Code = ? AND StartDate <= ? AND EndDate >= ?
+        indexes = [
+            models.Index(fields=['Code', 'StartDate', 'EndDate'], name='discount_code_idx'),
+        ]
+
     def __str__(self):
         return f"Cart of {self.Code}"
 
@@ -108,5 +208,209 @@ class CartItem(BaseModel):
     Variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='cart_items')
     Quantity = models.IntegerField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['Cart', 'Variant'], name='unique_cartitem_cart_variant'),
+        ]
+
     def __str__(self):
         return f"Item {self.Variant.SKU} in Cart {self.Cart.id}"
+
+
+class StockReservation(BaseModel):
+    # Giữ chỗ tồn kho có thời hạn cho một variant trong giỏ hàng
+    Cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    Variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='reservations')
+    Quantity = models.PositiveIntegerField()
+    ExpiresAt = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['Cart', 'Variant'], name='unique_reservation_cart_variant'),
+        ]
+        indexes = [
+            # Tổng số lượng đang giữ của một variant được tính hoàn toàn trên index này
+            models.Index(fields=['Variant', 'ExpiresAt', 'Quantity'], name='reservation_active_idx'),
+            models.Index(fields=['ExpiresAt'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Hold {self.Quantity} x {self.Variant_id} for Cart {self.Cart_id}"
+
+
+class VariantStockShard(models.Model):
+    # Một phần tồn kho của variant, để các lượt đặt hàng đồng thời không cùng khóa một dòng Variant
+    Variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='stock_shards')
+    Shard = models.PositiveSmallIntegerField()
+    Quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['Variant', 'Shard'], name='unique_variant_stock_shard'),
+        ]
+
+    def __str__(self):
+        return f"Shard {self.Shard} of {self.Variant_id}"
+
+
+class OrderTicket(BaseModel):
+    # Yêu cầu đặt hàng bị đưa vào hàng đợi khi variant đang quá tải (xem apiphoneshop.admission)
+    QUEUED = 'queued'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    User = models.ForeignKey(User, on_delete=models.CASCADE, related_name='order_tickets')
+    Variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='order_tickets')
+    Payload = models.JSONField(default=dict)
+    Status = models.CharField(max_length=20, default=QUEUED)
+    Order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    ResponseStatus = models.IntegerField(null=True, blank=True)
+    Result = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['Status', 'id'], name='orderticket_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ticket {self.id} ({self.Status})"
+
+
+class IdempotencyKey(BaseModel):
+    # Response đã lưu cho một Idempotency-Key của người dùng (xem apiphoneshop.idempotency)
+    IN_PROGRESS = 'in_progress'
+    COMPLETED = 'completed'
+
+    User = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    Key = models.CharField(max_length=255)
+    Fingerprint = models.CharField(max_length=64)
+    Status = models.CharField(max_length=20, default=IN_PROGRESS)
+    ResponseStatus = models.IntegerField(null=True, blank=True)
+    ResponseBody = models.JSONField(null=True, blank=True)
+    ExpiresAt = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['User', 'Key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.Key} ({self.Status})"
+
+
+class ProductCooccurrence(models.Model):
+    # Số "giỏ mua" có cả Product và Related, chỉ giữ top-K Related cho mỗi Product (xem apiphoneshop.recommendations)
+    Product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cooccurrences')
+    Related = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='+')
+    Count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['Product', 'Related'], name='unique_product_cooccurrence'),
+        ]
+        indexes = [
+            models.Index(fields=['Product', '-Count'], name='cooccurrence_top_idx'),
+        ]
+
+
+class ProductSimilarity(models.Model):
+    # k sản phẩm có thông số và giá gần nhất với Product (xem apiphoneshop.similarity)
+    Product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similarities')
+    Similar = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='+')
+    Distance = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['Product', 'Similar'], name='unique_product_similarity'),
+        ]
+        indexes = [
+            models.Index(fields=['Product', 'Distance'], name='similarity_top_idx'),
+        ]
+
+
+class DailyVariantSales(models.Model):
+    # Doanh số theo ngày đặt hàng của từng variant (xem apiphoneshop.analytics).
+    # Brand/Color/Memory được chép từ variant để truy vấn theo khoảng ngày chỉ đọc bảng này.
+    Date = models.DateField()
+    Variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='daily_sales')
+    Brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='+')
+    Color = models.CharField(max_length=50)
+    Memory = models.CharField(max_length=50)
+    Units = models.IntegerField(default=0)
+    Revenue = models.FloatField(default=0)
+    Orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['Date', 'Variant'], name='unique_daily_variant_sales'),
+        ]
+
+
+class CustomerRFM(models.Model):
+    # Điểm recency/frequency/monetary (1-5, theo ngũ phân vị) của từng khách hàng (xem apiphoneshop.rfm)
+    User = models.OneToOneField(User, on_delete=models.CASCADE, related_name='rfm')
+    FirstOrderDate = models.DateField()
+    LastOrderDate = models.DateField()
+    Recency = models.IntegerField()  # số ngày từ đơn gần nhất
+    Frequency = models.IntegerField()
+    Monetary = models.FloatField()
+    RScore = models.PositiveSmallIntegerField()
+    FScore = models.PositiveSmallIntegerField()
+    MScore = models.PositiveSmallIntegerField()
+    ComputedAt = models.DateTimeField()
+
+
+class CohortRetention(models.Model):
+    # Số khách của cohort (tháng đặt đơn đầu tiên) còn đặt hàng ở tháng thứ MonthOffset
+    Cohort = models.DateField()
+    MonthOffset = models.PositiveSmallIntegerField()
+    Customers = models.IntegerField()
+    CohortSize = models.IntegerField()
+    ComputedAt = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['Cohort', 'MonthOffset'], name='unique_cohort_month'),
+        ]
+
+    @property
+    def Retention(self):
+        return self.Customers / self.CohortSize if self.CohortSize else 0
+
+
+class CatalogTombstone(models.Model):
+    # Dấu vết của Brand/Product/Variant/ListImg đã xóa, để /sync/catalog/ báo cho client xóa theo
+    Model = models.CharField(max_length=20)
+    ObjectId = models.BigIntegerField()
+    DeletedAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['DeletedAt', 'id'], name='tombstone_sync_idx'),
+        ]
+
+
+class ImageUpload(BaseModel):
+    # Ảnh ListImg/Variant đã lưu cục bộ, chờ worker tải lên Cloudinary (xem apiphoneshop.images)
+    PENDING = 'pending'
+    UPLOADING = 'uploading'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    Model = models.CharField(max_length=20)
+    ObjectId = models.BigIntegerField()
+    LocalPath = models.CharField(max_length=255)
+    Thumbnail = models.CharField(max_length=255, blank=True)
+    Status = models.CharField(max_length=20, default=PENDING)
+    Attempts = models.PositiveSmallIntegerField(default=0)
+    NextAttemptAt = models.DateTimeField(auto_now_add=True)
+    LastError = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['Status', 'NextAttemptAt'], name='imageupload_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.Model} {self.ObjectId}: {self.LocalPath} ({self.Status})"
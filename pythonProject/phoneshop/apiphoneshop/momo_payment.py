@@ -1,10 +1,12 @@
 import hashlib
 import hmac
 import uuid
-import requests
 
 
 def create_momo_payment(amount):
+    # requests chỉ cần khi có đơn thanh toán MoMo, không import lúc khởi động worker
+    import requests
+
     endpoint = "https://test-payment.momo.vn/v2/gateway/api/create"
     partner_code = "MOMO"
     access_key = "F8BBA842ECF85"
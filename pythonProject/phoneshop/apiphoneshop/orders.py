@@ -0,0 +1,126 @@
+import logging
+from datetime import datetime
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .inventory import InsufficientStock, consume
+from .models import Variant, Order, OrderDetail, Cart
+from .pricing import InvalidDiscount, find_discount, line_total, unit_price
+from .recommendations import record_order
+
+logger = logging.getLogger(__name__)
+
+
+class OrderRejected(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Order could not be placed."
+
+
+def refresh_order_summary(order_id):
+    """Tính lại Total, ItemCount và Status của đơn từ các OrderDetail (một SELECT và một UPDATE)."""
+    summary = OrderDetail.objects.filter(Order_id=order_id).aggregate(
+        total=Sum('Price'), items=Sum('Quantity'), first=Min('Status'), last=Max('Status'))
+    if summary['first'] is None:
+        order_status = Order.PENDING
+    elif summary['first'] == summary['last']:
+        order_status = summary['first']
+    else:
+        order_status = Order.MIXED
+    Order.objects.filter(pk=order_id).update(Total=summary['total'] or 0, ItemCount=summary['items'] or 0,
+                                             Status=order_status)
+
+
+def place_order(user, variant_id, quantity, ship_address, payment, discount_code=None, ship_date=None,
+                on_created=None):
+    """
+    Tạo đơn hàng một sản phẩm: tính giá, áp mã giảm giá, trừ tồn kho, gọi MoMo và gửi mail xác nhận.
+    Dùng chung cho OrderViewSet.create và worker xử lý hàng đợi đặt hàng.
+
+    Lỗi chỉ được ném ra khi đơn chưa được lưu: sau khi commit, lỗi gửi mail được ghi log thay vì ném ra,
+    để client thử lại không tạo thêm một đơn nữa. on_created(order) chạy trong cùng transaction với đơn.
+    """
+    # Fetch variant
+    variant = get_object_or_404(Variant, id=variant_id)
+
+    # Giá tính như /cart/quote/ (xem apiphoneshop.pricing), từ dòng variant vừa đọc
+    discount = None
+    if discount_code:
+        try:
+            discount = find_discount(discount_code, use_cache=False)
+        except InvalidDiscount as e:
+            raise OrderRejected(str(e))
+    price = line_total(unit_price(variant.Price, variant.CompareAtPrice), quantity, discount)
+
+    with transaction.atomic():
+        # Decrease variant stock, dùng phần giữ chỗ trong giỏ hàng nếu có
+        try:
+            consume(Cart.objects.filter(User=user).first(), variant.id, quantity)
+        except InsufficientStock:
+            raise OrderRejected("Not enough stock for this variant.")
+
+        # Create Order
+        order = Order.objects.create(
+            User=user,
+            Discount=discount,
+            ShipAddress=ship_address,
+            ShipDate=ship_date or datetime.now(),
+            Payment=payment
+        )
+
+        # Create OrderDetail
+        order_detail = OrderDetail.objects.create(
+            Order=order,
+            Variant=variant,
+            Quantity=quantity,
+            Price=price,
+            Status='Pending'
+        )
+        if on_created is not None:
+            on_created(order)
+        # Cập nhật bảng "thường được mua cùng" sau khi đơn được lưu
+        transaction.on_commit(lambda: record_order(order))
+    if payment == 'MoMo':
+        from .momo_payment import create_momo_payment
+        momo_response = create_momo_payment(
+            amount=(int)(price)
+        )
+        if isinstance(momo_response, dict):
+            if momo_response.get('resultCode') == 0:
+                short_link = momo_response.get('payUrl')
+                order.short_link = short_link
+                order_detail.Status = "Done"
+                order_detail.save()
+    # Total/ItemCount/Status được cập nhật trong database khi lưu OrderDetail
+    order.refresh_from_db(fields=['Total', 'ItemCount', 'Status'])
+
+    # send mail to customer
+    subject = "Order Confirmation"
+    message = (
+        f"Dear {user.username},\n\n"
+        f"Thank you for your order!\n\n"
+        f"Order Details:\n"
+        f"- Order ID: {order.id}\n"
+        f"- Product: {variant.Product.Name}\n"
+        f"- Variant: {variant.SKU}\n"
+        f"- Quantity: {quantity}\n"
+        f"- Total Price: ${price:.2f}\n\n"
+        f"Shipping to: {ship_address}\n"
+        f"Payment Method: {payment}\n\n"
+        f"Best regards,\nYour Store Team"
+    )
+    transaction.on_commit(lambda: send_confirmation(order, subject, message, user.email))
+    return order
+
+
+def send_confirmation(order, subject, message, email):
+    try:
+        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email], fail_silently=False)
+    except Exception:
+        # Đơn đã được lưu: không để lỗi SMTP biến request thành lỗi và bị thử lại thành đơn thứ hai
+        logger.exception("Could not send the confirmation email for order %s", order.id)
@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OrderHistoryPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CommentFeedPagination(CursorPagination):
+    # Mới nhất trước; id phân định các bình luận cùng created_date
+    ordering = ('-created_date', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def filter_comment_feed(queryset, filters):
+    """Bộ lọc của feed bình luận (CommentFeedQuerySerializer đã kiểm tra), dùng chung cho /cmt/ và /async/cmt/."""
+    if 'variant' in filters:
+        queryset = queryset.filter(Variant_id=filters['variant'])
+    if 'product' in filters:
+        queryset = queryset.filter(Variant__Product_id=filters['product'])
+    return queryset
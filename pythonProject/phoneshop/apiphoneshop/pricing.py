@@ -0,0 +1,121 @@
+"""
+Tính giá dùng chung cho đặt hàng (orders.place_order) và báo giá giỏ hàng (/cart/quote/).
+
+Mỗi dòng được tính như một đơn hàng: đơn giá là CompareAtPrice nếu có, ngược lại là Price; mã giảm giá trừ theo
+phần trăm (ưu tiên) hoặc một số tiền cố định trên dòng đó, và giá không xuống dưới 0. Checkout tạo một đơn cho
+mỗi variant nên báo giá giỏ hàng là tổng các dòng tính theo cùng cách.
+
+Giá variant và mã giảm giá được cache PRICING['CACHE_SECONDS'] giây trong cache dùng chung; signals và
+bulk_edit.reprice xóa cache sau khi giá hoặc mã thay đổi được commit. Đặt hàng luôn kiểm tra lại mã trên database.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Discount, Variant
+
+DEFAULTS = {
+    'CACHE_SECONDS': 5 * 60,
+}
+
+PRICE_KEY = 'pricing:variant:%s'
+DISCOUNT_KEY = 'pricing:discount:%s'
+
+
+class InvalidDiscount(Exception):
+    def __init__(self):
+        super().__init__("Invalid or expired discount code.")
+
+
+def pricing_settings():
+    return {**DEFAULTS, **getattr(settings, 'PRICING', {})}
+
+
+def _discount_key(code):
+    # Mã do người dùng nhập: băm để khóa cache không chứa khoảng trắng hay ký tự lạ
+    return DISCOUNT_KEY % hashlib.md5(code.encode()).hexdigest()
+
+
+def variant_prices(variant_ids):
+    """{variant id: (Price, CompareAtPrice)}, một query cho các variant chưa có trong cache."""
+    keys = {variant_id: PRICE_KEY % variant_id for variant_id in set(variant_ids)}
+    cached = cache.get_many(keys.values())
+    prices = {variant_id: cached[key] for variant_id, key in keys.items() if key in cached}
+    missing = keys.keys() - prices.keys()
+    if missing:
+        fetched = {variant_id: (price, compare_at) for variant_id, price, compare_at in
+                   Variant.objects.filter(id__in=missing).values_list('id', 'Price', 'CompareAtPrice')}
+        cache.set_many({keys[variant_id]: value for variant_id, value in fetched.items()},
+                       pricing_settings()['CACHE_SECONDS'])
+        prices.update(fetched)
+    return prices
+
+
+def find_discount(code, today=None, use_cache=True):
+    """
+    Discount còn hiệu lực với mã `code` (bản có id nhỏ nhất), InvalidDiscount nếu không có.
+    use_cache=False đọc thẳng database (checkout không được dùng mã vừa bị sửa hay xóa).
+    """
+    key = _discount_key(code)
+    discounts = cache.get(key) if use_cache else None
+    if discounts is None:
+        # Cache cả mã không tồn tại: thử mã liên tục không đi tới database
+        discounts = list(Discount.objects.filter(Code=code).order_by('id'))
+        cache.set(key, discounts, pricing_settings()['CACHE_SECONDS'])
+    today = today or timezone.localdate()
+    for discount in discounts:
+        if discount.StartDate <= today <= discount.EndDate:
+            return discount
+    raise InvalidDiscount()
+
+
+def forget_prices(variant_ids):
+    keys = [PRICE_KEY % variant_id for variant_id in variant_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_discount(code):
+    key = _discount_key(code)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def unit_price(price, compare_at_price):
+    return compare_at_price if compare_at_price else price
+
+
+def line_total(unit, quantity, discount=None):
+    """Thành tiền của một dòng sau giảm giá, không âm."""
+    total = unit * quantity
+    if discount is not None:
+        if discount.DiscountPercent:
+            total -= total * (discount.DiscountPercent / 100)
+        elif discount.DiscountMoney:
+            total -= discount.DiscountMoney
+    return max(total, 0)
+
+
+def quote(items, discount_code=None):
+    """
+    Báo giá cho [(variant id, số lượng)]: từng dòng và tổng cộng, với một query giá (hoặc không nếu đã cache)
+    và một query mã giảm giá. Variant không tồn tại gây KeyError; mã không hợp lệ gây InvalidDiscount.
+    """
+    discount = find_discount(discount_code) if discount_code else None
+    prices = variant_prices(variant_id for variant_id, _ in items)
+    lines = []
+    for variant_id, quantity in items:
+        unit = unit_price(*prices[variant_id])
+        subtotal = unit * quantity
+        total = line_total(unit, quantity, discount)
+        lines.append({'variant_id': variant_id, 'quantity': quantity, 'unit_price': unit,
+                      'subtotal': subtotal, 'discount': subtotal - total, 'total': total})
+    return {
+        'lines': lines,
+        'discount_code': discount.Code if discount else None,
+        'item_count': sum(line['quantity'] for line in lines),
+        'subtotal': sum(line['subtotal'] for line in lines),
+        'discount': sum(line['discount'] for line in lines),
+        'total': sum(line['total'] for line in lines),
+    }
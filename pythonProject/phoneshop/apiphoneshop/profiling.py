@@ -0,0 +1,192 @@
+"""
+Profile một request trên production mà không cần deploy lại.
+
+ProfilingMiddleware chạy view dưới cProfile kèm một thread lấy mẫu stack khi:
+- request có header X-Profile (PROFILING['HEADER']) và người dùng là staff (xác thực trước khi chạy view), hoặc
+- action của viewset nằm trong PROFILING['SAMPLE_RATES'] (vd. {'ProductViewSet.list': 0.01}) và trúng mẫu.
+
+Mỗi lần profile ghi <id>.pstats (mở bằng pstats/snakeviz), <id>.collapsed (định dạng của flamegraph.pl/speedscope)
+và <id>.json (metadata) vào PROFILING['DIR']; chỉ giữ KEEP lần gần nhất. Staff xem và tải về qua /profiles/;
+header X-Profile-Id chỉ được trả cho staff.
+"""
+import asyncio
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'HEADER': 'X-Profile',
+    # {'<ViewSet>.<action>': tỉ lệ request được profile}
+    'SAMPLE_RATES': {},
+    # Thư mục không nằm trong MEDIA_ROOT: dump chứa đường dẫn mã nguồn và tham số request
+    'DIR': None,
+    'KEEP': 50,
+    'SAMPLE_INTERVAL': 0.005,
+}
+
+KINDS = {'pstats': '.pstats', 'collapsed': '.collapsed'}
+
+
+def profiling_settings():
+    conf = {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+    conf['DIR'] = Path(conf['DIR'] or Path(settings.BASE_DIR) / 'profiles')
+    return conf
+
+
+def action_name(view_func, method):
+    """'<ViewSet>.<action>' cho view của DRF viewset, None cho các view khác."""
+    actions = getattr(view_func, 'actions', None)
+    if not actions or method.lower() not in actions:
+        return None
+    return f'{view_func.cls.__name__}.{actions[method.lower()]}'
+
+
+def is_staff(request, view_func):
+    """
+    Người dùng là staff theo cách xác thực của view (token OAuth2 chỉ được DRF xác thực bên trong view,
+    nên xác thực trước ở đây); lỗi xác thực coi như không phải staff.
+    """
+    if getattr(request.user, 'is_staff', False):
+        return True
+    view_class = getattr(view_func, 'cls', None)
+    authenticators = getattr(view_class, 'authentication_classes', api_settings.DEFAULT_AUTHENTICATION_CLASSES)
+    try:
+        user = Request(request, authenticators=[auth() for auth in authenticators]).user
+    except APIException:
+        return False
+    return getattr(user, 'is_staff', False)
+
+
+def _frame_label(frame):
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    """Định kỳ chụp stack của một thread, đếm theo stack dạng collapsed (gốc;...;lá)."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id, self.interval = thread_id, interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _metas(directory):
+    # id bắt đầu bằng thời điểm ghi nên sắp theo tên là mới nhất trước
+    return sorted(directory.glob('*.json'), reverse=True)
+
+
+def _prune(directory, keep):
+    for meta in _metas(directory)[keep:]:
+        for suffix in ('.json', *KINDS.values()):
+            meta.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def save(profiler, sampler, meta):
+    """Ghi một lần profile vào ring buffer, trả về id."""
+    conf = profiling_settings()
+    directory = conf['DIR']
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{timezone.now():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    base = directory / profile_id
+    profiler.dump_stats(base.with_suffix('.pstats'))
+    base.with_suffix('.collapsed').write_text(
+        ''.join(f'{stack} {count}\n' for stack, count in sampler.stacks.most_common()))
+    # .json ghi sau cùng: list_profiles() chỉ thấy các lần profile đã ghi đủ
+    base.with_suffix('.json').write_text(json.dumps({'id': profile_id, **meta}))
+    _prune(directory, conf['KEEP'])
+    return profile_id
+
+
+def list_profiles():
+    directory = profiling_settings()['DIR']
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for meta in _metas(directory):
+        try:
+            profiles.append(json.loads(meta.read_text()))
+        except (OSError, ValueError):
+            continue  # bị _prune xóa giữa chừng
+    return profiles
+
+
+def profile_path(profile_id, kind):
+    """Đường dẫn file dump, None nếu id/kind không hợp lệ hoặc file đã bị xoay vòng."""
+    if kind not in KINDS or not profile_id or os.path.basename(profile_id) != profile_id:
+        return None
+    path = profiling_settings()['DIR'] / f'{profile_id}{KINDS[kind]}'
+    return path if path.is_file() else None
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """Đặt cuối MIDDLEWARE để chỉ đo view, không đo các middleware khác."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        conf = profiling_settings()
+        if not conf['ENABLED'] or asyncio.iscoroutinefunction(view_func):
+            return None
+        action = action_name(view_func, request.method)
+        sampled = action in conf['SAMPLE_RATES'] and random.random() < conf['SAMPLE_RATES'][action]
+        # Header từ người dùng không phải staff bị bỏ qua trước khi chạy profiler
+        requested = conf['HEADER'] in request.headers and is_staff(request, view_func)
+        if not requested and not sampled:
+            return None
+
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), conf['SAMPLE_INTERVAL'])
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            response = profiler.runcall(view_func, request, *view_args, **view_kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                # Response của DRF render sau view, phần serialize JSON cũng cần được đo
+                profiler.runcall(response.render)
+        finally:
+            duration = time.perf_counter() - started
+            sampler.stop()
+
+        profile_id = save(profiler, sampler, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'action': action,
+            'trigger': 'sampled' if sampled else 'header',
+            'user': getattr(request.user, 'username', None) or None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'created': timezone.now().isoformat(),
+        })
+        # Sau view request.user là người dùng DRF đã xác thực; lần lấy mẫu của người dùng khác vẫn được ghi
+        # nhưng không tiết lộ id cho họ
+        if requested or getattr(request.user, 'is_staff', False):
+            response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,173 @@
+"""
+Đường đọc nhanh cho các danh sách lớn: /products/, /async/products/, ảnh chụp catalog và /order/my-orders/.
+
+Thay vì nạp model instance rồi chạy ModelSerializer (tạo serializer và field cho mỗi dòng lồng nhau), dữ liệu
+được đọc bằng values_list() và dựng thành dict theo một "plan" được biên dịch một lần khi import: danh sách
+(khóa JSON, vị trí cột, hàm chuyển đổi). Kết quả phải giống hệt serializer tương ứng (xem ReadPlanContractTests);
+khi thêm field vào ProductListSerializer/VariantSerializer/OrderHistorySerializer cần sửa plan ở đây.
+
+FAST_LIST_SERIALIZATION = False để quay lại dùng serializer.
+"""
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import CharField, ExpressionWrapper, F
+from django.utils import timezone
+
+from . import retention
+from .images import stored_image_url
+from .models import ListImg, Variant
+
+
+def _datetime(value):
+    # Như DateTimeField.to_representation của DRF (timezone hiện tại, isoformat, 'Z' cho UTC), rẻ hơn nhiều lần
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _image(column):
+    """Cột ảnh đọc dạng chuỗi thô: bỏ qua CloudinaryField.from_db_value, URL được nhớ theo chuỗi."""
+    return ExpressionWrapper(F(column), output_field=CharField())
+
+
+def _converted(getter, convert):
+    def get(row):
+        value = getter(row)
+        return None if value is None else convert(value)
+    return get
+
+
+def _none():
+    return None
+
+
+def enabled():
+    return getattr(settings, 'FAST_LIST_SERIALIZATION', True)
+
+
+class RowPlan:
+    """
+    Dựng dict từ một tuple của values_list(self.columns). Mỗi field là một trong:
+    - (khóa,) hoặc (khóa, cột) hoặc (khóa, cột, hàm chuyển đổi): cột là tên hoặc expression, hàm không được
+      gọi với None;
+    - (khóa, (field, ...)): object lồng nhau đọc từ cùng dòng (quan hệ nối bằng cột 'FK__field');
+    - (khóa, hàm không tham số): giá trị không lấy từ database, vd. list để gắn các dòng con vào sau.
+
+    Mỗi field được biên dịch thành một hàm row -> giá trị (itemgetter khi chỉ đọc cột), nên build() chỉ là
+    một dict comprehension.
+    """
+
+    def __init__(self, *fields):
+        self.columns = []
+        self.build = self._compile(fields)
+
+    def _compile(self, fields):
+        steps = []
+        for key, *spec in fields:
+            source = spec[0] if spec else key
+            if isinstance(source, tuple):
+                steps.append((key, self._compile(source)))
+            elif callable(source):
+                steps.append((key, lambda row, make=source: make()))
+            else:
+                if source not in self.columns:
+                    self.columns.append(source)
+                getter = itemgetter(self.columns.index(source))
+                if len(spec) > 1:
+                    getter = _converted(getter, spec[1])
+                steps.append((key, getter))
+        steps = tuple(steps)
+        return lambda row: {key: get(row) for key, get in steps}
+
+    def rows(self, queryset, *extra):
+        """values_list() gồm các cột của plan rồi tới các cột `extra` (vd. khóa của dòng cha) ở cuối."""
+        return queryset.values_list(*self.columns, *extra)
+
+
+LIST_IMG = RowPlan(
+    ('id',),
+    ('url_TitlePhoto', _image('TitlePhoto'), stored_image_url),
+)
+
+VARIANT = RowPlan(
+    ('id',),
+    ('Product', (('id', 'Product_id'), ('Name', 'Product__Name'))),
+    ('SKU',),
+    ('Memory',),
+    ('Color',),
+    ('Quantity',),
+    ('Price',),
+    ('CompareAtPrice',),
+    ('img_url', _image('Img'), stored_image_url),
+)
+
+PRODUCT_LIST = RowPlan(
+    ('id',),
+    ('Name',),
+    ('Brand', (('id', 'Brand_id'), ('Name', 'Brand__Name'))),
+    ('Excerpt',),
+    ('TechnicalSpecifications',),
+    ('images', list),
+    ('variants', list),
+)
+
+ORDER_HISTORY_DETAIL = RowPlan(
+    ('id',),
+    ('Variant', (
+        ('id', 'Variant_id'),
+        ('Name', 'Variant__Product__Name'),
+        ('SKU', 'Variant__SKU'),
+        ('Memory', 'Variant__Memory'),
+        ('Color', 'Variant__Color'),
+        ('img_url', _image('Variant__Img'), stored_image_url),
+    )),
+    ('Quantity',),
+    ('Price',),
+    ('Status',),
+)
+
+ORDER_HISTORY = RowPlan(
+    ('id',),
+    ('User',),
+    ('Discount',),
+    ('Note',),
+    ('ShipAddress',),
+    ('ShipDate', 'ShipDate', _datetime),
+    ('Payment',),
+    ('Total',),
+    ('ItemCount',),
+    ('Status',),
+    ('order_details', list),
+    ('short_link', _none),
+)
+
+
+def _attach(parents, key, plan, queryset, parent_column):
+    """Gắn các dòng con (sắp theo id như prefetch_related) vào list `key` của dòng cha tương ứng."""
+    for row in plan.rows(queryset.order_by(parent_column, 'id'), parent_column):
+        parents[row[-1]][key].append(plan.build(row))
+
+
+def product_list(queryset):
+    """Giống ProductListSerializer(queryset, many=True).data, với 3 query."""
+    products = [PRODUCT_LIST.build(row) for row in PRODUCT_LIST.rows(queryset.prefetch_related(None))]
+    by_id = {product['id']: product for product in products}
+    if by_id:
+        _attach(by_id, 'images', LIST_IMG, ListImg.objects.filter(Product_id__in=list(by_id)), 'Product_id')
+        _attach(by_id, 'variants', VARIANT, Variant.objects.filter(Product_id__in=list(by_id)), 'Product_id')
+    return products
+
+
+def order_history_queryset(queryset):
+    """queryset Order/ArchivedOrder dưới dạng tuple cho ORDER_HISTORY, dùng với retention.OrderHistory."""
+    return ORDER_HISTORY.rows(queryset.prefetch_related(None))
+
+
+def order_history(page):
+    """Giống OrderHistorySerializer(page, many=True).data cho một trang tuple từ order_history_queryset()."""
+    orders = [ORDER_HISTORY.build(row) for row in page]
+    by_id = {order['id']: order for order in orders}
+    if by_id:
+        for details in retention.order_details(Order_id__in=list(by_id)):
+            _attach(by_id, 'order_details', ORDER_HISTORY_DETAIL, details, 'Order_id')
+    return orders
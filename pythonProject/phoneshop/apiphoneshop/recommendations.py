@@ -0,0 +1,111 @@
+"""
+"Thường được mua cùng": bảng đồng xuất hiện sản phẩm tính từ lịch sử OrderDetail.
+
+Mỗi đơn hàng qua API chỉ có một sản phẩm, nên một "giỏ mua" là mọi sản phẩm một người dùng
+đặt trong cùng một ngày (bao gồm cả đơn nhiều dòng tạo từ admin).
+"""
+import heapq
+from collections import Counter, defaultdict
+from itertools import groupby
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import OrderDetail, ProductCooccurrence
+from .retention import order_details
+
+
+def top_k():
+    return getattr(settings, 'COOCCURRENCE_TOP_K', 20)
+
+
+def iter_baskets(chunk_size=5000):
+    """Duyệt OrderDetail theo (người dùng, thời gian) từng chunk, trả về tập product_id của từng giỏ."""
+    # Đơn đã lưu trữ (xem apiphoneshop.retention) được trộn vào theo cùng thứ tự
+    rows = heapq.merge(*[details.order_by('Order__User_id', 'Order__created_date')
+                         .values_list('Order__User_id', 'Order__created_date', 'Variant__Product_id')
+                         .iterator(chunk_size=chunk_size) for details in order_details()],
+                       key=lambda row: row[:2])
+    for _, basket in groupby(rows, key=lambda row: (row[0], row[1].date())):
+        yield {product_id for _, _, product_id in basket}
+
+
+def rebuild(k=None, chunk_size=5000):
+    """Tính lại toàn bộ bảng trong một lượt đọc, chỉ ghi top-K sản phẩm liên quan cho mỗi sản phẩm."""
+    k = k or top_k()
+    counts = defaultdict(Counter)
+    for basket in iter_baskets(chunk_size):
+        for product_id in basket:
+            for related_id in basket:
+                if related_id != product_id:
+                    counts[product_id][related_id] += 1
+
+    rows = [
+        ProductCooccurrence(Product_id=product_id, Related_id=related_id, Count=count)
+        for product_id, related in counts.items()
+        for related_id, count in related.most_common(k)
+    ]
+    with transaction.atomic():
+        ProductCooccurrence.objects.all().delete()
+        ProductCooccurrence.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def increment(product_id, related_id):
+    updated = (ProductCooccurrence.objects.filter(Product_id=product_id, Related_id=related_id)
+               .update(Count=F('Count') + 1))
+    if not updated:
+        try:
+            with transaction.atomic():
+                ProductCooccurrence.objects.create(Product_id=product_id, Related_id=related_id, Count=1)
+        except IntegrityError:
+            increment(product_id, related_id)
+
+
+def record_order(order):
+    """Cập nhật tăng dần khi có đơn mới: chỉ cộng các cặp mà giỏ trong ngày của người dùng vừa có thêm."""
+    day_details = OrderDetail.objects.filter(Order__User_id=order.User_id,
+                                             Order__created_date__date=order.created_date.date())
+    before = set(day_details.exclude(Order=order).values_list('Variant__Product_id', flat=True))
+    basket = before | set(day_details.filter(Order=order).values_list('Variant__Product_id', flat=True))
+    touched = set()
+    for product_id in basket - before:
+        for related_id in basket - {product_id}:
+            increment(product_id, related_id)
+            touched.add(product_id)
+            if related_id in before:
+                increment(related_id, product_id)
+                touched.add(related_id)
+    # Giữ bảng ở top-K sau mỗi đơn; cặp mới bị cắt sẽ được tính lại chính xác ở lần rebuild tiếp theo
+    k = top_k()
+    for product_id in touched:
+        trim(product_id, k)
+
+
+def prune(k=None):
+    """Xóa các dòng ngoài top-K của mỗi sản phẩm (phát sinh do cập nhật tăng dần). Trả về số dòng đã xóa."""
+    k = k or top_k()
+    deleted = 0
+    over = (ProductCooccurrence.objects.values('Product_id').order_by()
+            .annotate(n=Count('id')).filter(n__gt=k).values_list('Product_id', flat=True))
+    for product_id in over:
+        deleted += trim(product_id, k)
+    return deleted
+
+
+def trim(product_id, k):
+    """Xóa các dòng ngoài top-K của một sản phẩm. Trả về số dòng đã xóa."""
+    rows = ProductCooccurrence.objects.filter(Product_id=product_id)
+    cutoff = rows.order_by('-Count', 'Related_id').values_list('Count', 'Related_id')[k:k + 1].first()
+    if cutoff is None:
+        return 0
+    count, related_id = cutoff
+    # Cùng thứ tự với bought_together: dòng thứ k+1 trở đi
+    return rows.filter(Q(Count__lt=count) | Q(Count=count, Related_id__gte=related_id)).delete()[0]
+
+
+def bought_together(product_id, k=None):
+    return (ProductCooccurrence.objects.filter(Product_id=product_id).select_related('Related')
+            .defer('Related__Description')
+            .order_by('-Count', 'Related_id')[:k or top_k()])
@@ -0,0 +1,38 @@
+"""Renderer/parser JSON dùng orjson thay cho module json chuẩn trong DRF."""
+import orjson
+from django.utils.http import parse_header_parameters
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+# Kiểu orjson không tự serialize được (Decimal, lazy string, QuerySet, timedelta...) đi qua encoder của DRF
+_drf_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(renderers.BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = self.options
+        # Browsable API và "Accept: application/json; indent=4" yêu cầu thụt lề
+        renderer_context = renderer_context or {}
+        media_params = parse_header_parameters(accepted_media_type or '')[1]
+        if renderer_context.get('indent') or media_params.get('indent'):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_drf_encoder.default, option=options)
+
+
+class ORJSONParser(parsers.BaseParser):
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,121 @@
+"""
+Dọn dữ liệu cũ để các bảng nóng (Cart, CartItem, Order, OrderDetail) không tăng mãi.
+
+- Giỏ hàng không có thay đổi nào (cả Cart lẫn CartItem) trong CART_IDLE_DAYS ngày và không còn giữ chỗ
+  tồn kho bị xóa theo từng lô; CartViewSet.get_cart tạo lại giỏ trống khi người dùng quay lại.
+- Đơn hàng đặt trước ARCHIVE_AFTER_DAYS ngày được chép sang ArchivedOrder/ArchivedOrderDetail (giữ nguyên id
+  và mốc thời gian) rồi xóa khỏi bảng chính trong cùng transaction, mỗi lô BATCH_SIZE đơn.
+
+Các API đọc đơn hàng và các job thống kê đọc cả hai bảng qua các hàm ở cuối module.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import Cart, Order, OrderDetail, OrderTicket, ArchivedOrder, ArchivedOrderDetail
+
+DEFAULTS = {
+    'CART_IDLE_DAYS': 30,
+    'ARCHIVE_AFTER_DAYS': 365,
+    'BATCH_SIZE': 1000,
+}
+
+
+def retention_settings():
+    return {**DEFAULTS, **getattr(settings, 'ORDER_RETENTION', {})}
+
+
+def _copy_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.name != 'ArchivedAt']
+
+
+def stale_carts(now=None):
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=retention_settings()['CART_IDLE_DAYS'])
+    return (Cart.objects.filter(update_date__lt=cutoff)
+            .exclude(cart_items__update_date__gte=cutoff)
+            .exclude(reservations__ExpiresAt__gt=now))
+
+
+def purge_carts(batch_size=None, now=None):
+    """Xóa giỏ hàng bỏ quên theo từng lô. Trả về số giỏ đã xóa."""
+    batch_size = batch_size or retention_settings()['BATCH_SIZE']
+    now = now or timezone.now()
+    purged = 0
+    while True:
+        ids = list(stale_carts(now).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        # Lọc lại điều kiện khi xóa: giỏ có thể vừa được dùng lại sau khi đọc danh sách id
+        purged += stale_carts(now).filter(id__in=ids).delete()[1].get(Cart._meta.label, 0)
+        if len(ids) < batch_size:
+            return purged
+
+
+def archive_orders(batch_size=None, now=None):
+    """Chuyển đơn hàng cũ sang bảng lưu trữ theo từng lô. Trả về số đơn đã chuyển."""
+    conf = retention_settings()
+    batch_size = batch_size or conf['BATCH_SIZE']
+    cutoff = (now or timezone.now()) - timedelta(days=conf['ARCHIVE_AFTER_DAYS'])
+    # Luôn giữ đơn có id lớn nhất ở bảng chính: MySQL 5.7 đặt lại AUTO_INCREMENT = MAX(id) + 1 khi khởi động,
+    # nếu bảng trống id cũ có thể bị cấp lại và trùng với đơn đã lưu trữ
+    newest = Order.objects.aggregate(newest=Max('id'))['newest']
+    if newest is None:
+        return 0
+    order_fields, detail_fields = _copy_fields(ArchivedOrder), _copy_fields(ArchivedOrderDetail)
+    archived = 0
+    while True:
+        ids = list(Order.objects.filter(created_date__lt=cutoff, id__lt=newest).order_by('id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return archived
+        with transaction.atomic():
+            orders = Order.objects.select_for_update().filter(id__in=ids)
+            ArchivedOrder.objects.bulk_create(ArchivedOrder(**row) for row in orders.values(*order_fields))
+            details = OrderDetail.objects.filter(Order_id__in=ids)
+            ArchivedOrderDetail.objects.bulk_create(
+                (ArchivedOrderDetail(**row) for row in details.values(*detail_fields)), batch_size=batch_size)
+            OrderTicket.objects.filter(Order_id__in=ids).update(Order=None)
+            # Xóa bằng một câu DELETE, không gửi post_delete: signal của OrderDetail sẽ tính lại tổng đơn
+            # và DailyVariantSales từng dòng trong khi dữ liệu chỉ chuyển sang bảng khác
+            details._raw_delete(details.db)
+            Order.objects.filter(id__in=ids)._raw_delete(orders.db)
+        archived += len(ids)
+
+
+def find_order(**filters):
+    """Tìm một đơn ở bảng chính, không có thì tìm trong bảng lưu trữ."""
+    return Order.objects.filter(**filters).first() or ArchivedOrder.objects.filter(**filters).first()
+
+
+class OrderHistory:
+    """
+    Danh sách đơn mới nhất trước gồm Order rồi ArchivedOrder, dùng được với Paginator.
+    Đơn lưu trữ luôn cũ hơn đơn còn ở bảng chính nên chỉ cần nối hai queryset đã sắp xếp.
+    """
+
+    def __init__(self, orders, archived):
+        self.orders, self.archived = orders, archived
+
+    @cached_property
+    def hot_count(self):
+        return self.orders.count()
+
+    def count(self):
+        return self.hot_count + self.archived.count()
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        rows = list(self.orders[start:stop]) if start < self.hot_count else []
+        if stop is None or stop > self.hot_count:
+            rows += self.archived[max(start - self.hot_count, 0):None if stop is None else stop - self.hot_count]
+        return rows
+
+
+def order_details(**filters):
+    """OrderDetail và ArchivedOrderDetail thỏa filters (các lookup như Order__created_date__gte dùng được cho cả hai)."""
+    return [OrderDetail.objects.filter(**filters), ArchivedOrderDetail.objects.filter(**filters)]
@@ -0,0 +1,170 @@
+"""
+Phân tích khách hàng: điểm RFM và ma trận giữ chân theo cohort tháng, tính bằng NumPy.
+
+Đơn hàng được đọc theo thứ tự User_id từng chunk (values_list + iterator). Mỗi chunk chỉ được
+gộp theo khách hàng đã đọc đủ (khách cuối chunk được giữ lại sang chunk sau), nên bộ nhớ tỷ lệ với
+số khách hàng chứ không với số đơn. Số tiền lấy từ Order.Total.
+"""
+import heapq
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Order, ArchivedOrder, CustomerRFM, CohortRetention
+
+SCORES = 5
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def to_months(timestamps):
+    """Epoch giây (UTC) -> số tháng kể từ 1970-01."""
+    return timestamps.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+
+
+class CustomerFacts:
+    """Gộp các chunk đơn hàng (đã sắp theo User_id) thành mảng theo khách hàng và ma trận cohort."""
+
+    def __init__(self, first_month, months):
+        self.first_month = first_month
+        self.users, self.first, self.last, self.count, self.total = [], [], [], [], []
+        # active[c, k]: số khách có đơn đầu ở tháng c và có đơn ở tháng c + k
+        self.active = np.zeros((months, months), dtype=np.int64)
+
+    def add(self, users, timestamps, totals):
+        starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+        self.users.append(users[starts])
+        self.first.append(np.minimum.reduceat(timestamps, starts))
+        self.last.append(np.maximum.reduceat(timestamps, starts))
+        self.count.append(np.diff(np.r_[starts, len(users)]))
+        self.total.append(np.add.reduceat(totals, starts))
+
+        group = np.repeat(np.arange(len(starts)), self.count[-1])
+        months = to_months(timestamps) - self.first_month
+        cohort = to_months(self.first[-1])[group] - self.first_month
+        # (khách, tháng) không trùng lặp, mã hóa thành một số để np.unique chạy trên mảng 1 chiều
+        width = len(self.active)
+        pairs = np.unique(group * width + months)
+        pair_group, pair_month = np.divmod(pairs, width)
+        np.add.at(self.active, (cohort[pair_group], pair_month - cohort[pair_group]), 1)
+
+    def arrays(self):
+        def join(parts, dtype):
+            return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+        return (join(self.users, np.int64), join(self.first, np.int64), join(self.last, np.int64),
+                join(self.count, np.int64), join(self.total, np.float64))
+
+
+def stream_facts(chunk_size=50000):
+    """Đọc toàn bộ đơn hàng theo từng chunk. Trả về CustomerFacts, hoặc None nếu chưa có đơn."""
+    bounds = [model.objects.aggregate(first=Min('created_date'), last=Max('created_date'))
+              for model in (Order, ArchivedOrder)]
+    bounds = [b for b in bounds if b['first'] is not None]
+    if not bounds:
+        return None
+    first_month = int(to_months(np.array([int(min(b['first'] for b in bounds).timestamp())]))[0])
+    last_month = int(to_months(np.array([int(max(b['last'] for b in bounds).timestamp())]))[0])
+    facts = CustomerFacts(first_month, last_month - first_month + 1)
+
+    # Đơn đã lưu trữ (xem apiphoneshop.retention) được trộn vào theo cùng thứ tự User_id
+    rows = heapq.merge(*[model.objects.order_by('User_id').values_list('User_id', 'created_date', 'Total')
+                         .iterator(chunk_size=chunk_size) for model in (Order, ArchivedOrder)],
+                       key=lambda row: row[0])
+    users, timestamps, totals = [], [], []
+
+    def flush(keep_last_user):
+        # Giữ lại các đơn của khách cuối cùng vì có thể còn đơn ở chunk sau
+        split = len(users)
+        if keep_last_user:
+            split = users.index(users[-1])
+        if split:
+            facts.add(np.array(users[:split], dtype=np.int64), np.array(timestamps[:split], dtype=np.int64),
+                      np.array(totals[:split], dtype=np.float64))
+            del users[:split], timestamps[:split], totals[:split]
+
+    for user_id, created, total in rows:
+        users.append(user_id)
+        timestamps.append(int(created.timestamp()))
+        totals.append(total)
+        if len(users) >= chunk_size and users[-1] != users[0]:
+            flush(keep_last_user=True)
+    flush(keep_last_user=False)
+    return facts
+
+
+def quantile_scores(values, higher_is_better=True):
+    """Điểm 1..SCORES theo ngũ phân vị; các giá trị bằng nhau luôn cùng điểm."""
+    values = values if higher_is_better else -values
+    if not len(values):
+        return np.empty(0, dtype=np.int64)
+    edges = np.quantile(values, np.arange(1, SCORES) / SCORES)
+    return 1 + np.searchsorted(edges, values, side='left')
+
+
+def compute_rfm(facts, now):
+    users, first, last, count, total = facts.arrays()
+    recency = (int(now.timestamp()) - last) // SECONDS_PER_DAY
+    return {
+        'users': users,
+        'first': first,
+        'last': last,
+        'recency': recency,
+        'frequency': count,
+        'monetary': total,
+        'r': quantile_scores(recency, higher_is_better=False),
+        'f': quantile_scores(count),
+        'm': quantile_scores(total),
+    }
+
+
+def cohort_rows(facts):
+    """(tháng cohort, offset, số khách còn mua, cỡ cohort) cho mọi ô khác 0 của ma trận."""
+    sizes = facts.active[:, 0]
+    cohorts, offsets = np.nonzero(facts.active)
+    months = (facts.first_month + cohorts).astype('datetime64[M]').astype('datetime64[D]')
+    return zip(months.tolist(), offsets.tolist(), facts.active[cohorts, offsets].tolist(), sizes[cohorts].tolist())
+
+
+def bulk_insert(model, objs, batch_size):
+    # bulk_create dựng cả danh sách trong bộ nhớ, nên chia lô trước khi gọi
+    objs = iter(objs)
+    while batch := list(islice(objs, batch_size)):
+        model.objects.bulk_create(batch)
+
+
+def save(rfm, facts, now, batch_size=5000):
+    def day(timestamps):
+        return timestamps.astype('datetime64[s]').astype('datetime64[D]').tolist()
+
+    with transaction.atomic():
+        CustomerRFM.objects.all().delete()
+        columns = zip(rfm['users'].tolist(), day(rfm['first']), day(rfm['last']), rfm['recency'].tolist(),
+                      rfm['frequency'].tolist(), rfm['monetary'].tolist(), rfm['r'].tolist(), rfm['f'].tolist(),
+                      rfm['m'].tolist())
+        bulk_insert(CustomerRFM, (
+            CustomerRFM(User_id=user_id, FirstOrderDate=first, LastOrderDate=last, Recency=recency,
+                        Frequency=frequency, Monetary=monetary, RScore=r, FScore=f, MScore=m, ComputedAt=now)
+            for user_id, first, last, recency, frequency, monetary, r, f, m in columns
+        ), batch_size)
+        CohortRetention.objects.all().delete()
+        bulk_insert(CohortRetention, (
+            CohortRetention(Cohort=cohort, MonthOffset=offset, Customers=customers, CohortSize=size,
+                            ComputedAt=now)
+            for cohort, offset, customers, size in cohort_rows(facts)
+        ), batch_size)
+
+
+def rebuild(chunk_size=50000, now=None):
+    """Tính lại toàn bộ CustomerRFM và CohortRetention. Trả về số khách hàng đã tính."""
+    now = now or timezone.now()
+    facts = stream_facts(chunk_size)
+    if facts is None:
+        with transaction.atomic():
+            CustomerRFM.objects.all().delete()
+            CohortRetention.objects.all().delete()
+        return 0
+    rfm = compute_rfm(facts, now)
+    save(rfm, facts, now)
+    return len(rfm['users'])
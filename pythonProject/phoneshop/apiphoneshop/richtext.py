@@ -0,0 +1,128 @@
+"""
+Mô tả sản phẩm (HTML từ CKEditor): trích đoạn văn bản thuần cho danh sách và bản HTML đã lọc cho trang chi tiết.
+"""
+import re
+from html import escape, unescape
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.text import Truncator
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'div', 'em', 'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td',
+    'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+ALLOWED_ATTRIBUTES = {'href', 'src', 'alt', 'title', 'width', 'height', 'colspan', 'rowspan', 'style', 'class'}
+URL_ATTRIBUTES = {'href', 'src'}
+# Nội dung của các thẻ này bị bỏ hẳn, không chỉ bỏ thẻ
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template'}
+SAFE_URL = re.compile(r'^(https?:|mailto:|tel:|/|#|[^:]*$)', re.IGNORECASE)
+VOID_TAGS = {'br', 'hr', 'img'}
+
+
+class _TextExtractor(HTMLParser):
+    # Thẻ khối được thay bằng khoảng trắng để các đoạn không bị dính chữ vào nhau
+    INLINE_TAGS = {'a', 'b', 'em', 'i', 'span', 'strong', 'sub', 'sup', 'u'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+        elif tag not in self.INLINE_TAGS:
+            self.text.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+        elif tag not in self.INLINE_TAGS:
+            self.text.append(' ')
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.text.append(data)
+
+
+def excerpt(html, length=None):
+    """Đoạn văn bản thuần đầu tiên của mô tả (bỏ script/style), tối đa `length` ký tự."""
+    parser = _TextExtractor()
+    parser.feed(html or '')
+    parser.close()
+    text = re.sub(r'\s+', ' ', ''.join(parser.text)).strip()
+    return Truncator(text).chars(length or getattr(settings, 'PRODUCT_EXCERPT_LENGTH', 300))
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.output = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        kept = []
+        for name, value in attrs:
+            value = value or ''
+            if name not in ALLOWED_ATTRIBUTES:
+                continue
+            if name in URL_ATTRIBUTES and not SAFE_URL.match(unescape(value).strip()):
+                continue
+            if name == 'style' and re.search(r'expression|url\s*\(', value, re.IGNORECASE):
+                continue
+            kept.append(f' {name}="{escape(unescape(value))}"')
+        self.output.append(f'<{tag}{"".join(kept)}>')
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping -= 1
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+        elif not self.dropping and tag in ALLOWED_TAGS and tag not in VOID_TAGS:
+            self.output.append(f'</{tag}>')
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.output.append(escape(data, quote=False))
+
+    def handle_entityref(self, name):
+        if not self.dropping:
+            self.output.append(f'&{name};')
+
+    def handle_charref(self, name):
+        if not self.dropping:
+            self.output.append(f'&#{name};')
+
+
+def sanitize(html):
+    """Chỉ giữ các thẻ/thuộc tính định dạng thông thường; bỏ script, handler on*, URL javascript:..."""
+    parser = _Sanitizer()
+    parser.feed(html or '')
+    parser.close()
+    return ''.join(parser.output)
+
+
+def rendered_description(product):
+    """
+    HTML mô tả trả về ở trang chi tiết. Khi bật PRODUCT_DESCRIPTION_SANITIZE, bản đã lọc được cache theo
+    (id, update_date) nên tự hết hiệu lực khi sản phẩm được lưu lại.
+    """
+    if not getattr(settings, 'PRODUCT_DESCRIPTION_SANITIZE', False):
+        return product.Description
+    key = f'product-description:{product.pk}:{product.update_date.timestamp()}'
+    html = cache.get(key)
+    if html is None:
+        html = sanitize(product.Description)
+        cache.set(key, html, getattr(settings, 'PRODUCT_DESCRIPTION_CACHE_SECONDS', 60 * 60))
+    return html
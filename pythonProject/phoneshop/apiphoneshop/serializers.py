@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Product, Variant, Brand, ListImg, User, CartItem, Cart, OrderDetail, Order, Comment
+from .models import Product, Variant, Brand, ListImg, User, CartItem, Cart, OrderDetail, Order, Comment, OrderTicket, \
+    ProductCooccurrence, ProductSimilarity
+from .images import image_url
+from .richtext import rendered_description
 
 
 class BrandSerializer(serializers.ModelSerializer):
@@ -16,7 +19,7 @@ class ListImgSerializer(serializers.ModelSerializer):
         fields = ['id', 'url_TitlePhoto']
 
     def get_url_TitlePhoto(self, obj):
-        return obj.TitlePhoto.url if obj.TitlePhoto else None
+        return image_url(obj.TitlePhoto)
 
 
 class ProductNameSerializer(serializers.ModelSerializer):
@@ -28,6 +31,22 @@ class ProductNameSerializer(serializers.ModelSerializer):
         ]
 
 
+class BoughtTogetherSerializer(serializers.ModelSerializer):
+    Product = ProductNameSerializer(source='Related', read_only=True)
+
+    class Meta:
+        model = ProductCooccurrence
+        fields = ['Product', 'Count']
+
+
+class SimilarProductSerializer(serializers.ModelSerializer):
+    Product = ProductNameSerializer(source='Similar', read_only=True)
+
+    class Meta:
+        model = ProductSimilarity
+        fields = ['Product', 'Distance']
+
+
 class VariantSerializer(serializers.ModelSerializer):
     img_url = serializers.SerializerMethodField()
     Product = ProductNameSerializer(read_only=True)
@@ -47,10 +66,11 @@ class VariantSerializer(serializers.ModelSerializer):
         ]
 
     def get_img_url(self, obj):
-        return obj.Img.url if obj.Img else None
+        return image_url(obj.Img)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductListSerializer(serializers.ModelSerializer):
+    """Danh sách sản phẩm: trả về Excerpt thay cho Description (queryset nên defer('Description'))."""
     Brand = BrandSerializer(read_only=True)
     images = ListImgSerializer(many=True, read_only=True)
     variants = VariantSerializer(many=True, read_only=True)
@@ -61,13 +81,54 @@ class ProductSerializer(serializers.ModelSerializer):
             'id',
             'Name',
             'Brand',
-            'Description',
+            'Excerpt',
             'TechnicalSpecifications',
             'images',
             'variants',
         ]
 
 
+class ProductSerializer(ProductListSerializer):
+    Description = serializers.SerializerMethodField()
+
+    class Meta(ProductListSerializer.Meta):
+        fields = ProductListSerializer.Meta.fields + ['Description']
+
+    def get_Description(self, obj):
+        return rendered_description(obj)
+
+
+class SyncBrandSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Brand
+        fields = ['id', 'Name', 'update_date']
+
+
+class SyncProductSerializer(serializers.ModelSerializer):
+    """Dòng Product phẳng cho /sync/catalog/ (quan hệ trả về dạng id)."""
+
+    class Meta:
+        model = Product
+        fields = ['id', 'Name', 'Brand', 'Excerpt', 'TechnicalSpecifications', 'update_date']
+
+
+class SyncVariantSerializer(serializers.ModelSerializer):
+    img_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Variant
+        fields = ['id', 'Product', 'SKU', 'Memory', 'Color', 'Quantity', 'Price', 'CompareAtPrice', 'img_url',
+                  'update_date']
+
+    def get_img_url(self, obj):
+        return image_url(obj.Img)
+
+
+class SyncListImgSerializer(ListImgSerializer):
+    class Meta(ListImgSerializer.Meta):
+        fields = ['id', 'Product', 'url_TitlePhoto', 'update_date']
+
+
 class CreateProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
@@ -129,6 +190,10 @@ class CartSerializer(serializers.ModelSerializer):
         read_only_fields = ['User']
 
 
+class CartQuoteQuerySerializer(serializers.Serializer):
+    discount_code = serializers.CharField(required=False, allow_blank=True)
+
+
 class OrderDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderDetail
@@ -141,20 +206,120 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'User', 'Discount', 'Note', 'ShipAddress', 'ShipDate', 'Payment', 'order_details', 'short_link']
+        fields = ['id', 'User', 'Discount', 'Note', 'ShipAddress', 'ShipDate', 'Payment', 'Total', 'ItemCount',
+                  'Status', 'order_details', 'short_link']
+        read_only_fields = ['Total', 'ItemCount', 'Status']
 
     def get_short_link(self, obj):
         return obj.short_link if hasattr(obj, 'short_link') else None
 
 
+class OrderVariantSerializer(serializers.ModelSerializer):
+    Name = serializers.CharField(source='Product.Name', read_only=True)
+    img_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Variant
+        fields = ['id', 'Name', 'SKU', 'Memory', 'Color', 'img_url']
+
+    def get_img_url(self, obj):
+        return image_url(obj.Img)
+
+
+class OrderHistoryDetailSerializer(serializers.ModelSerializer):
+    Variant = OrderVariantSerializer(read_only=True)
+
+    class Meta:
+        model = OrderDetail
+        fields = ['id', 'Variant', 'Quantity', 'Price', 'Status']
+
+
+class OrderHistorySerializer(OrderSerializer):
+    """Lịch sử đơn hàng: nhúng sẵn thông tin variant, cần prefetch order_details__Variant__Product."""
+    order_details = OrderHistoryDetailSerializer(many=True, read_only=True)
+
+
 class PlaceOrderSerializer(serializers.Serializer):
     variant_id = serializers.IntegerField()
-    quantity = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
     discount_code = serializers.CharField(required=False, allow_blank=True)
     ship_address = serializers.CharField()
     payment = serializers.CharField()
 
 
+class SalesAnalyticsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    by = serializers.ChoiceField(choices=['variant', 'brand', 'color', 'memory'], default='variant')
+    metric = serializers.ChoiceField(choices=['units', 'revenue'], default='revenue')
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must be before end.")
+        return attrs
+
+
+class BulkPriceSerializer(serializers.Serializer):
+    # Chọn variant theo id, sản phẩm, thương hiệu hoặc SKU; all=true để áp dụng cho toàn bộ catalog
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    product_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    brand_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    skus = serializers.ListField(child=serializers.CharField(), required=False)
+    all = serializers.BooleanField(default=False)
+    field = serializers.ChoiceField(choices=['Price', 'CompareAtPrice'], default='Price')
+    mode = serializers.ChoiceField(choices=['percent', 'absolute'])
+    value = serializers.FloatField()
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        selectors = ['ids', 'product_ids', 'brand_ids', 'skus']
+        if not attrs['all'] and not any(attrs.get(name) for name in selectors):
+            raise serializers.ValidationError("Select variants with ids, product_ids, brand_ids or skus, or set all.")
+        if attrs['mode'] == 'percent' and attrs['value'] < -100:
+            raise serializers.ValidationError("A percentage change cannot be below -100.")
+        return attrs
+
+    def variants(self):
+        data = self.validated_data
+        queryset = Variant.objects.all()
+        for name, lookup in [('ids', 'id__in'), ('product_ids', 'Product_id__in'),
+                             ('brand_ids', 'Product__Brand_id__in'), ('skus', 'SKU__in')]:
+            if data.get(name):
+                queryset = queryset.filter(**{lookup: data[name]})
+        return queryset
+
+
+class BulkStockSerializer(serializers.Serializer):
+    # CSV (file tải lên hoặc chuỗi) có header sku hoặc id và quantity
+    file = serializers.FileField(required=False)
+    csv = serializers.CharField(required=False, trim_whitespace=False)
+    mode = serializers.ChoiceField(choices=['set', 'adjust'], default='set')
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if 'file' in attrs:
+            try:
+                attrs['csv'] = attrs.pop('file').read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise serializers.ValidationError("CSV file must be UTF-8.")
+        if not attrs.get('csv'):
+            raise serializers.ValidationError("Upload a CSV file or send it in the csv field.")
+        return attrs
+
+
+class OrderTicketSerializer(serializers.ModelSerializer):
+    position = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OrderTicket
+        fields = ['id', 'Status', 'position', 'Order', 'ResponseStatus', 'Result', 'created_date']
+
+    def get_position(self, obj):
+        from .admission import queue_position
+        return queue_position(obj)
+
+
 class UserFullNameSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -162,6 +327,11 @@ class UserFullNameSerializer(serializers.ModelSerializer):
                   'Date_of_birth']
 
 
+class CommentFeedQuerySerializer(serializers.Serializer):
+    variant = serializers.IntegerField(required=False)
+    product = serializers.IntegerField(required=False)
+
+
 class CommentSerializer(serializers.ModelSerializer):
     User = UserFullNameSerializer(read_only=True)
 
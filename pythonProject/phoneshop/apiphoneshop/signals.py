@@ -0,0 +1,84 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .analytics import schedule_sale
+from .images import stage, enqueue
+from .models import Brand, Product, ListImg, Variant, Order, OrderDetail, Discount
+from .orders import refresh_order_summary
+from .pricing import forget_prices, forget_discount
+from .snapshot import mark_dirty
+from .sync import record_deletion
+
+
+@receiver([post_save, post_delete], sender=OrderDetail, dispatch_uid='apiphoneshop.order_summary')
+def update_order_summary(sender, instance, **kwargs):
+    refresh_order_summary(instance.Order_id)
+
+
+@receiver(pre_save, sender=OrderDetail, dispatch_uid='apiphoneshop.daily_sales_previous')
+def remember_sale(sender, instance, **kwargs):
+    # Giá trị trước khi sửa để trừ khỏi tổng hợp
+    instance._previous_sale = (OrderDetail.objects.filter(pk=instance.pk)
+                               .values_list('Order_id', 'Variant_id', 'Quantity', 'Price', 'Order__created_date')
+                               .first() if instance.pk else None)
+
+
+@receiver([post_save, post_delete], sender=OrderDetail, dispatch_uid='apiphoneshop.daily_sales')
+def update_daily_sales(sender, instance, **kwargs):
+    try:
+        current = (instance.Order_id, instance.Variant_id, instance.Quantity, instance.Price,
+                   instance.Order.created_date)
+    except Order.DoesNotExist:
+        return
+    if kwargs['signal'] is post_delete:
+        schedule_sale(instance.pk, *current, sign=-1)
+        return
+    previous = getattr(instance, '_previous_sale', None)
+    if previous == current:
+        return  # chỉ đổi Status
+    if previous is not None:
+        schedule_sale(instance.pk, *previous, sign=-1)
+    schedule_sale(instance.pk, *current, sign=1)
+
+
+@receiver([post_save, post_delete], dispatch_uid='apiphoneshop.catalog_snapshot')
+def schedule_catalog_snapshot(sender, **kwargs):
+    # Tồn kho đổi qua update() nên không kích hoạt; chỉ thay đổi nội dung catalog mới cần ghi lại ảnh chụp
+    if sender in (Brand, Product, ListImg, Variant):
+        mark_dirty()
+
+
+@receiver([post_save, post_delete], sender=Variant, dispatch_uid='apiphoneshop.variant_prices')
+def invalidate_variant_price(sender, instance, **kwargs):
+    forget_prices([instance.id])
+
+
+@receiver(pre_save, sender=Discount, dispatch_uid='apiphoneshop.discount_previous_code')
+def remember_discount_code(sender, instance, **kwargs):
+    # Đổi Code của một mã: mã cũ cũng phải bị xóa khỏi cache
+    instance._previous_code = (Discount.objects.filter(pk=instance.pk).values_list('Code', flat=True).first()
+                               if instance.pk else None)
+
+
+@receiver([post_save, post_delete], sender=Discount, dispatch_uid='apiphoneshop.discount_codes')
+def invalidate_discount(sender, instance, **kwargs):
+    for code in {instance.Code, getattr(instance, '_previous_code', None)} - {None}:
+        forget_discount(code)
+
+
+@receiver(post_delete, dispatch_uid='apiphoneshop.catalog_tombstone')
+def record_catalog_deletion(sender, instance, **kwargs):
+    if sender in (Brand, Product, ListImg, Variant):
+        record_deletion(instance)
+
+
+@receiver(pre_save, sender=ListImg, dispatch_uid='apiphoneshop.stage_listimg')
+@receiver(pre_save, sender=Variant, dispatch_uid='apiphoneshop.stage_variant_img')
+def stage_image(sender, instance, **kwargs):
+    stage(instance)
+
+
+@receiver(post_save, sender=ListImg, dispatch_uid='apiphoneshop.enqueue_listimg')
+@receiver(post_save, sender=Variant, dispatch_uid='apiphoneshop.enqueue_variant_img')
+def enqueue_image(sender, instance, **kwargs):
+    enqueue(instance)
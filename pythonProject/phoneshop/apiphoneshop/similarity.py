@@ -0,0 +1,188 @@
+"""
+"Điện thoại tương tự": k láng giềng gần nhất theo TechnicalSpecifications và giá.
+
+TechnicalSpecifications là JSON tự do nên mỗi thông số được nhận diện qua danh sách tên khóa
+(tiếng Anh/tiếng Việt) và tách số theo đơn vị. Các cột được chuẩn hóa z-score (thiếu giá trị = trung bình),
+sau đó khoảng cách Euclid giữa mọi cặp sản phẩm được tính theo từng lô hàng bằng NumPy.
+NumPy chỉ được import khi chạy build_similar_products, API chỉ đọc ProductSimilarity.
+"""
+import math
+import re
+import warnings
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Product, Variant, ProductSimilarity
+
+_NUMBER = r'(\d+(?:[.,]\d+)?)'
+_CAPACITY_UNITS = {'tb': 1024.0, 'gb': 1.0, 'mb': 1 / 1024}
+
+# tên thông số -> (các tên khóa trong TechnicalSpecifications, regex số kèm đơn vị, lấy giá trị lớn nhất)
+NUMERIC_SPECS = {
+    'ram': (('ram',), _NUMBER + r'\s*(tb|gb|mb)\b', False),
+    'storage': (('storage', 'rom', 'bộ nhớ trong', 'dung lượng lưu trữ'), _NUMBER + r'\s*(tb|gb|mb)\b', False),
+    'screen': (('screen', 'display', 'màn hình', 'kích thước màn hình'), _NUMBER + r'\s*(?:inch|in\b|"|”|\'\')', False),
+    'battery': (('battery', 'pin', 'dung lượng pin'), _NUMBER + r'\s*mah', False),
+    'camera': (('camera', 'rear camera', 'camera sau'), _NUMBER + r'\s*mp', True),
+    'refresh_rate': (('refresh rate', 'tần số quét'), _NUMBER + r'\s*hz', False),
+    'weight': (('weight', 'trọng lượng', 'khối lượng'), _NUMBER + r'\s*g\b', False),
+}
+CHIPSET_KEYS = ('chipset', 'chip', 'cpu', 'vi xử lý')
+CHIPSET_FAMILIES = ('apple', 'snapdragon', 'dimensity', 'helio', 'exynos', 'tensor', 'kirin', 'unisoc')
+# Trọng số sau chuẩn hóa: giá quan trọng hơn từng thông số riêng lẻ, dòng chip nhẹ hơn
+PRICE_WEIGHT = 2.0
+CHIPSET_WEIGHT = 0.5
+
+
+def top_k():
+    return getattr(settings, 'SIMILAR_PRODUCTS_TOP_K', 10)
+
+
+def parse_spec(value, name):
+    """Giá trị số của một thông số (đổi về GB với RAM/bộ nhớ), NaN nếu không đọc được."""
+    if isinstance(value, bool):
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return math.nan
+    _, pattern, take_max = NUMERIC_SPECS[name]
+    text = value.lower()
+    values = []
+    for match in re.finditer(pattern, text):
+        number = float(match.group(1).replace(',', '.'))
+        unit = match.group(2) if match.lastindex and match.lastindex > 1 else None
+        values.append(number * _CAPACITY_UNITS.get(unit, 1.0))
+    if not values:
+        bare = re.search(_NUMBER, text)
+        return float(bare.group(1).replace(',', '.')) if bare else math.nan
+    return max(values) if take_max else values[0]
+
+
+def chipset_family(specs):
+    for key in CHIPSET_KEYS:
+        value = specs.get(key)
+        if isinstance(value, str):
+            value = value.lower()
+            for i, family in enumerate(CHIPSET_FAMILIES):
+                if family in value or (family == 'apple' and re.search(r'\ba\d{2}\b', value)):
+                    return i
+    return None
+
+
+def spec_row(specs, storage, price):
+    specs = {str(key).strip().lower(): value for key, value in (specs or {}).items()} \
+        if isinstance(specs, dict) else {}
+    row = []
+    for name, (keys, _, _) in NUMERIC_SPECS.items():
+        value = next((parse_spec(specs[key], name) for key in keys if key in specs), math.nan)
+        if name == 'storage' and math.isnan(value):
+            value = storage
+        row.append(value)
+    row.append(math.log1p(price) if price is not None else math.nan)
+    return row, chipset_family(specs)
+
+
+def load_features():
+    """Trả về (mảng product_id, ma trận đặc trưng float32 đã chuẩn hóa và nhân trọng số)."""
+    import numpy as np
+    storage, price = {}, {}
+    for product_id, memory, variant_price, compare_at in Variant.objects.values_list(
+            'Product_id', 'Memory', 'Price', 'CompareAtPrice').iterator(chunk_size=5000):
+        capacity = parse_spec(memory, 'storage')
+        if not math.isnan(capacity):
+            storage[product_id] = max(storage.get(product_id, 0.0), capacity)
+        # Giá bán thực tế giống place_order: CompareAtPrice nếu có
+        effective = compare_at or variant_price
+        price[product_id] = min(price.get(product_id, effective), effective)
+
+    ids, rows, chipsets = [], [], []
+    for product_id, specs in Product.objects.values_list('id', 'TechnicalSpecifications').iterator(chunk_size=5000):
+        row, chipset = spec_row(specs, storage.get(product_id, math.nan), price.get(product_id))
+        ids.append(product_id)
+        rows.append(row)
+        chipsets.append(-1 if chipset is None else chipset)
+
+    numeric = np.asarray(rows, dtype=np.float64).reshape(len(ids), len(NUMERIC_SPECS) + 1)
+    if len(ids):
+        with warnings.catch_warnings():
+            # Cột toàn NaN (không sản phẩm nào có thông số đó) cho mean/std NaN, xử lý ngay bên dưới
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(numeric, axis=0)
+            std = np.nanstd(numeric, axis=0)
+        mean = np.nan_to_num(mean)
+        std = np.where(np.isnan(std) | (std == 0), 1.0, std)
+        numeric = np.nan_to_num((numeric - mean) / std)
+        numeric[:, -1] *= PRICE_WEIGHT
+
+    chipsets = np.asarray(chipsets, dtype=np.intp)
+    one_hot = np.zeros((len(ids), len(CHIPSET_FAMILIES)))
+    known = chipsets >= 0
+    one_hot[np.flatnonzero(known), chipsets[known]] = CHIPSET_WEIGHT
+    return np.asarray(ids, dtype=np.int64), np.hstack([numeric, one_hot]).astype(np.float32)
+
+
+def nearest_neighbours(features, k, batch_size=512, sample=2048):
+    """
+    Với mỗi dòng trả về (chỉ số, khoảng cách) của k dòng gần nhất, trừ chính nó.
+
+    Mỗi lô tính ma trận batch_size x n bằng một phép nhân ma trận. Thay vì sắp xếp cả hàng, lấy ngưỡng
+    là giá trị nhỏ thứ k trên một mẫu ~sample cột (luôn >= giá trị nhỏ thứ k thật) rồi chỉ sắp xếp
+    các ô dưới ngưỡng, nên kết quả vẫn chính xác.
+    """
+    import numpy as np
+    n = len(features)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.intp), np.empty((n, 0), dtype=np.float32)
+    squared = np.einsum('ij,ij->i', features, features)
+    # |a - b|^2 = |a|^2 + |b|^2 - 2ab; |a|^2 không đổi trên một hàng nên chỉ cộng lại ở bước cuối
+    right = np.hstack([features, squared[:, None]]).T.copy()
+    left = np.hstack([-2 * features, np.ones((n, 1), dtype=features.dtype)])
+    stride = max(1, (n - 1) // sample)
+    indices = np.empty((n, k), dtype=np.intp)
+    distances = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, batch_size):
+        stop = min(start + batch_size, n)
+        block = left[start:stop] @ right
+        block[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        sampled = block[:, ::stride]
+        if stride > 1 and sampled.shape[1] > k:
+            threshold = np.partition(sampled, k - 1, axis=1)[:, k - 1]
+            flat = np.flatnonzero(block <= threshold[:, None])
+        else:
+            flat = np.arange(block.size)
+        values = block.ravel()[flat]
+        rows, columns = np.divmod(flat, n)
+        order = np.lexsort((values, rows))
+        rows, columns, values = rows[order], columns[order], values[order]
+        pick = np.searchsorted(rows, np.arange(stop - start))[:, None] + np.arange(k)
+        indices[start:stop] = columns[pick]
+        distances[start:stop] = np.sqrt(np.maximum(values[pick] + squared[start:stop, None], 0))
+    return indices, distances
+
+
+def save(ids, indices, distances):
+    """Thay toàn bộ bảng ProductSimilarity bằng kết quả của nearest_neighbours. Trả về số dòng đã ghi."""
+    rows = [
+        ProductSimilarity(Product_id=product_id, Similar_id=similar_id, Distance=distance)
+        for product_id, similar, row_distances in zip(ids.tolist(), ids[indices].tolist(), distances.tolist())
+        for similar_id, distance in zip(similar, row_distances)
+    ]
+    with transaction.atomic():
+        ProductSimilarity.objects.all().delete()
+        ProductSimilarity.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def rebuild(k=None, batch_size=512):
+    ids, features = load_features()
+    indices, distances = nearest_neighbours(features, k or top_k(), batch_size)
+    return save(ids, indices, distances)
+
+
+def similar_products(product_id, k=None):
+    return (ProductSimilarity.objects.filter(Product_id=product_id).select_related('Similar')
+            .defer('Similar__Description')
+            .order_by('Distance', 'Similar_id')[:k or top_k()])
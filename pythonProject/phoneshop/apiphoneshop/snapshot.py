@@ -0,0 +1,139 @@
+"""
+Ảnh chụp toàn bộ catalog (giống GET /products/) ghi ra đĩa dưới dạng JSON đã nén sẵn.
+
+Mỗi phiên bản là catalog-<version>.json kèm .json.gz và .json.br cạnh nhau để web server trả thẳng file
+(nginx: gzip_static on; brotli_static on;), Python chỉ trả manifest.json nhỏ qua /products/snapshot/.
+Manifest kèm sync_cursor để client tiếp tục bằng /sync/catalog/ (xem apiphoneshop.sync).
+Khi catalog thay đổi, signal đánh dấu "dirty" trong cache dùng chung (CACHES['default']); lệnh
+build_catalog_snapshot --loop chỉ ghi lại sau khi catalog đã yên DEBOUNCE giây (hoặc quá MAX_DELAY giây
+kể từ thay đổi đầu tiên).
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import read_plans
+from .middleware import brotli
+from .models import Product
+from .renderers import ORJSONRenderer
+from .serializers import ProductListSerializer
+from .sync import bootstrap_cursor
+
+DIRTY_FIRST_KEY = 'catalog-snapshot:dirty-since'
+DIRTY_LAST_KEY = 'catalog-snapshot:dirty-last'
+MANIFEST = 'manifest.json'
+DEFAULTS = {
+    'DEBOUNCE': 30,
+    'MAX_DELAY': 300,
+    'KEEP': 3,
+    # --loop ghi lại manifest ít nhất mỗi REFRESH giây để sync_cursor không quá cũ
+    'REFRESH': 6 * 60 * 60,
+}
+
+
+def snapshot_settings():
+    defaults = {'DIR': os.path.join(settings.MEDIA_ROOT, 'catalog'), 'URL': settings.MEDIA_URL + 'catalog/'}
+    return {**DEFAULTS, **defaults, **getattr(settings, 'CATALOG_SNAPSHOT', {})}
+
+
+def render_catalog():
+    products = (Product.objects.select_related('Brand').prefetch_related('images', 'variants')
+                .defer('Description').order_by('id'))
+    data = read_plans.product_list(products) if read_plans.enabled() else ProductListSerializer(products, many=True).data
+    return ORJSONRenderer().render(data), len(data)
+
+
+def _write(path, data):
+    # Ghi file tạm rồi đổi tên để web server không bao giờ đọc phải file ghi dở
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def read_manifest():
+    try:
+        return json.loads((Path(snapshot_settings()['DIR']) / MANIFEST).read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+def build(force=False):
+    """Ghi phiên bản mới nếu nội dung catalog đã đổi. Trả về manifest hiện tại."""
+    conf = snapshot_settings()
+    directory = Path(conf['DIR'])
+    directory.mkdir(parents=True, exist_ok=True)
+    started = timezone.now()
+    body, products = render_catalog()
+    version = hashlib.sha256(body).hexdigest()[:16]
+    current = read_manifest()
+    if current and current['version'] == version and not force:
+        # Nội dung không đổi: chỉ làm mới cursor đồng bộ để client tải ảnh chụp này không nhận cursor hết hạn
+        current.update(sync_cursor=bootstrap_cursor(started), generated_at=started.isoformat())
+        _write(directory / MANIFEST, json.dumps(current).encode())
+        return current
+
+    name = f'catalog-{version}.json'
+    files = {name: body, name + '.gz': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        files[name + '.br'] = brotli.compress(body, quality=11)
+    for filename, data in files.items():
+        _write(directory / filename, data)
+
+    manifest = {
+        'version': version,
+        'url': conf['URL'] + name,
+        'products': products,
+        'size': len(body),
+        'encodings': {filename.rsplit('.', 1)[-1]: len(data) for filename, data in files.items()
+                      if filename != name},
+        # Cursor cho /sync/catalog/?since=: mọi thay đổi kể từ lúc tạo ảnh chụp
+        'sync_cursor': bootstrap_cursor(started),
+        'generated_at': started.isoformat(),
+    }
+    _write(directory / MANIFEST, json.dumps(manifest).encode())
+    prune(directory, keep=conf['KEEP'])
+    return manifest
+
+
+def prune(directory, keep):
+    """Giữ lại `keep` phiên bản mới nhất; client đang tải phiên bản cũ vẫn kịp tải xong."""
+    snapshots = sorted(directory.glob('catalog-*.json'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for old in snapshots[keep:]:
+        for path in (old, old.with_name(old.name + '.gz'), old.with_name(old.name + '.br')):
+            path.unlink(missing_ok=True)
+
+
+def mark_dirty():
+    now = time.time()
+    # Giữ tới MAX_DELAY để cache không xóa mốc trước khi lệnh kịp ghi lại
+    timeout = snapshot_settings()['MAX_DELAY'] * 2
+    # add() chỉ ghi khi chưa có mốc: nhiều worker đánh dấu cùng lúc không đẩy lùi thay đổi đầu tiên
+    cache.add(DIRTY_FIRST_KEY, now, timeout)
+    cache.set(DIRTY_LAST_KEY, now, timeout)
+
+
+def due():
+    """Đã tới lúc ghi lại chưa: catalog yên DEBOUNCE giây, hoặc thay đổi đầu tiên đã quá MAX_DELAY giây."""
+    dirty = cache.get_many([DIRTY_FIRST_KEY, DIRTY_LAST_KEY])
+    if not dirty:
+        return False
+    conf = snapshot_settings()
+    first = dirty.get(DIRTY_FIRST_KEY, dirty.get(DIRTY_LAST_KEY))
+    last = dirty.get(DIRTY_LAST_KEY, first)
+    now = time.time()
+    return now - last >= conf['DEBOUNCE'] or now - first >= conf['MAX_DELAY']
+
+
+def build_if_due():
+    if not due():
+        return None
+    # Xóa mốc trước khi build: thay đổi xảy ra trong lúc build sẽ đánh dấu lại
+    cache.delete_many([DIRTY_FIRST_KEY, DIRTY_LAST_KEY])
+    return build()
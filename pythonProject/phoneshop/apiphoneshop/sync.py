@@ -0,0 +1,147 @@
+"""
+Feed đồng bộ catalog theo update_date: client gửi cursor nhận được ở lần trước và chỉ nhận
+các dòng Brand/Product/Variant/ListImg đã thay đổi hoặc bị xóa (tombstone) kể từ đó.
+
+Các dòng được trả theo thứ tự (thời điểm, loại, id); cursor mã hóa vị trí của dòng cuối cùng đã trả
+nên client có thể dừng và tiếp tục ở bất kỳ trang nào. Dòng mới hơn now - SYNC_CATALOG['LAG'] giây
+chưa được trả, để transaction commit muộn với update_date cũ hơn không bị bỏ sót.
+
+Tồn kho đổi qua update() (đặt hàng, giữ chỗ) không đổi update_date nên không có trong feed.
+"""
+import base64
+import heapq
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Brand, Product, Variant, ListImg, CatalogTombstone
+from .serializers import SyncBrandSerializer, SyncProductSerializer, SyncVariantSerializer, SyncListImgSerializer
+
+DEFAULTS = {
+    'PAGE_SIZE': 500,
+    'LAG': 5,
+    # Tombstone cũ hơn số ngày này bị xóa; cursor cũ hơn phải tải lại toàn bộ (ảnh chụp catalog)
+    'TOMBSTONE_DAYS': 30,
+}
+
+
+def sync_settings():
+    return {**DEFAULTS, **getattr(settings, 'SYNC_CATALOG', {})}
+
+
+def sources():
+    """(tên loại, queryset, serializer) theo thứ tự dùng để phân định các dòng cùng update_date."""
+    return [
+        ('brand', Brand.objects.all(), SyncBrandSerializer),
+        ('product', Product.objects.defer('Description'), SyncProductSerializer),
+        ('variant', Variant.objects.all(), SyncVariantSerializer),
+        ('listimg', ListImg.objects.all(), SyncListImgSerializer),
+    ]
+
+
+TOMBSTONE_MODELS = {Brand: 'brand', Product: 'product', Variant: 'variant', ListImg: 'listimg'}
+DELETE_RANK = len(TOMBSTONE_MODELS)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExpiredCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment, rank=-1, object_id=0):
+    raw = json.dumps([moment.isoformat(), rank, object_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        moment, rank, object_id = json.loads(raw)
+        moment = datetime.fromisoformat(moment)
+        if timezone.is_naive(moment) or not isinstance(rank, int) or not isinstance(object_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid sync cursor.")
+    if moment < timezone.now() - timedelta(days=sync_settings()['TOMBSTONE_DAYS']):
+        raise ExpiredCursor("Sync cursor has expired, download the full catalog again.")
+    return moment, rank, object_id
+
+
+def bootstrap_cursor(moment):
+    """Cursor trả mọi thay đổi có thời điểm >= moment (dùng kèm ảnh chụp catalog tạo lúc moment)."""
+    return encode_cursor(moment - timedelta(seconds=sync_settings()['LAG']))
+
+
+def _after(field, position, rank):
+    """Điều kiện "đứng sau position" cho một nguồn có thứ hạng rank."""
+    if position is None:
+        return Q()
+    moment, cursor_rank, object_id = position
+    if rank < cursor_rank:
+        return Q(**{f'{field}__gt': moment})
+    if rank > cursor_rank:
+        return Q(**{f'{field}__gte': moment})
+    return Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': object_id})
+
+
+def _stream(queryset, field, rank, kind, serializer, position, horizon, page_size):
+    """Tối đa page_size + 1 dòng của một nguồn đứng sau position, đã sắp xếp theo (thời điểm, id)."""
+    rows = (queryset.filter(_after(field, position, rank), **{f'{field}__lt': horizon})
+            .order_by(field, 'id')[:page_size + 1])
+    for row in rows:
+        yield getattr(row, field), rank, row.id, kind, serializer, row
+
+
+def changes(token=None, page_size=None):
+    """Trả về (danh sách thay đổi, cursor tiếp theo, còn dữ liệu hay không)."""
+    conf = sync_settings()
+    page_size = page_size or conf['PAGE_SIZE']
+    position = decode_cursor(token) if token else None
+    horizon = timezone.now() - timedelta(seconds=conf['LAG'])
+
+    streams = [_stream(queryset, 'update_date', rank, kind, serializer, position, horizon, page_size)
+               for rank, (kind, queryset, serializer) in enumerate(sources())]
+    streams.append(_stream(CatalogTombstone.objects.all(), 'DeletedAt', DELETE_RANK, None, None, position, horizon,
+                           page_size))
+
+    merged = heapq.merge(*streams, key=lambda item: item[:3])
+    page = [item for _, item in zip(range(page_size + 1), merged)]
+    has_more = len(page) > page_size
+    page = page[:page_size]
+
+    result = []
+    for moment, rank, _, kind, serializer, row in page:
+        if serializer is None:
+            result.append({'type': row.Model, 'op': 'delete', 'id': row.ObjectId})
+        else:
+            result.append({'type': kind, 'op': 'upsert', 'id': row.id, 'data': serializer(row).data})
+
+    if page:
+        moment, rank, object_id = page[-1][:3]
+        cursor = encode_cursor(moment, rank, object_id)
+    elif token:
+        cursor = token
+    else:
+        cursor = encode_cursor(horizon)
+    return result, cursor, has_more
+
+
+def record_deletion(instance):
+    CatalogTombstone.objects.create(Model=TOMBSTONE_MODELS[type(instance)], ObjectId=instance.pk)
+
+
+def purge_tombstones(batch_size=1000):
+    """Xóa tombstone cũ hơn TOMBSTONE_DAYS theo từng lô. Trả về số dòng đã xóa."""
+    cutoff = timezone.now() - timedelta(days=sync_settings()['TOMBSTONE_DAYS'])
+    deleted = 0
+    while True:
+        ids = list(CatalogTombstone.objects.filter(DeletedAt__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += CatalogTombstone.objects.filter(id__in=ids).delete()[0]
@@ -1,3 +1,1452 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import re
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.db.models.query import QuerySet
+from django.db.models.functions import ExtractMonth
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from oauth2_provider.models import AccessToken
+from rest_framework.mixins import ListModelMixin
+from rest_framework.test import APIClient
+
+from . import admission, analytics, bulk_edit, checks, idempotency, images, recommendations, retention, rfm, similarity, \
+    snapshot, sync
+from .db_router import ReplicaPool, _replica_alias
+from .inventory import InsufficientStock, consume, enable_sharding, release_expired, reserve
+from .models import User, Brand, Product, Variant, Order, OrderDetail, Comment, Discount, Cart, CartItem, \
+    DailyVariantSales, CustomerRFM, CohortRetention, StockReservation, ArchivedOrder, ListImg, ImageUpload, OrderTicket, \
+    IdempotencyKey, ProductCooccurrence
+
+
+def create_catalog(products=1, variants_per_product=1, prefix='P'):
+    brand, _ = Brand.objects.get_or_create(Name='Brand')
+    variants = []
+    for p in range(products):
+        product = Product.objects.create(Name=f'{prefix}{p}', Brand=brand, Description='<p>Mô tả</p>',
+                                         TechnicalSpecifications={'RAM': '8GB'})
+        for v in range(variants_per_product):
+            variants.append(Variant.objects.create(Product=product, SKU=f'{prefix}{p}-{v}', Memory='128GB',
+                                                   Color='Black', Quantity=10, Price=1000, Img='sample.jpg'))
+    return variants
+
+
+class AdminChangelistQueryCountTests(TestCase):
+    """Số query của mỗi trang changelist không được tăng theo số dòng hiển thị."""
+
+    changelists = ['order', 'orderdetail', 'variant', 'cartitem', 'comment', 'cart', 'product']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret', Address='HN')
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(f'user{i}', Address='HN', Phone_number=f'09{i:08d}')
+            variant = create_catalog(prefix=f'U{i}-')[0]
+            discount = Discount.objects.create(Code=f'CODE{i}', DiscountPercent=10,
+                                               StartDate=date.today(), EndDate=date.today() + timedelta(days=1))
+            order = Order.objects.create(User=user, Discount=discount, ShipAddress='HN', ShipDate=timezone.now())
+            OrderDetail.objects.create(Order=order, Variant=variant, Quantity=1, Price=1000, Status='Pending')
+            cart = Cart.objects.create(User=user)
+            CartItem.objects.create(Cart=cart, Variant=variant, Quantity=1)
+            Comment.objects.create(User=user, Variant=variant, Comment='Tốt', Star=5)
+
+    def changelist_queries(self, model_name, query=''):
+        self.client.force_login(self.admin)
+        url = reverse(f'admin:apiphoneshop_{model_name}_changelist') + query
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelist_query_count_is_constant(self):
+        self.add_rows(2)
+        small = {name: self.changelist_queries(name) for name in self.changelists}
+        self.add_rows(8)
+        for name in self.changelists:
+            with self.subTest(changelist=name):
+                self.assertEqual(self.changelist_queries(name), small[name])
+
+    def test_autocomplete_filter_loads_only_selected_object(self):
+        self.add_rows(3)
+        product = Product.objects.first()
+        unfiltered = self.changelist_queries('variant')
+        filtered = self.changelist_queries('variant', f'?Product__id__exact={product.id}')
+        # Chỉ thêm một query để hiển thị sản phẩm đang được chọn
+        self.assertEqual(filtered, unfiltered + 1)
+
+
+class ReplicaRouterTests(TestCase):
+    """Chạy với phoneshop.test_settings: 'default' và 'replica' là hai file SQLite riêng biệt."""
+
+    databases = {'default', 'replica'}
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        brand = Brand.objects.using('replica').create(Name='Replica brand')
+        Product.objects.using('replica').create(Name='Only on replica', Brand=brand, Description='')
+        brand = Brand.objects.create(Name='Primary brand')
+        Product.objects.create(Name='Only on primary', Brand=brand, Description='')
+        self.user = User.objects.create_user('buyer', Address='HN')
+        self.variant = Variant.objects.create(Product=Product.objects.get(), SKU='SKU-1', Memory='128GB',
+                                              Color='Black', Quantity=5, Price=100, Img='sample.jpg')
+
+    def product_names(self):
+        return [p['Name'] for p in self.client.get('/products/').json()]
+
+    def test_catalog_reads_go_to_replica(self):
+        self.assertEqual(self.product_names(), ['Only on replica'])
+
+    def test_writes_pin_user_to_primary(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.product_names(), ['Only on replica'])
+        response = self.client.post('/cart/add-to-cart/', {'variant_id': self.variant.id, 'quantity': 1})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(CartItem.objects.using('default').count(), 1)
+        self.assertEqual(self.product_names(), ['Only on primary'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                           'LOCATION': 'django_cache'}})
+    def test_database_cache_is_read_from_primary(self):
+        # Bảng cache có ở cả hai database trong test; giá trị vừa ghi phải đọc được khi request đang dùng replica
+        cache.set('written-on-primary', 1)
+        token = _replica_alias.set('replica')
+        try:
+            self.assertEqual(cache.get('written-on-primary'), 1)
+        finally:
+            _replica_alias.reset(token)
+
+    def test_non_catalog_reads_stay_on_primary(self):
+        cart = Cart.objects.create(User=self.user)
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/cart/')
+        self.assertEqual([c['id'] for c in response.json()], [cart.id])
+
+    @override_settings(REPLICA_DATABASES=['missing', 'replica'])
+    def test_unhealthy_replica_is_skipped(self):
+        pool = ReplicaPool()
+        self.assertEqual({pool.choose() for _ in range(4)}, {'replica'})
+
+    @override_settings(REPLICA_DATABASES=['replica', 'default'])
+    def test_round_robin(self):
+        pool = ReplicaPool()
+        self.assertEqual([pool.choose() for _ in range(4)], ['replica', 'default', 'replica', 'default'])
+
+
+class OrderHistoryTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', Address='HN')
+        self.client.force_authenticate(self.user)
+
+    def add_orders(self, count, lines=2):
+        for i in range(count):
+            order = Order.objects.create(User=self.user, ShipAddress='HN', ShipDate=timezone.now())
+            for variant in create_catalog(products=lines, prefix=f'O{order.id}-'):
+                OrderDetail.objects.create(Order=order, Variant=variant, Quantity=2, Price=500, Status='Pending')
+
+    def test_summary_is_maintained_on_write(self):
+        self.add_orders(1)
+        order = Order.objects.get()
+        self.assertEqual((order.Total, order.ItemCount, order.Status), (1000, 4, 'Pending'))
+        detail = order.order_details.first()
+        detail.Status = 'Done'
+        detail.save()
+        order.refresh_from_db()
+        self.assertEqual(order.Status, Order.MIXED)
+        detail.delete()
+        order.refresh_from_db()
+        self.assertEqual((order.Total, order.ItemCount, order.Status), (500, 2, 'Pending'))
+
+    def history_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/order/my-orders/')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_history_embeds_variants_in_constant_queries(self):
+        self.add_orders(2)
+        data, small = self.history_queries()
+        line = data['results'][0]['order_details'][0]
+        self.assertEqual(set(line['Variant']), {'id', 'Name', 'SKU', 'Memory', 'Color', 'img_url'})
+        self.add_orders(8, lines=3)
+        data, large = self.history_queries()
+        self.assertEqual(data['count'], 10)
+        self.assertEqual(large, small)
+
+
+class SalesAnalyticsTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', Address='HN')
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret', Address='HN')
+        self.variants = create_catalog(products=3)
+        self.today = timezone.localdate()
+
+    def sell(self, variant, quantity, price, days_ago=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(User=self.user, ShipAddress='HN', ShipDate=timezone.now())
+            Order.objects.filter(pk=order.pk).update(created_date=timezone.now() - timedelta(days=days_ago))
+            order.refresh_from_db()
+            return OrderDetail.objects.create(Order=order, Variant=variant, Quantity=quantity, Price=price,
+                                              Status='Pending')
+
+    def test_rollup_is_updated_incrementally(self):
+        detail = self.sell(self.variants[0], 2, 2000)
+        self.sell(self.variants[0], 1, 1000)
+        row = DailyVariantSales.objects.get()
+        self.assertEqual((row.Date, row.Units, row.Revenue, row.Orders), (self.today, 3, 3000, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            detail.delete()
+        self.assertEqual(DailyVariantSales.objects.get().Units, 1)
+
+        incremental = list(DailyVariantSales.objects.values_list('Date', 'Variant_id', 'Units', 'Revenue'))
+        analytics.rebuild(self.today, self.today)
+        self.assertEqual(list(DailyVariantSales.objects.values_list('Date', 'Variant_id', 'Units', 'Revenue')),
+                         incremental)
+
+    def test_edits_apply_deltas_without_locking_the_variant(self):
+        first, second = self.variants[:2]
+        locked, select_for_update = [], QuerySet.select_for_update
+
+        def record(queryset, *args, **kwargs):
+            locked.append(queryset.model)
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'select_for_update', record):
+            detail = self.sell(first, 2, 2000)
+            self.sell(first, 1, 1000, days_ago=1)
+            with self.captureOnCommitCallbacks(execute=True):
+                detail.Quantity, detail.Price = 5, 5000
+                detail.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                detail.Variant = second
+                detail.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                detail.Status = 'Done'
+                detail.save()
+        self.assertNotIn(Variant, locked)
+
+        def rows():
+            return sorted(DailyVariantSales.objects.values_list('Date', 'Variant_id', 'Units', 'Revenue', 'Orders'))
+
+        self.assertEqual(rows(), sorted([(self.today - timedelta(days=1), first.id, 1, 1000, 1),
+                                         (self.today, second.id, 5, 5000, 1)]))
+        incremental = rows()
+        analytics.rebuild(self.today - timedelta(days=1), self.today)
+        self.assertEqual(rows(), incremental)
+
+    def test_top_sellers_with_previous_period(self):
+        first, second, third = self.variants
+        self.sell(first, 1, 5000)
+        self.sell(second, 4, 4000)
+        self.sell(second, 1, 1000, days_ago=1)
+        self.sell(first, 2, 2000, days_ago=8)
+        self.sell(third, 9, 9000, days_ago=30)
+
+        self.client.force_authenticate(self.admin)
+        start = self.today - timedelta(days=6)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/order/sales-analytics/', {'start': start, 'end': self.today,
+                                                                    'by': 'variant', 'metric': 'units'})
+        self.assertEqual(response.status_code, 200)
+        # Chỉ đọc bảng tổng hợp, không join OrderDetail
+        self.assertFalse(any('apiphoneshop_orderdetail' in q['sql'] for q in ctx.captured_queries))
+
+        data = response.json()
+        self.assertEqual([(r['variant']['id'], r['units'], r['previous_units']) for r in data['results']],
+                         [(second.id, 5, 0), (first.id, 1, 2)])
+        self.assertEqual(data['results'][1]['units_change_pct'], -50.0)
+        self.assertEqual(data['totals']['revenue'], {'current': 10000, 'previous': 2000, 'change_pct': 400.0})
+
+        response = self.client.get('/order/sales-analytics/', {'start': start, 'end': self.today, 'by': 'brand'})
+        self.assertEqual(response.json()['results'][0]['revenue'], 10000)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/order/sales-analytics/', {'start': self.today, 'end': self.today})
+        self.assertEqual(response.status_code, 403)
+
+
+class CustomerAnalyticsTests(TestCase):
+
+    def order(self, user, created, total):
+        order = Order.objects.create(User=user, ShipAddress='HN', ShipDate=created, Total=total)
+        Order.objects.filter(pk=order.pk).update(created_date=created)
+
+    def test_rfm_and_cohorts(self):
+        tz = timezone.get_current_timezone()
+        loyal, once, lapsed = [User.objects.create_user(name, Address='HN') for name in ('loyal', 'once', 'lapsed')]
+        for month in (1, 2, 3):
+            self.order(loyal, timezone.datetime(2024, month, 10, tzinfo=tz), 100)
+        self.order(once, timezone.datetime(2024, 1, 20, tzinfo=tz), 50)
+        self.order(lapsed, timezone.datetime(2024, 2, 1, tzinfo=tz), 500)
+        self.order(lapsed, timezone.datetime(2024, 2, 2, tzinfo=tz), 500)
+
+        # chunk_size nhỏ để các đơn của một khách nằm ở nhiều chunk
+        rfm.rebuild(chunk_size=2, now=timezone.datetime(2024, 4, 10, tzinfo=tz))
+
+        scores = {row.User_id: row for row in CustomerRFM.objects.all()}
+        self.assertEqual((scores[loyal.id].Recency, scores[loyal.id].Frequency, scores[loyal.id].Monetary),
+                         (31, 3, 300))
+        self.assertEqual(scores[loyal.id].FScore, 5)
+        self.assertGreater(scores[loyal.id].RScore, scores[lapsed.id].RScore)
+        self.assertGreater(scores[lapsed.id].MScore, scores[once.id].MScore)
+
+        cohorts = {(row.Cohort.month, row.MonthOffset): (row.Customers, row.CohortSize)
+                   for row in CohortRetention.objects.all()}
+        self.assertEqual(cohorts, {(1, 0): (2, 2), (1, 1): (1, 2), (1, 2): (1, 2), (2, 0): (1, 1)})
+
+
+class ProductDescriptionTests(TestCase):
+    client_class = APIClient
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.variant = create_catalog()[0]
+        self.product = self.variant.Product
+        self.product.Description = '<p>Màn hình <b>6.7&quot;</b></p><script>alert(1)</script>' + '<p>x</p>' * 1000
+        self.product.save()
+
+    def test_excerpt_is_regenerated_on_save(self):
+        self.assertTrue(self.product.Excerpt.startswith('Màn hình 6.7" x x'))
+        self.assertLessEqual(len(self.product.Excerpt), 300)
+        self.product.Description = '<p>Mới</p>'
+        self.product.save(update_fields=['Description'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.Excerpt, 'Mới')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_list_defers_description(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/products/')
+        self.assertNotIn('Description', response.json()[0])
+        self.assertEqual(response.json()[0]['Excerpt'], self.product.Excerpt)
+        self.assertFalse(any('"Description"' in q['sql'] for q in ctx.captured_queries))
+
+    @override_settings(REPLICA_DATABASES=[], PRODUCT_DESCRIPTION_SANITIZE=True)
+    def test_retrieve_returns_sanitized_description(self):
+        description = self.client.get(f'/products/{self.product.id}/').json()['Description']
+        self.assertTrue(description.startswith('<p>Màn hình <b>6.7&quot;</b></p><p>x</p>'))
+        self.assertNotIn('script', description)
+
+
+    @override_settings(REPLICA_DATABASES=[], PRODUCT_DESCRIPTION_SANITIZE=True,
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                           'LOCATION': 'django_cache'}})
+    def test_async_detail_sanitizes_with_a_database_cache(self):
+        # Cache đồng bộ (DatabaseCache) không được gọi trong event loop
+        for _ in range(2):
+            response = self.client.get(f'/async/products/{self.product.id}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, self.client.get(f'/products/{self.product.id}/').content)
+        self.assertNotIn('script', response.json()['Description'])
+
+
+@override_settings(REPLICA_DATABASES=[], RESPONSE_COMPRESSION={'MIN_SIZE': 1024})
+class ResponseCompressionTests(TestCase):
+    client_class = APIClient
+
+    def test_encoding_is_negotiated(self):
+        create_catalog(products=20)
+        plain = self.client.get('/products/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        for accept, expected in [('gzip, br', 'br'), ('br;q=0.5, gzip', 'gzip'), ('br;q=0, gzip;q=0', None)]:
+            with self.subTest(accept=accept):
+                response = self.client.get('/products/', HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response.get('Content-Encoding'), expected)
+                if expected:
+                    self.assertLess(len(response.content), len(plain.content))
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get('/products/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class CatalogSnapshotTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        settings_override = override_settings(CATALOG_SNAPSHOT={'DIR': directory.name, 'URL': '/media/catalog/',
+                                                                 'DEBOUNCE': 0, 'KEEP': 2})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.variant = create_catalog(products=2)[0]
+
+    def test_build_writes_precompressed_versions(self):
+        manifest = snapshot.build()
+        name = manifest['url'].rsplit('/', 1)[-1]
+        body = (self.dir / name).read_bytes()
+        self.assertEqual(gzip.decompress((self.dir / f'{name}.gz').read_bytes()), body)
+        self.assertEqual(len(json.loads(body)), 2)
+        rebuilt = snapshot.build()
+        self.assertEqual(rebuilt['version'], manifest['version'])
+
+        response = self.client.get('/products/snapshot/')
+        self.assertEqual(response.json(), rebuilt)
+
+    def test_catalog_changes_are_debounced(self):
+        first = snapshot.build()
+        cache.clear()
+        self.assertIsNone(snapshot.build_if_due())
+        self.variant.Price = 2000
+        self.variant.save()
+        second = snapshot.build_if_due()
+        self.assertNotEqual(second['version'], first['version'])
+        self.assertIsNone(snapshot.build_if_due())
+
+        self.variant.Price = 3000
+        self.variant.save()
+        snapshot.build_if_due()
+        # Chỉ giữ KEEP phiên bản gần nhất
+        self.assertEqual(len(list(self.dir.glob('catalog-*.json'))), 2)
+        self.assertFalse((self.dir / f"catalog-{first['version']}.json").exists())
+
+    def test_first_change_is_kept_until_the_build(self):
+        cache.clear()
+        with override_settings(CATALOG_SNAPSHOT={'DIR': str(self.dir), 'DEBOUNCE': 30, 'MAX_DELAY': 300}):
+            for now in (1000, 1020, 1290):
+                with mock.patch('time.time', return_value=now):
+                    snapshot.mark_dirty()
+            # Thay đổi liên tục: vẫn ghi lại sau MAX_DELAY giây kể từ thay đổi đầu tiên
+            with mock.patch('time.time', return_value=1299):
+                self.assertFalse(snapshot.due())
+            with mock.patch('time.time', return_value=1300):
+                self.assertTrue(snapshot.due())
+                self.assertIsNotNone(snapshot.build_if_due())
+                self.assertFalse(snapshot.due())
+
+    def test_loop_refuses_a_process_local_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('build_catalog_snapshot', '--loop', stdout=StringIO())
+
+
+@override_settings(SYNC_CATALOG={'LAG': 0, 'PAGE_SIZE': 2}, REPLICA_DATABASES=[])
+class SyncCatalogTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.variants = create_catalog(products=2)
+
+    def read_all(self, cursor=None):
+        seen = []
+        while True:
+            response = self.client.get('/sync/catalog/', {'since': cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen += body['changes']
+            cursor = body['cursor']
+            if not body['has_more']:
+                return seen, cursor
+
+    def test_pages_resume_from_cursor(self):
+        seen, cursor = self.read_all()
+        self.assertEqual(sorted((c['type'], c['id']) for c in seen),
+                         sorted([('brand', self.variants[0].Product.Brand_id)]
+                                + [('product', v.Product_id) for v in self.variants]
+                                + [('variant', v.id) for v in self.variants]))
+        self.assertEqual(self.read_all(cursor)[0], [])
+
+        self.variants[1].Price = 2000
+        self.variants[1].save()
+        changed, _ = self.read_all(cursor)
+        self.assertEqual([(c['type'], c['id'], c['data']['Price']) for c in changed],
+                         [('variant', self.variants[1].id, 2000)])
+
+    def test_deletions_are_returned_as_tombstones(self):
+        _, cursor = self.read_all()
+        variant_id = self.variants[0].id
+        self.variants[0].delete()
+        changed, _ = self.read_all(cursor)
+        self.assertEqual(changed, [{'type': 'variant', 'op': 'delete', 'id': variant_id}])
+
+    def test_snapshot_manifest_includes_cursor(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(CATALOG_SNAPSHOT={'DIR': directory, 'URL': '/media/catalog/'}):
+            cursor = snapshot.build()['sync_cursor']
+        self.variants[0].Color = 'White'
+        self.variants[0].save()
+        self.assertIn(('variant', self.variants[0].id), [(c['type'], c['id']) for c in self.read_all(cursor)[0]])
+
+    def test_bad_cursors_are_rejected(self):
+        self.assertEqual(self.client.get('/sync/catalog/', {'since': 'not-a-cursor'}).status_code, 400)
+        expired = sync.encode_cursor(timezone.now() - timedelta(days=31))
+        self.assertEqual(self.client.get('/sync/catalog/', {'since': expired}).status_code, 410)
+
+
+@override_settings(ORDER_RETENTION={'CART_IDLE_DAYS': 30, 'ARCHIVE_AFTER_DAYS': 365, 'BATCH_SIZE': 1},
+                   REPLICA_DATABASES=[])
+class RetentionTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', Address='HN', Phone_number='0900')
+        self.variant = create_catalog()[0]
+
+    def age(self, queryset, days):
+        queryset.update(created_date=timezone.now() - timedelta(days=days),
+                        update_date=timezone.now() - timedelta(days=days))
+
+    def test_only_idle_carts_are_purged(self):
+        idle, touched, holding = (Cart.objects.create(User=User.objects.create_user(name, Address='HN'))
+                                  for name in ('idle', 'touched', 'holding'))
+        CartItem.objects.create(Cart=touched, Variant=self.variant, Quantity=1)
+        StockReservation.objects.create(Cart=holding, Variant=self.variant, Quantity=1,
+                                        ExpiresAt=timezone.now() + timedelta(minutes=5))
+        self.age(Cart.objects.all(), 31)
+        self.assertEqual(retention.purge_carts(), 1)
+        self.assertEqual(set(Cart.objects.values_list('id', flat=True)), {touched.id, holding.id})
+
+    def test_archived_orders_are_still_readable(self):
+        orders = []
+        for _ in range(3):
+            order = Order.objects.create(User=self.user, ShipAddress='HN', ShipDate=timezone.now())
+            OrderDetail.objects.create(Order=order, Variant=self.variant, Quantity=1, Price=500, Status='Done')
+            orders.append(order)
+        # Đơn có id lớn nhất luôn ở lại bảng chính
+        self.age(Order.objects.all(), 400)
+        old_day = timezone.localdate(timezone.now() - timedelta(days=400))
+        analytics.rebuild(old_day, old_day)
+
+        self.assertEqual(retention.archive_orders(), 2)
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [orders[2].id])
+        self.assertEqual(ArchivedOrder.objects.get(id=orders[0].id).order_details.get().Price, 500)
+        # Chỉ chuyển bảng: tổng hợp bán hàng không đổi, kể cả khi tính lại
+        self.assertEqual(DailyVariantSales.objects.get(Date=old_day).Orders, 3)
+        analytics.rebuild(old_day, old_day)
+        self.assertEqual(DailyVariantSales.objects.get(Date=old_day).Units, 3)
+
+        self.client.force_authenticate(self.user)
+        history = self.client.get('/order/my-orders/', {'page_size': 2}).json()
+        self.assertEqual(history['count'], 3)
+        self.assertEqual([o['id'] for o in history['results']], [orders[2].id, orders[1].id])
+        page = self.client.get('/order/my-orders/', {'page_size': 2, 'page': 2}).json()
+        self.assertEqual(page['results'][0]['order_details'][0]['Variant']['SKU'], self.variant.SKU)
+
+        response = self.client.post('/order/check-order/', {'phone_number': '0900', 'order_code': orders[0].id},
+                                    format='json')
+        self.assertEqual((response.status_code, response.json()['Total']), (200, 500))
+
+
+@override_settings(REPLICA_DATABASES=[])
+class BulkEditTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.staff = User.objects.create_superuser('staff', 'staff@example.com', 'secret', Address='HN')
+        self.variants = create_catalog(products=3)
+        Variant.objects.filter(id=self.variants[0].id).update(CompareAtPrice=900)
+        self.client.force_authenticate(self.staff)
+
+    def prices(self, field='Price'):
+        return list(Variant.objects.order_by('id').values_list(field, flat=True))
+
+    def test_price_change_with_dry_run(self):
+        payload = {'all': True, 'mode': 'percent', 'value': -10, 'dry_run': True}
+        preview = self.client.post('/variants/bulk-price/', payload, format='json').json()
+        self.assertEqual((preview['matched'], preview['preview'][0]['new']), (3, 900))
+        self.assertEqual(self.prices(), [1000] * 3)
+
+        payload.update(dry_run=False)
+        self.assertEqual(self.client.post('/variants/bulk-price/', payload, format='json').json()['updated'], 3)
+        self.assertEqual(self.prices(), [900] * 3)
+        # Variant không có CompareAtPrice giữ nguyên NULL
+        payload = {'ids': [v.id for v in self.variants], 'field': 'CompareAtPrice', 'mode': 'absolute',
+                   'value': -1000}
+        self.assertEqual(self.client.post('/variants/bulk-price/', payload, format='json').json()['updated'], 1)
+        self.assertEqual(self.prices('CompareAtPrice'), [0, None, None])
+
+        self.assertEqual(self.client.post('/variants/bulk-price/', {'mode': 'percent', 'value': 5},
+                                          format='json').status_code, 400)
+        self.client.force_authenticate(User.objects.create_user('buyer', Address='HN'))
+        self.assertEqual(self.client.post('/variants/bulk-price/', payload, format='json').status_code, 403)
+
+    def test_stock_csv_import(self):
+        enable_sharding(self.variants[2].id, 2)
+        csv_text = f"sku,quantity\n{self.variants[0].SKU},5\n{self.variants[1].SKU},-20\n" \
+                   f"{self.variants[2].SKU},1\nUNKNOWN,3\n"
+        result = self.client.post('/variants/bulk-stock/', {'csv': csv_text, 'mode': 'adjust'}, format='json').json()
+        self.assertEqual((result['updated'], result['missing']), (2, ['UNKNOWN']))
+        self.assertEqual(result['skipped'][0]['key'], self.variants[2].SKU)
+        self.assertEqual(self.prices('Quantity')[:2], [15, 0])
+
+        upload = SimpleUploadedFile('stock.csv', f"id,quantity\n{self.variants[0].id},7\n".encode())
+        self.assertEqual(self.client.post('/variants/bulk-stock/', {'file': upload}).json()['updated'], 1)
+        self.assertEqual(Variant.objects.get(id=self.variants[0].id).Quantity, 7)
+        bad = self.client.post('/variants/bulk-stock/', {'csv': "sku,quantity\nX,many\n"}, format='json')
+        self.assertEqual(bad.json()['errors'][0]['line'], 2)
+
+    def test_admin_action(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('admin:apiphoneshop_variant_changelist'), {
+            'action': 'apply_bulk_edit', '_selected_action': [self.variants[0].id, self.variants[1].id],
+            'operation': 'price_absolute', 'field': 'Price', 'value': '250'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.prices(), [1250, 1250, 1000])
+
+
+def full_scans(queryset):
+    """Các bảng bị quét toàn bộ trong kế hoạch thực thi (EXPLAIN) của queryset."""
+    if connection.vendor == 'mysql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row))['table'] for row in cursor.fetchall()
+                    if dict(zip(columns, row))['type'] == 'ALL']
+    plan = queryset.explain()
+    if connection.vendor == 'postgresql':
+        return re.findall(r'Seq Scan on (\w+)', plan)
+    # SQLite: "SCAN bảng" là quét toàn bộ, "SCAN bảng USING INDEX ..." là duyệt theo index
+    return [table for table, rest in re.findall(r'\bSCAN (?:TABLE )?(\w+)(.*)', plan) if 'USING' not in rest]
+
+
+@override_settings(REPLICA_DATABASES=[])
+class QueryPlanTests(TestCase):
+    """Các truy vấn nóng phải dùng index trên dữ liệu seed_catalog, không quét toàn bảng."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_catalog', products=20, variants=2, images=1, comments=2, description_kb=1,
+                     stdout=StringIO())
+        cls.user = User.objects.create_user('buyer', Address='HN', Phone_number='0900')
+        cls.variant = Variant.objects.first()
+        cls.cart = Cart.objects.create(User=cls.user)
+        CartItem.objects.create(Cart=cls.cart, Variant=cls.variant, Quantity=1)
+        Discount.objects.create(Code='SALE', DiscountPercent=10, StartDate=date(2020, 1, 1), EndDate=date(2030, 1, 1))
+        for _ in range(3):
+            order = Order.objects.create(User=cls.user, ShipAddress='HN', ShipDate=timezone.now())
+            OrderDetail.objects.create(Order=order, Variant=cls.variant, Quantity=1, Price=1000, Status='Pending')
+        cls.order = order
+
+    def hot_queries(self):
+        today = timezone.localdate()
+        return {
+            'my_orders': Order.objects.filter(User=self.user).order_by('-created_date', '-id'),
+            'check_order': Order.objects.filter(User__Phone_number='0900', id=self.order.id),
+            'revenue_year': (OrderDetail.objects.filter(Order__ShipDate__year=today.year)
+                             .annotate(month=ExtractMonth('Order__ShipDate')).values('month').order_by()
+                             .annotate(revenue=Sum(F('Price') * F('Quantity')))),
+            'discount_code': Discount.objects.filter(Code='SALE', StartDate__lte=today, EndDate__gte=today),
+            'cart': Cart.objects.filter(User=self.user),
+            'cart_item': CartItem.objects.filter(Cart=self.cart, Variant=self.variant),
+            'variant_comments': Comment.objects.select_related('User').filter(Variant=self.variant)
+                                .order_by('-created_date', '-id'),
+            'stock_reserved': StockReservation.objects.filter(Variant=self.variant, ExpiresAt__gt=timezone.now()),
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                self.assertEqual(full_scans(queryset), [], queryset.explain())
+
+    def test_full_scan_is_detected(self):
+        self.assertEqual(full_scans(Order.objects.filter(Note='x')), [Order._meta.db_table])
+
+
+def jpeg(name='photo.jpg', size=(800, 600)):
+    buffer = io.BytesIO()
+    images.pillow().new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(REPLICA_DATABASES=[])
+class ImageIngestTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media = Path(directory.name)
+        settings_override = override_settings(
+            MEDIA_ROOT=directory.name, MEDIA_URL='/media/',
+            IMAGE_INGEST={'UPLOADER': 'apiphoneshop.images.fake_upload', 'MAX_ATTEMPTS': 2, 'RETRY_DELAY': 60})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.product = create_catalog()[0].Product
+
+    def test_save_stores_locally_until_uploaded(self):
+        image = ListImg.objects.create(Product=self.product, TitlePhoto=jpeg())
+        job = ImageUpload.objects.get()
+        self.assertEqual((job.Model, job.ObjectId, job.Status), ('listimg', image.id, ImageUpload.PENDING))
+        self.assertTrue((self.media / job.LocalPath).exists())
+        # Thumbnail được tạo khi lưu và là URL hiển thị trong lúc chờ
+        self.assertEqual(job.Thumbnail, images.thumbnail_path(job.LocalPath))
+        response = self.client.get(f'/products/{self.product.id}/')
+        self.assertEqual(response.json()['images'][0]['url_TitlePhoto'], f'/media/{job.Thumbnail}')
+
+        self.assertEqual(images.process_uploads(), (1, 0))
+        job.refresh_from_db()
+        image.refresh_from_db()
+        self.assertEqual(job.Status, ImageUpload.DONE)
+        self.assertTrue(image.TitlePhoto.public_id.startswith('fake/'))
+        self.assertIn('res.cloudinary.com', images.image_url(image.TitlePhoto))
+        self.assertFalse((self.media / job.LocalPath).exists())
+        self.assertTrue((self.media / job.Thumbnail).exists())
+
+    def test_pending_file_without_thumbnail_is_served_as_is(self):
+        ListImg.objects.create(Product=self.product,
+                               TitlePhoto=SimpleUploadedFile('photo.jpg', b'not an image', content_type='image/jpeg'))
+        job = ImageUpload.objects.get()
+        self.assertEqual(job.Thumbnail, '')
+        response = self.client.get(f'/products/{self.product.id}/')
+        self.assertEqual(response.json()['images'][0]['url_TitlePhoto'], f'/media/{job.LocalPath}')
+
+    def test_failed_upload_is_retried_with_backoff(self):
+        ListImg.objects.create(Product=self.product, TitlePhoto=jpeg())
+        with override_settings(IMAGE_INGEST={'UPLOADER': 'apiphoneshop.images.fake_upload', 'MAX_ATTEMPTS': 2,
+                                             'RETRY_DELAY': 60, 'FAKE_FAILURE_RATE': 1.0}):
+            self.assertEqual(images.process_uploads(), (0, 1))
+            job = ImageUpload.objects.get()
+            self.assertEqual((job.Status, job.Attempts), (ImageUpload.PENDING, 1))
+            self.assertGreater(job.NextAttemptAt, timezone.now() + timedelta(seconds=50))
+            # Chưa đến hạn thử lại
+            self.assertEqual(images.process_uploads(), (0, 0))
+
+            ImageUpload.objects.update(NextAttemptAt=timezone.now())
+            self.assertEqual(images.process_uploads(), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual(job.Status, ImageUpload.FAILED)
+            self.assertIn('ConnectionError', job.LastError)
+
+    def test_replaced_image_is_not_overwritten(self):
+        variant = Variant.objects.get(Product=self.product)
+        variant.Img = jpeg()
+        variant.save()
+        variant.Img = jpeg('second.jpg', size=(640, 480))
+        variant.save()
+        self.assertEqual(images.process_uploads(), (2, 0))
+        variant.refresh_from_db()
+        second = ImageUpload.objects.order_by('id').last()
+        self.assertEqual(variant.Img.public_id, images.FakeCloudinary()(jpeg('second.jpg', size=(640, 480)))['public_id'])
+        self.assertEqual(second.Status, ImageUpload.DONE)
+
+
+@override_settings(REPLICA_DATABASES=[])
+class CommentFeedTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        self.variant, self.other = create_catalog(products=1, variants_per_product=2)
+        self.users = [User.objects.create_user(f'reader{i}', Address='HN', Phone_number=f'08{i:08d}')
+                      for i in range(5)]
+        for i, user in enumerate(self.users):
+            Comment.objects.create(User=user, Variant=self.variant, Comment=f'Bình luận {i}', Star=5)
+        Comment.objects.create(User=self.users[0], Variant=self.other, Comment='Khác', Star=4)
+
+    def test_feeds_are_filtered_newest_first_with_cursor(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/cmt/', {'variant': self.variant.id, 'page_size': 3})
+        page = response.json()
+        self.assertEqual([c['Comment'] for c in page['results']], ['Bình luận 4', 'Bình luận 3', 'Bình luận 2'])
+        self.assertEqual(page['results'][0]['User']['Address'], 'HN')
+        rest = self.client.get(page['next']).json()
+        self.assertEqual([c['Comment'] for c in rest['results']], ['Bình luận 1', 'Bình luận 0'])
+        self.assertIsNone(rest['next'])
+
+        product = self.client.get('/cmt/', {'product': self.variant.Product_id}).json()
+        self.assertEqual(len(product['results']), 6)
+        self.assertEqual(self.client.get('/cmt/', {'variant': 'x'}).status_code, 400)
+
+    def test_first_page_is_cached_until_comments_change(self):
+        url = f'/cmt/?variant={self.variant.id}'
+        first = self.client.get(url).json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), first)
+
+        self.client.force_authenticate(self.users[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/cmt/', {'Variant': self.variant.id, 'Comment': 'Mới', 'Star': 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(url).json()['results'][0]['Comment'], 'Mới')
+
+        comment_id = response.json()['id']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/cmt/{comment_id}/', {'Variant': self.other.id})
+        self.assertNotIn('Mới', [c['Comment'] for c in self.client.get(url).json()['results']])
+        self.assertEqual(self.client.get(f'/cmt/?variant={self.other.id}').json()['results'][0]['Comment'], 'Mới')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/cmt/{comment_id}/')
+        self.assertEqual(len(self.client.get(f'/cmt/?variant={self.other.id}').json()['results']), 1)
+
+    def test_page_read_before_a_change_is_not_served_after_it(self):
+        url = f'/cmt/?variant={self.variant.id}'
+        list_comments = ListModelMixin.list
+
+        def slow_reader(viewset, request, *args, **kwargs):
+            # Bình luận mới được commit trong lúc request này đang dựng trang từ dữ liệu cũ
+            response = list_comments(viewset, request, *args, **kwargs)
+            Comment.objects.create(User=self.users[2], Variant=self.variant, Comment='Mới', Star=3)
+            viewset.forget_first_page(self.variant.id)
+            return response
+
+        with mock.patch.object(ListModelMixin, 'list', slow_reader), self.captureOnCommitCallbacks(execute=True):
+            stale = self.client.get(url).json()
+        self.assertNotIn('Mới', [c['Comment'] for c in stale['results']])
+        self.assertEqual(self.client.get(url).json()['results'][0]['Comment'], 'Mới')
+
+
+@override_settings(REPLICA_DATABASES=[])
+class ProfilingTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        settings_override = override_settings(PROFILING={'DIR': directory.name, 'KEEP': 2, 'SAMPLE_INTERVAL': 0.001})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user('staff', Address='HN', is_staff=True)
+        create_catalog(products=3)
+
+    def test_staff_header_writes_downloadable_dumps(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/products/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        entry = self.client.get('/profiles/').json()[0]
+        self.assertEqual((entry['id'], entry['action'], entry['trigger']), (profile_id, 'ProductViewSet.list', 'header'))
+
+        pstats = self.client.get(f'/profiles/{profile_id}/download/')
+        self.assertEqual(pstats.status_code, 200)
+        self.assertTrue(b''.join(pstats.streaming_content))
+        collapsed = b''.join(self.client.get(f'/profiles/{profile_id}/download/?kind=collapsed').streaming_content)
+        for line in collapsed.decode().splitlines():
+            self.assertRegex(line, r'^\S.* \d+$')
+        self.assertEqual(self.client.get(f'/profiles/{profile_id}/download/?kind=svg').status_code, 404)
+
+    def test_staff_bearer_token_is_authenticated_before_profiling(self):
+        AccessToken.objects.create(user=self.staff, token='staff-token', scope='read write',
+                                   expires=timezone.now() + timedelta(hours=1))
+        response = self.client.get('/products/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION='Bearer staff-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads((self.dir / f"{response['X-Profile-Id']}.json").read_text())['user'], 'staff')
+
+    def test_header_is_ignored_for_other_users(self):
+        user = User.objects.create_user('customer', Address='HN')
+        with mock.patch('cProfile.Profile') as profiler:
+            response = self.client.get('/products/', HTTP_X_PROFILE='1')
+            self.client.force_authenticate(user)
+            self.assertFalse(self.client.get('/products/', HTTP_X_PROFILE='1').has_header('X-Profile-Id'))
+        # Không chạy profiler cho khách hay người dùng thường
+        profiler.assert_not_called()
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(self.client.get('/profiles/').status_code, 403)
+        self.assertFalse(list(self.dir.glob('*')))
+
+    def test_sampled_actions_keep_a_bounded_ring_buffer(self):
+        with override_settings(PROFILING={'DIR': str(self.dir), 'KEEP': 2, 'SAMPLE_RATES': {'ProductViewSet.list': 1}}):
+            anonymous = self.client.get('/products/')
+            self.client.force_authenticate(self.staff)
+            ids = [self.client.get('/products/')['X-Profile-Id'] for _ in range(3)]
+            self.assertFalse(self.client.get('/variants/').has_header('X-Profile-Id'))
+        # Lần lấy mẫu của khách vẫn được ghi nhưng id chỉ trả cho staff
+        self.assertFalse(anonymous.has_header('X-Profile-Id'))
+        self.assertEqual(sorted(path.stem for path in self.dir.glob('*.json')), sorted(ids[1:]))
+        self.assertEqual(len(list(self.dir.glob('*.pstats'))), 2)
+
+
+class StartupReportTests(TestCase):
+    def test_heavy_dependencies_are_not_imported_at_startup(self):
+        out = StringIO()
+        call_command('startup_report', '--json', '--runs', '1', '--top', '5000', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['phases_ms']), {'settings', 'apps_ready', 'urlconf', 'total'})
+        modules = {name for name, _, _ in report['slowest_modules_ms']}
+        self.assertIn('apiphoneshop.views', modules)
+        self.assertFalse({'numpy', 'apiphoneshop.momo_payment'} & modules)
+
+    def test_budget_is_enforced(self):
+        with self.assertRaisesMessage(CommandError, 'budget'):
+            call_command('startup_report', '--runs', '1', '--max-ms', '0', stdout=StringIO())
+
+
+@override_settings(REPLICA_DATABASES=[])
+class ReadPlanContractTests(TestCase):
+    """read_plans phải trả về đúng JSON của serializer mà nó thay thế."""
+
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', Address='HN')
+        variants = create_catalog(products=3, variants_per_product=2)
+        Variant.objects.filter(id=variants[0].id).update(CompareAtPrice=1200)
+        ListImg.objects.create(Product=variants[0].Product, TitlePhoto='image/upload/v1/front.jpg')
+        ListImg.objects.create(Product=variants[0].Product, TitlePhoto=images._placeholder(ListImg, 'pending/a.jpg'))
+        ListImg.objects.create(Product=variants[2].Product, TitlePhoto='')
+        for i, variant in enumerate(variants):
+            order = Order.objects.create(User=self.user, ShipAddress='HN', Note=f'#{i}',
+                                         ShipDate=timezone.now() + timedelta(days=i, microseconds=i))
+            OrderDetail.objects.create(Order=order, Variant=variant, Quantity=1, Price=1000, Status='Pending')
+            OrderDetail.objects.create(Order=order, Variant=variants[-1], Quantity=2, Price=900, Status='Done')
+        Order.objects.filter(id__lt=order.id).update(created_date=timezone.now() - timedelta(days=400))
+        retention.archive_orders()
+        self.client.force_authenticate(self.user)
+
+    def both(self, path, **params):
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get(path, params)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_product_list_matches_serializer(self):
+        data, queries = self.both('/products/')
+        self.assertEqual(len(data), 3)
+        self.assertEqual(queries, 3)
+        self.assertEqual(self.both('/async/products/')[0], data)
+
+    def test_order_history_matches_serializer(self):
+        self.assertTrue(ArchivedOrder.objects.exists())
+        data, _ = self.both('/order/my-orders/')
+        self.assertEqual(data['count'], 6)
+        self.both('/order/my-orders/', page_size=4, page=2)
+
+    def test_catalog_snapshot_matches_serializer(self):
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = snapshot.render_catalog()
+        self.assertEqual(snapshot.render_catalog(), expected)
+
+    def test_benchmark_checks_output(self):
+        out = StringIO()
+        call_command('bench_read_plans', repeat=1, stdout=out)
+        self.assertIn('my-orders', out.getvalue())
+
+
+@override_settings(REPLICA_DATABASES=[])
+class PricingTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', Address='HN', email='buyer@example.com')
+        self.client.force_authenticate(self.user)
+        self.variants = create_catalog(products=3)
+        Variant.objects.filter(id=self.variants[1].id).update(CompareAtPrice=1200)
+        cart = Cart.objects.create(User=self.user)
+        for quantity, variant in enumerate(self.variants, start=1):
+            CartItem.objects.create(Cart=cart, Variant=variant, Quantity=quantity)
+        today = timezone.localdate()
+        Discount.objects.create(Code='PCT', DiscountPercent=10, StartDate=today, EndDate=today)
+        Discount.objects.create(Code='OFF', DiscountMoney=1500, StartDate=today, EndDate=today)
+        Discount.objects.create(Code='OLD', DiscountPercent=50, StartDate=today - timedelta(days=9),
+                                EndDate=today - timedelta(days=1))
+
+    def quote(self, **params):
+        response = self.client.get('/cart/quote/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_quote_matches_checkout(self):
+        self.assertEqual(self.quote()['total'], 1000 + 2 * 1200 + 3 * 1000)
+        for code in ('PCT', 'OFF'):
+            quote = self.quote(discount_code=code)
+            for line in quote['lines']:
+                response = self.client.post('/order/', {
+                    'variant_id': line['variant_id'], 'quantity': line['quantity'], 'discount_code': code,
+                    'ship_address': 'HN', 'payment': 'COD'}, format='json')
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(OrderDetail.objects.get(Order_id=response.json()['id']).Price, line['total'])
+            self.assertEqual(quote['total'], quote['subtotal'] - quote['discount'])
+        # Giảm 1500 trên dòng 1000: không xuống dưới 0
+        self.assertEqual(self.quote(discount_code='OFF')['lines'][0]['total'], 0)
+
+    def test_expired_code_is_rejected(self):
+        response = self.client.get('/cart/quote/', {'discount_code': 'OLD'})
+        self.assertEqual(response.status_code, 400)
+        order = self.client.post('/order/', {'variant_id': self.variants[0].id, 'quantity': 1, 'discount_code': 'OLD',
+                                             'ship_address': 'HN', 'payment': 'COD'}, format='json')
+        self.assertEqual(order.status_code, 400)
+        self.assertEqual(order.json(), response.json())
+
+    def test_lookups_are_cached_until_prices_change(self):
+        self.quote(discount_code='PCT')
+        with CaptureQueriesContext(connection) as ctx:
+            self.quote(discount_code='PCT')
+        self.assertEqual(len(ctx.captured_queries), 1)  # chỉ đọc giỏ hàng
+
+        variant = self.variants[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.Price = 800
+            variant.save()
+        self.assertEqual(self.quote()['lines'][0]['unit_price'], 800)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_edit.reprice(Variant.objects.filter(id=variant.id), 'Price', bulk_edit.ABSOLUTE, 100)
+        self.assertEqual(self.quote()['lines'][0]['unit_price'], 900)
+
+    def test_renamed_codes_are_forgotten(self):
+        self.quote(discount_code='PCT')
+        discount = Discount.objects.get(Code='PCT')
+        with self.captureOnCommitCallbacks(execute=True):
+            discount.Code = 'PCT2'
+            discount.save()
+        self.assertEqual(self.client.get('/cart/quote/', {'discount_code': 'PCT'}).status_code, 400)
+        self.assertEqual(self.quote(discount_code='PCT2')['discount_code'], 'PCT2')
+
+    def test_checkout_rechecks_cached_codes(self):
+        self.quote(discount_code='PCT')
+        # update() không gửi signal: cache vẫn còn mã cũ nhưng đặt hàng đọc lại database
+        Discount.objects.filter(Code='PCT').update(EndDate=timezone.localdate() - timedelta(days=1))
+        self.assertEqual(self.quote(discount_code='PCT')['discount_code'], 'PCT')
+        order = self.client.post('/order/', {'variant_id': self.variants[0].id, 'quantity': 1, 'discount_code': 'PCT',
+                                             'ship_address': 'HN', 'payment': 'COD'}, format='json')
+        self.assertEqual(order.status_code, 400)
+
+
+@override_settings(REPLICA_DATABASES=[])
+class AsyncCatalogTests(TestCase):
+    """Các endpoint /async/ phải trả về đúng JSON của endpoint DRF tương ứng."""
+
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        self.variants = create_catalog(products=2, variants_per_product=2)
+        product = self.variants[0].Product
+        ListImg.objects.create(Product=product, TitlePhoto='image/upload/v1/front.jpg')
+        user = User.objects.create_user('reader', Address='HN')
+        for variant in self.variants[:3]:
+            Comment.objects.create(User=user, Variant=variant, Comment=f'Về {variant.SKU}', Star=5)
+
+    def assertSameResponse(self, path):
+        sync, asynchronous = self.client.get(path), self.client.get(f'/async{path}')
+        self.assertEqual(asynchronous.status_code, sync.status_code)
+        # Link phân trang trỏ về endpoint của chính nó
+        self.assertEqual(asynchronous.content, sync.content.replace(b'//testserver/', b'//testserver/async/'))
+        return sync
+
+    def test_product_endpoints_match(self):
+        product = self.variants[0].Product
+        self.assertSameResponse('/products/')
+        self.assertSameResponse(f'/products/{product.id}/')
+        self.assertSameResponse('/products/0/')
+
+    def test_variant_detail_matches(self):
+        self.assertSameResponse(f'/variants/{self.variants[1].id}/')
+        self.assertSameResponse('/variants/0/')
+
+    def test_comment_feed_matches(self):
+        self.assertSameResponse('/cmt/')
+        self.assertSameResponse(f'/cmt/?product={self.variants[0].Product_id}')
+        page = self.assertSameResponse(f'/cmt/?variant={self.variants[0].id}&page_size=1').json()
+        self.assertEqual(len(page['results']), 1)
+        # Trang sau theo cursor, cursor sai và bộ lọc sai
+        product_page = self.assertSameResponse(f'/cmt/?product={self.variants[0].Product_id}&page_size=1').json()
+        self.assertSameResponse(product_page['next'].split('testserver', 1)[1])
+        self.assertEqual(self.assertSameResponse('/cmt/?cursor=bad').status_code, 404)
+        self.assertEqual(self.assertSameResponse('/cmt/?variant=x').status_code, 400)
+
+    def test_only_safe_methods(self):
+        self.assertEqual(self.client.post('/async/products/').status_code, 405)
+
+
+@override_settings(REPLICA_DATABASES=[])
+class StockReservationTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.variant = create_catalog()[0]
+        Variant.objects.filter(id=self.variant.id).update(Quantity=5)
+        self.users = [User.objects.create_user(f'shopper{i}', Address='HN', Phone_number=f'07{i:08d}')
+                      for i in range(2)]
+        self.carts = [Cart.objects.create(User=user) for user in self.users]
+
+    def stock(self):
+        return Variant.objects.values_list('Quantity', flat=True).get(id=self.variant.id)
+
+    def test_reservations_hold_stock_from_other_carts(self):
+        mine, theirs = self.carts
+        reserve(mine, self.variant.id, 3)
+        with self.assertRaises(InsufficientStock) as ctx:
+            reserve(theirs, self.variant.id, 3)
+        self.assertEqual(ctx.exception.available, 2)
+        # Gọi lại thay thế số lượng đang giữ, không cộng dồn
+        reserve(mine, self.variant.id, 4)
+        self.assertEqual(StockReservation.objects.get(Cart=mine).Quantity, 4)
+        reserve(theirs, self.variant.id, 1)
+
+    def test_consume_uses_the_cart_reservation_first(self):
+        mine, theirs = self.carts
+        reserve(mine, self.variant.id, 3)
+        reserve(theirs, self.variant.id, 2)
+        consume(mine, self.variant.id, 2)
+        self.assertEqual((self.stock(), StockReservation.objects.get(Cart=mine).Quantity), (3, 1))
+        # 1 còn giữ + 0 còn trống: không lấn sang phần giữ của giỏ khác
+        with self.assertRaises(InsufficientStock):
+            consume(mine, self.variant.id, 2)
+        consume(mine, self.variant.id, 1)
+        self.assertFalse(StockReservation.objects.filter(Cart=mine).exists())
+        with self.assertRaises(InsufficientStock):
+            consume(None, self.variant.id, 1)
+        consume(theirs, self.variant.id, 2)
+        self.assertEqual(self.stock(), 0)
+
+    def test_expired_reservations_are_released(self):
+        mine, theirs = self.carts
+        reserve(mine, self.variant.id, 4)
+        reserve(theirs, self.variant.id, 1)
+        StockReservation.objects.filter(Cart=mine).update(ExpiresAt=timezone.now() - timedelta(seconds=1))
+        # Giữ chỗ hết hạn không còn chặn giỏ khác, kể cả trước khi được dọn
+        reserve(theirs, self.variant.id, 5)
+        self.assertEqual(release_expired(batch_size=1), 1)
+        self.assertEqual(list(StockReservation.objects.values_list('Cart', flat=True)), [theirs.id])
+
+    def test_sharded_variants_are_locked_while_reserving(self):
+        enable_sharding(self.variant.id, 4)
+        locked, select_for_update = [], QuerySet.select_for_update
+
+        def record(queryset, *args, **kwargs):
+            locked.append(queryset.model)
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'select_for_update', record):
+            reserve(self.carts[0], self.variant.id, 3)
+            with self.assertRaises(InsufficientStock):
+                consume(self.carts[1], self.variant.id, 3)
+        self.assertEqual(locked.count(Variant), 2)
+
+    def test_quantities_must_be_positive(self):
+        self.client.force_authenticate(self.users[0])
+        for quantity in (-100, 0, 'x'):
+            response = self.client.post('/cart/add-to-cart/', {'variant_id': self.variant.id, 'quantity': quantity})
+            self.assertEqual(response.status_code, 400)
+        order = self.client.post('/order/', {'variant_id': self.variant.id, 'quantity': -3, 'ship_address': 'HN',
+                                             'payment': 'COD'}, format='json')
+        self.assertEqual(order.status_code, 400)
+        with self.assertRaises(ValueError):
+            reserve(self.carts[0], self.variant.id, -100)
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(self.stock(), 5)
+
+    def test_update_quantity_replaces_the_reservation(self):
+        self.client.force_authenticate(self.users[0])
+        self.client.post('/cart/add-to-cart/', {'variant_id': self.variant.id, 'quantity': 2})
+        response = self.client.patch('/cart/update-quantity/', {'variant_id': self.variant.id, 'quantity': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((CartItem.objects.get().Quantity, StockReservation.objects.get().Quantity), (4, 4))
+        response = self.client.patch('/cart/update-quantity/', {'variant_id': self.variant.id, 'quantity': 6})
+        self.assertEqual((response.status_code, response.json()['available']), (400, 5))
+        self.assertEqual((CartItem.objects.get().Quantity, StockReservation.objects.get().Quantity), (4, 4))
+
+    def test_add_to_cart_accumulates_and_reserves(self):
+        self.client.force_authenticate(self.users[0])
+        for _ in range(2):
+            response = self.client.post('/cart/add-to-cart/', {'variant_id': self.variant.id, 'quantity': 2})
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(CartItem.objects.get().Quantity, 4)
+        self.assertEqual(StockReservation.objects.get().Quantity, 4)
+        response = self.client.post('/cart/add-to-cart/', {'variant_id': self.variant.id, 'quantity': 2})
+        self.assertEqual((response.status_code, response.json()['available']), (400, 5))
+        self.assertEqual(CartItem.objects.get().Quantity, 4)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class StockReservationConcurrencyTests(TransactionTestCase):
+    """Cần database có khóa dòng (MySQL trên production); SQLite không có SELECT ... FOR UPDATE nên bỏ qua."""
+
+    def run_concurrently(self, func, count):
+        barrier, errors = threading.Barrier(count), []
+
+        def worker(i):
+            barrier.wait()
+            try:
+                func(i)
+            except InsufficientStock:
+                pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_reservations_never_exceed_stock(self):
+        variant = create_catalog()[0]
+        Variant.objects.filter(id=variant.id).update(Quantity=5)
+        for shards in (0, 4):
+            enable_sharding(variant.id, shards)
+            StockReservation.objects.all().delete()
+            carts = [Cart.objects.create(User=User.objects.create_user(f'rush{shards}-{i}', Address='HN'))
+                     for i in range(8)]
+            self.run_concurrently(lambda i: reserve(carts[i], variant.id, 2), len(carts))
+            held = StockReservation.objects.aggregate(total=Sum('Quantity'))['total']
+            self.assertLessEqual(held, 5)
+            self.assertEqual(held, 4)
+
+
+@override_settings(ORDER_ADMISSION={'ENABLED': True, 'MAX_INFLIGHT_PER_VARIANT': 1, 'STALE_AFTER': 60})
+@mock.patch.object(admission, 'SHARED_COUNTER_BACKENDS', ('LocMemCache',))
+class AdmissionTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('flash', Address='HN', email='flash@example.com')
+        self.client.force_authenticate(self.user)
+        self.variant = create_catalog()[0]
+        self.payload = {'variant_id': self.variant.id, 'quantity': 1, 'ship_address': 'HN', 'payment': 'COD'}
+
+    def ticket(self, **fields):
+        return OrderTicket.objects.create(User=self.user, Variant=self.variant, Payload=self.payload, **fields)
+
+    def test_inflight_orders_are_capped_per_variant(self):
+        self.assertTrue(admission.try_acquire(self.variant.id))
+        self.assertFalse(admission.try_acquire(self.variant.id))
+        admission.release(self.variant.id)
+        self.assertTrue(admission.try_acquire(self.variant.id))
+
+    def test_orders_over_the_cap_are_queued_and_polled(self):
+        admission.try_acquire(self.variant.id)
+        response = self.client.post('/order/', self.payload, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.json()['Status'], response.json()['position']), (OrderTicket.QUEUED, 1))
+        poll_url = response.json()['poll_url']
+
+        # Slot vẫn bị giữ: worker bỏ qua ticket
+        self.assertEqual(admission.process_queue(), 0)
+        admission.release(self.variant.id)
+        self.assertEqual(admission.process_queue(), 1)
+        ticket = self.client.get(poll_url).json()
+        self.assertEqual((ticket['Status'], ticket['ResponseStatus']), (OrderTicket.DONE, 201))
+        self.assertEqual(ticket['Result']['id'], ticket['Order'])
+        self.assertTrue(Order.objects.filter(id=ticket['Order'], User=self.user).exists())
+
+        self.client.force_authenticate(User.objects.create_user('other', Address='HN'))
+        self.assertEqual(self.client.get(poll_url).status_code, 404)
+
+    def test_unexpected_errors_keep_the_outcome_of_the_order(self):
+        place_order = admission.place_order
+
+        def fail_after_saving(*args, **kwargs):
+            place_order(*args, **kwargs)
+            raise RuntimeError('SMTP down')
+
+        saved, unsaved = self.ticket(), self.ticket()
+        with self.assertLogs('apiphoneshop.admission', 'ERROR'):
+            with mock.patch.object(admission, 'place_order', fail_after_saving):
+                admission.process_queue(batch_size=1)
+            with mock.patch.object(admission, 'place_order', side_effect=RuntimeError('database down')):
+                admission.process_queue(batch_size=1)
+        saved.refresh_from_db()
+        unsaved.refresh_from_db()
+        self.assertEqual((saved.Status, saved.ResponseStatus), (OrderTicket.DONE, 201))
+        self.assertEqual(saved.Result['id'], saved.Order_id)
+        self.assertEqual((unsaved.Status, unsaved.ResponseStatus, unsaved.Order), (OrderTicket.FAILED, 500, None))
+
+    def test_stale_processing_tickets_are_finished_or_requeued(self):
+        order = Order.objects.create(User=self.user, ShipAddress='HN', ShipDate=timezone.now(), Payment='COD')
+        finished = self.ticket(Status=OrderTicket.PROCESSING, Order=order)
+        abandoned = self.ticket(Status=OrderTicket.PROCESSING)
+        recent = self.ticket(Status=OrderTicket.PROCESSING)
+        OrderTicket.objects.exclude(id=recent.id).update(update_date=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(admission.requeue_stale(), 2)
+        statuses = dict(OrderTicket.objects.values_list('id', 'Status'))
+        self.assertEqual([statuses[t.id] for t in (finished, abandoned, recent)],
+                         [OrderTicket.DONE, OrderTicket.QUEUED, OrderTicket.PROCESSING])
+        self.assertEqual(admission.process_queue(), 1)
+        self.assertEqual(OrderTicket.objects.get(id=abandoned.id).Status, OrderTicket.DONE)
+
+    def test_process_local_cache_is_rejected(self):
+        with mock.patch.object(admission, 'SHARED_COUNTER_BACKENDS', ('RedisCache',)):
+            with self.assertRaises(ImproperlyConfigured):
+                admission.enabled()
+            self.assertEqual([e.id for e in checks.check_order_admission(None)], ['apiphoneshop.E001'])
+        self.assertEqual(checks.check_order_admission(None), [])
+
+
+class IdempotencyTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user('retry', Address='HN', email='retry@example.com')
+        self.client.force_authenticate(self.user)
+        self.variant = create_catalog()[0]
+        self.payload = {'variant_id': self.variant.id, 'quantity': 1, 'ship_address': 'HN', 'payment': 'COD'}
+
+    def order(self, key, **changes):
+        return self.client.post('/order/', {**self.payload, **changes}, format='json',
+                                headers={idempotency.HEADER: key})
+
+    def test_retries_replay_the_first_response(self):
+        first = self.order('k1')
+        self.assertEqual(first.status_code, 201)
+        retry = self.order('k1')
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.filter(User=self.user).count(), 1)
+
+        self.assertEqual(self.order('k1', quantity=2).status_code, 422)
+        self.assertEqual(self.order('k2').status_code, 201)
+        self.assertEqual(Order.objects.filter(User=self.user).count(), 2)
+
+    def test_key_in_progress_is_rejected(self):
+        request = mock.Mock(method='POST', path='/order/', data=self.payload)
+        IdempotencyKey.objects.create(User=self.user, Key='busy', Fingerprint=idempotency.request_fingerprint(request),
+                                      ExpiresAt=timezone.now() + timedelta(hours=1))
+        response = self.order('busy')
+        self.assertEqual((response.status_code, response.headers['Retry-After']), (409, '1'))
+        self.assertFalse(Order.objects.exists())
+
+    def test_failures_after_the_order_is_saved_replay_it(self):
+        from . import views
+        place_order = views.place_order
+
+        def fail_after_saving(*args, **kwargs):
+            place_order(*args, **kwargs)
+            raise RuntimeError('payment gateway down')
+
+        with mock.patch.object(views, 'place_order', fail_after_saving):
+            with self.assertRaises(RuntimeError):
+                self.order('k1')
+        # Đơn đã commit cùng response: thử lại nhận lại đơn đó, không tạo đơn thứ hai
+        order = Order.objects.get()
+        retry = self.order('k1')
+        self.assertEqual((retry.status_code, retry.json()['id']), (201, order.id))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failures_before_the_order_is_saved_release_the_key(self):
+        Variant.objects.filter(id=self.variant.id).update(Quantity=0)
+        self.assertEqual(self.order('k1').status_code, 400)
+        Variant.objects.filter(id=self.variant.id).update(Quantity=10)
+        self.assertEqual(self.order('k1').status_code, 201)
+
+    def test_payment_gateway_is_called_outside_the_order_transaction(self):
+        outer = len(connection.atomic_blocks)
+        depth = []
+
+        def momo(amount):
+            depth.append(len(connection.atomic_blocks) - outer)
+            return {'resultCode': 0, 'payUrl': 'https://pay.example/1'}
+
+        with mock.patch('apiphoneshop.momo_payment.create_momo_payment', momo):
+            response = self.order('k1', payment='MoMo')
+        self.assertEqual((response.status_code, depth), (201, [0]))
+        self.assertEqual(self.order('k1', payment='MoMo').json()['short_link'], 'https://pay.example/1')
+
+
+@override_settings(REPLICA_DATABASES=[], COOCCURRENCE_TOP_K=2)
+class RecommendationTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.variants = create_catalog(products=4)
+        self.products = [variant.Product_id for variant in self.variants]
+
+    def buy(self, user, *indexes):
+        # Mỗi đơn một sản phẩm như OrderViewSet.create, cập nhật bảng như on_commit của place_order
+        for i in indexes:
+            order = Order.objects.create(User=user, ShipAddress='HN', ShipDate=timezone.now())
+            OrderDetail.objects.create(Order=order, Variant=self.variants[i], Quantity=1, Price=1000,
+                                       Status='Pending')
+            recommendations.record_order(order)
+
+    def table(self):
+        return {(row.Product_id, row.Related_id): row.Count for row in ProductCooccurrence.objects.all()}
+
+    def test_incremental_updates_match_rebuild(self):
+        with self.settings(COOCCURRENCE_TOP_K=10):
+            self.buy(User.objects.create_user('a', Address='HN'), 0, 1, 2)
+            self.buy(User.objects.create_user('b', Address='HN'), 0, 1, 1)
+            incremental = self.table()
+            self.assertEqual(incremental[self.products[0], self.products[1]], 2)
+            recommendations.rebuild()
+            self.assertEqual(self.table(), incremental)
+
+    def test_each_order_keeps_only_the_top_k(self):
+        self.buy(User.objects.create_user('a', Address='HN'), 0, 1, 2)
+        self.buy(User.objects.create_user('b', Address='HN'), 0, 2)
+        self.buy(User.objects.create_user('c', Address='HN'), 0, 3)
+        counts = ProductCooccurrence.objects.values('Product_id').annotate(n=Count('id')).values_list('n', flat=True)
+        self.assertLessEqual(max(counts), 2)
+        # Sản phẩm 0: 2 (lần 2) rồi 1 (id nhỏ hơn trong các cặp cùng số lần)
+        self.assertEqual([row.Related_id for row in recommendations.bought_together(self.products[0])],
+                         [self.products[2], self.products[1]])
+        self.assertEqual(recommendations.prune(), 0)
+
+    def test_endpoint_lists_related_products(self):
+        self.buy(User.objects.create_user('a', Address='HN'), 0, 1)
+        response = self.client.get(f'/products/{self.products[0]}/bought-together/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item['Product']['id'], item['Count']) for item in response.json()], [(self.products[1], 1)])
+
+
+@override_settings(REPLICA_DATABASES=[])
+class SimilarProductsTests(TestCase):
+    client_class = APIClient
+
+    def test_nearest_neighbours_match_brute_force(self):
+        features = np.random.default_rng(0).normal(size=(700, 12)).astype(np.float32)
+        exact = np.linalg.norm(features[:, None, :].astype(np.float64) - features[None, :, :], axis=2)
+        np.fill_diagonal(exact, np.inf)
+        expected = np.argsort(exact, axis=1, kind='stable')[:, :5]
+        # sample nhỏ để dùng ngưỡng lấy mẫu, batch_size không chia hết n để có lô cuối ngắn hơn
+        for sample in (64, 2048):
+            indices, distances = similarity.nearest_neighbours(features, 5, batch_size=128, sample=sample)
+            np.testing.assert_array_equal(indices, expected)
+            np.testing.assert_allclose(distances, np.take_along_axis(exact, expected, axis=1), rtol=1e-4, atol=1e-3)
+
+    def test_small_inputs(self):
+        indices, distances = similarity.nearest_neighbours(np.zeros((1, 3), dtype=np.float32), 5)
+        self.assertEqual((indices.shape, distances.shape), ((1, 0), (1, 0)))
+        indices, _ = similarity.nearest_neighbours(np.array([[0.0], [1.0], [3.0]], dtype=np.float32), 5)
+        self.assertEqual(indices.tolist(), [[1, 2], [0, 2], [1, 0]])
+
+    def test_specs_are_parsed_from_free_form_json(self):
+        self.assertEqual(similarity.parse_spec('8 GB', 'ram'), 8)
+        self.assertEqual(similarity.parse_spec('1TB', 'storage'), 1024)
+        self.assertEqual(similarity.parse_spec('48MP + 12MP + 12MP', 'camera'), 48)
+        self.assertEqual(similarity.parse_spec('6,1 inch', 'screen'), 6.1)
+        self.assertTrue(np.isnan(similarity.parse_spec(True, 'ram')))
+        self.assertEqual(similarity.chipset_family({'chip': 'Apple A17 Pro'}), 0)
+
+    def test_endpoint_returns_closest_products(self):
+        variants = create_catalog(products=3)
+        specs = [{'RAM': '8GB', 'Pin': '5000 mAh'}, {'RAM': '8 GB', 'Pin': '4900mAh'}, {'RAM': '2GB', 'Pin': '3000 mAh'}]
+        for variant, spec, price in zip(variants, specs, (1000, 1100, 200)):
+            Product.objects.filter(id=variant.Product_id).update(TechnicalSpecifications=spec)
+            Variant.objects.filter(id=variant.id).update(Price=price)
+        self.assertEqual(similarity.rebuild(k=2), 6)
+
+        response = self.client.get(f'/products/{variants[0].Product_id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['Product']['id'] for item in response.json()],
+                         [variants[1].Product_id, variants[2].Product_id])
@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, UserViewSet, CartViewSet, VariantViewSet, OrderViewSet, CommentViewSet
+from . import async_views
+from .views import ProductViewSet, UserViewSet, CartViewSet, VariantViewSet, OrderViewSet, CommentViewSet, \
+    SyncViewSet, ProfileViewSet
 
 router = DefaultRouter()
 router.register('products', ProductViewSet)
@@ -9,7 +11,18 @@ router.register('cart', CartViewSet)
 router.register('variants', VariantViewSet)
 router.register('order', OrderViewSet)
 router.register('cmt', CommentViewSet)
+router.register('sync', SyncViewSet, basename='sync')
+router.register('profiles', ProfileViewSet, basename='profile')
+
+# Các endpoint đọc catalog bản async, dùng khi chạy dưới ASGI (phoneshop.asgi)
+async_urlpatterns = [
+    path('products/', async_views.product_list, name='async-product-list'),
+    path('products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('variants/<int:pk>/', async_views.variant_detail, name='async-variant-detail'),
+    path('cmt/', async_views.comment_list, name='async-comment-list'),
+]
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/', include(async_urlpatterns)),
 ]
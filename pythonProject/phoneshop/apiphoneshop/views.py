@@ -1,34 +1,123 @@
-from datetime import timezone, datetime
+import uuid
+from collections import Counter
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import send_mail
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Prefetch, Sum
+from django.db.models.functions import ExtractMonth
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from rest_framework import viewsets, status
 from rest_framework import permissions, generics
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 
-from .models import Product, Variant, Brand, ListImg, User, Cart, CartItem, Order, OrderDetail, Discount, Comment
-from .momo_payment import create_momo_payment
+from . import admission, bulk_edit, idempotency, pricing, profiling, read_plans, retention, sync
+from .analytics import top_sellers
+from .db_router import ReplicaReadMixin, PrimaryStickyWriteMixin
+from .idempotency import idempotent
+from .inventory import InsufficientStock, lock_variant, reserve, release
+from .models import Product, Variant, Brand, ListImg, User, Cart, CartItem, Order, OrderDetail, Comment, \
+    OrderTicket, ArchivedOrder, ArchivedOrderDetail
+from .orders import place_order
+from .pagination import CommentFeedPagination, OrderHistoryPagination, filter_comment_feed
 from .permission import IsAdminOrOwner, IsOwnerOrReadOnly
-from .serializers import ProductSerializer, VariantSerializer, CreateProductSerializer, UserSerializer, CartSerializer, \
-    OrderSerializer, PlaceOrderSerializer, CommentSerializer
+from .recommendations import bought_together
+from .serializers import ProductSerializer, ProductListSerializer, VariantSerializer, CreateProductSerializer, UserSerializer, CartSerializer, \
+    OrderSerializer, PlaceOrderSerializer, CommentSerializer, OrderTicketSerializer, BoughtTogetherSerializer, \
+    SimilarProductSerializer, OrderHistorySerializer, SalesAnalyticsQuerySerializer, BulkPriceSerializer, \
+    BulkStockSerializer, CommentFeedQuerySerializer, CartQuoteQuerySerializer
+from .similarity import similar_products
+from .snapshot import read_manifest
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
+    replica_actions = ('list', 'retrieve', 'bought_together', 'similar')
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Description có thể tới hàng trăm KB HTML, danh sách chỉ cần Excerpt
+            return queryset.select_related('Brand').prefetch_related('images', 'variants').defer('Description')
+        if self.action == 'retrieve':
+            return queryset.select_related('Brand').prefetch_related('images', 'variants')
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return CreateProductSerializer
+        if self.action == 'list':
+            return ProductListSerializer
         return ProductSerializer
 
+    def list(self, request, *args, **kwargs):
+        if not read_plans.enabled():
+            return super().list(request, *args, **kwargs)
+        return Response(read_plans.product_list(self.filter_queryset(self.get_queryset())))
+
+    @action(detail=True, methods=['get'], url_path='bought-together')
+    def bought_together(self, request, pk=None):
+        # Một truy vấn trên index (Product, -Count) của bảng đã tính sẵn
+        return Response(BoughtTogetherSerializer(bought_together(pk), many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request):
+        # Manifest của ảnh chụp catalog; file JSON (kèm .gz/.br) do web server trả trực tiếp
+        manifest = read_manifest()
+        if manifest is None:
+            return Response({"detail": "Catalog snapshot has not been built yet."}, status=status.HTTP_404_NOT_FOUND)
+        response = Response(manifest)
+        patch_cache_control(response, public=True, max_age=60)
+        return response
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        # Kết quả tính sẵn bởi lệnh build_similar_products
+        return Response(SimilarProductSerializer(similar_products(pk), many=True).data)
+
+
+class SyncViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.AllowAny]
+
+    @action(detail=False, methods=['get'])
+    def catalog(self, request):
+        # Thay đổi của catalog kể từ cursor `since` (lấy từ lần gọi trước hoặc từ manifest ảnh chụp)
+        try:
+            changes, cursor, has_more = sync.changes(request.query_params.get('since'))
+        except sync.InvalidCursor as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except sync.ExpiredCursor as e:
+            return Response({"detail": str(e)}, status=status.HTTP_410_GONE)
+        return Response({'changes': changes, 'cursor': cursor, 'has_more': has_more})
+
+
+class ProfileViewSet(viewsets.ViewSet):
+    # Các lần profile do ProfilingMiddleware ghi lại, mới nhất trước
+    permission_classes = [permissions.IsAdminUser]
+    lookup_value_regex = r'[0-9A-Za-z-]+'
+
+    def list(self, request):
+        return Response(profiling.list_profiles())
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        # ?kind=pstats (mặc định) hoặc ?kind=collapsed
+        path = profiling.profile_path(pk, request.query_params.get('kind', 'pstats'))
+        if path is None:
+            return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
+
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -64,7 +153,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return response
 
 
-class CartViewSet(viewsets.ModelViewSet):
+class CartViewSet(PrimaryStickyWriteMixin, viewsets.ModelViewSet):
     serializer_class = CartSerializer
     queryset = Cart.objects.all()
     permission_classes = [permissions.IsAuthenticated]
@@ -78,12 +167,36 @@ class CartViewSet(viewsets.ModelViewSet):
         cart, created = Cart.objects.get_or_create(User=self.request.user)
         return cart
 
+    @action(detail=False, methods=['get'])
+    def quote(self, request):
+        # Báo giá giỏ hàng hiện tại (có thể kèm mã giảm giá) với cùng cách tính như khi đặt hàng
+        query = CartQuoteQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        items = CartItem.objects.filter(Cart__User=request.user).order_by('id').values_list('Variant_id', 'Quantity')
+        try:
+            data = pricing.quote([(variant_id, quantity or 0) for variant_id, quantity in items],
+                                 query.validated_data.get('discount_code'))
+        except pricing.InvalidDiscount as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
     @action(detail=False, methods=['post'], url_path='add-to-cart')
+    @idempotent
     def add_to_cart(self, request):
         # Thêm sản phẩm vào giỏ hàng
         variant_id = request.data.get('variant_id')
         quantity = request.data.get('quantity', 1)
 
+        # Kiểm tra và ép kiểu quantity thành số nguyên
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            return Response({'error': 'Số lượng phải là một số nguyên hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Kiểm tra số lượng có hợp lệ
+        if quantity < 1:
+            return Response({'error': 'Số lượng phải lớn hơn hoặc bằng 1.'}, status=status.HTTP_400_BAD_REQUEST)
+
         # Kiểm tra xem variant có tồn tại hay không
         try:
             variant = Variant.objects.get(id=variant_id)
@@ -91,31 +204,46 @@ class CartViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Biến thể sản phẩm không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
 
         cart = self.get_cart()
-        # Kiểm tra nếu sản phẩm đã có trong giỏ hàng
-        cart_item, created = CartItem.objects.get_or_create(Cart=cart, Variant=variant)
-
-        if not created:
-            # Nếu sản phẩm đã có, tăng số lượng
-            cart_item.Quantity += int(quantity)
-        else:
-            cart_item.Quantity = int(quantity)
-        cart_item.save()
+        try:
+            with transaction.atomic():
+                # Khóa dòng Variant trước khi đọc số lượng trong giỏ (cùng thứ tự khóa với reserve/consume):
+                # hai request thêm cùng variant chạy tuần tự, không mất số lượng của nhau
+                lock_variant(variant.id)
+                # Kiểm tra nếu sản phẩm đã có trong giỏ hàng
+                cart_item = CartItem.objects.filter(Cart=cart, Variant=variant).first()
+
+                if cart_item:
+                    # Nếu sản phẩm đã có, tăng số lượng
+                    new_quantity = (cart_item.Quantity or 0) + quantity
+                else:
+                    new_quantity = quantity
+
+                # Giữ chỗ tồn kho cho toàn bộ số lượng của variant trong giỏ
+                reserve(cart, variant.id, new_quantity)
+                # (Cart, Variant) là unique: request đồng thời cho cùng variant cập nhật chung một dòng
+                CartItem.objects.update_or_create(Cart=cart, Variant=variant, defaults={'Quantity': new_quantity})
+        except InsufficientStock as e:
+            return Response({'error': 'Không đủ hàng trong kho.', 'available': e.available},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'success': 'Sản phẩm đã được thêm vào giỏ hàng.'}, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['post'], url_path='remove-from-cart')
+    @idempotent
     def remove_from_cart(self, request):
         # Xóa sản phẩm khỏi giỏ hàng
         cart_item_id = request.data.get('cart_item_id')
         cart = self.get_cart()
         try:
             cart_item = CartItem.objects.get(Cart=cart, id=cart_item_id)
+            release(cart, cart_item.Variant_id)
             cart_item.delete()
             return Response({'success': 'Sản phẩm đã được xóa khỏi giỏ hàng.'}, status=status.HTTP_204_NO_CONTENT)
         except CartItem.DoesNotExist:
             return Response({'error': 'Sản phẩm không có trong giỏ hàng.'}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=False, methods=['patch'], url_path='update-quantity')
+    @idempotent
     def update_quantity(self, request):
         variant_id = request.data.get('variant_id')
         quantity = request.data.get('quantity')
@@ -138,143 +266,133 @@ class CartViewSet(viewsets.ModelViewSet):
 
         cart = self.get_cart()
         try:
-            cart_item = CartItem.objects.get(Cart=cart, Variant=variant)
-            cart_item.Quantity = quantity
-            cart_item.save()
+            with transaction.atomic():
+                # Cùng thứ tự khóa với add_to_cart: giữ chỗ và số lượng trong giỏ đổi cùng nhau
+                lock_variant(variant.id)
+                cart_item = CartItem.objects.get(Cart=cart, Variant=variant)
+                reserve(cart, variant.id, quantity)
+                cart_item.Quantity = quantity
+                cart_item.save()
             return Response({'success': 'Số lượng sản phẩm đã được cập nhật.'}, status=status.HTTP_200_OK)
         except CartItem.DoesNotExist:
             return Response({'error': 'Sản phẩm không có trong giỏ hàng.'}, status=status.HTTP_404_NOT_FOUND)
+        except InsufficientStock as e:
+            return Response({'error': 'Không đủ hàng trong kho.', 'available': e.available},
+                            status=status.HTTP_400_BAD_REQUEST)
 
 
-class VariantViewSet(viewsets.ReadOnlyModelViewSet):
+class VariantViewSet(ReplicaReadMixin, PrimaryStickyWriteMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Variant.objects.all()
     serializer_class = VariantSerializer
 
     def get_permissions(self):
+        if self.action in ['bulk_price', 'bulk_stock']:
+            return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
     def get_queryset(self):
         # Trả về queryset chỉ chứa Variant có id phù hợp với tham số id trong URL
         variant_id = self.kwargs.get('pk')  # pk là tham số mặc định đại diện cho id trong URL
-        return Variant.objects.filter(id=variant_id)
+        return Variant.objects.filter(id=variant_id).select_related('Product').defer('Product__Description')
 
     def retrieve(self, request, *args, **kwargs):
         # Override phương thức retrieve để trả về kết quả theo id (pk)
         return super().retrieve(request, *args, **kwargs)
 
+    @action(detail=False, methods=['post'], url_path='bulk-price')
+    def bulk_price(self, request):
+        # Đổi giá hàng loạt bằng UPDATE theo lô, dry_run=true chỉ trả về bản xem trước
+        params = BulkPriceSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        result = bulk_edit.reprice(params.variants(), data['field'], data['mode'], data['value'],
+                                   dry_run=data['dry_run'])
+        return Response(result)
+
+    @action(detail=False, methods=['post'], url_path='bulk-stock')
+    def bulk_stock(self, request):
+        # Nhập tồn kho từ CSV (sku/id, quantity): mode=set đặt lại, mode=adjust cộng/trừ
+        params = BulkStockSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        try:
+            key, rows, errors = bulk_edit.parse_stock_csv(data['csv'])
+        except bulk_edit.BulkEditError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if errors:
+            return Response({"detail": "CSV contains invalid rows.", "errors": errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(bulk_edit.import_stock(rows, key=key, mode=data['mode'], dry_run=data['dry_run']))
+
 
-class OrderViewSet(viewsets.ViewSet, generics.CreateAPIView):
+class OrderViewSet(PrimaryStickyWriteMixin, viewsets.ViewSet, generics.CreateAPIView):
     queryset = Order.objects.all()
+    pagination_class = OrderHistoryPagination
 
     def get_permissions(self):
         if self.action == 'check_order':
             return [permissions.AllowAny()]
-        elif self.action == 'revenue_year':
+        elif self.action in ['revenue_year', 'sales_analytics']:
             return [permissions.IsAdminUser()]
         return [permissions.IsAuthenticated()]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = PlaceOrderSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = request.user
-        variant_id = serializer.validated_data['variant_id']
-        quantity = serializer.validated_data['quantity']
-        discount_code = serializer.validated_data.get('discount_code')
-        ship_address = serializer.validated_data['ship_address']
-        payment = serializer.validated_data['payment']
-
-        # Fetch variant
-        variant = get_object_or_404(Variant, id=variant_id)
-
-        if variant.Quantity < quantity:
-            return Response({"detail": "Not enough stock for this variant."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Calculate total price
-        if variant.CompareAtPrice:
-            price = variant.CompareAtPrice * quantity
-        else:
-            price = variant.Price * quantity
-
-        # Fetch discount if provided
-        discount = None
-        if discount_code:
-            discount = Discount.objects.filter(Code=discount_code, StartDate__lte=datetime.now(),
-                                               EndDate__gte=datetime.now()).first()
-            if not discount:
-                return Response({"detail": "Invalid or expired discount code."}, status=status.HTTP_400_BAD_REQUEST)
-
-            if discount.DiscountPercent:
-                price -= price * (discount.DiscountPercent / 100)
-            elif discount.DiscountMoney:
-                price -= discount.DiscountMoney
-
-        # Ensure price is not negative
-        price = max(price, 0)
-
-        # Create Order
-        order = Order.objects.create(
-            User=user,
-            Discount=discount,
-            ShipAddress=ship_address,
-            ShipDate=request.data.get('ship_date', datetime.now()),
-            Payment=payment
-        )
-
-        # Create OrderDetail
-        order_detail = OrderDetail.objects.create(
-            Order=order,
-            Variant=variant,
-            Quantity=quantity,
-            Price=price,
-            Status='Pending'
-        )
-        if payment == 'MoMo':
-            momo_response = create_momo_payment(
-                amount=(int)(price)
-            )
-            if isinstance(momo_response, dict):
-                if momo_response.get('resultCode') == 0:
-                    short_link = momo_response.get('payUrl')
-                    order.short_link = short_link
-                    order_detail.Status = "Done"
-                    order_detail.save()
-
-        # Decrease variant stock
-        variant.Quantity -= quantity
-        variant.save()
-
-        # send mail to customer
-        subject = "Order Confirmation"
-        message = (
-            f"Dear {user.username},\n\n"
-            f"Thank you for your order!\n\n"
-            f"Order Details:\n"
-            f"- Order ID: {order.id}\n"
-            f"- Product: {variant.Product.Name}\n"
-            f"- Variant: {variant.SKU}\n"
-            f"- Quantity: {quantity}\n"
-            f"- Total Price: ${price:.2f}\n\n"
-            f"Shipping to: {ship_address}\n"
-            f"Payment Method: {payment}\n\n"
-            f"Best regards,\nYour Store Team"
-        )
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
-
-        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+        order_data = dict(serializer.validated_data, ship_date=request.data.get('ship_date'))
+        record_response = self.record_response(request)
+        if not admission.enabled():
+            order = place_order(request.user, **order_data, on_created=record_response)
+            return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+        # Chế độ flash sale: giới hạn số đơn xử lý đồng thời cho mỗi variant
+        if admission.try_acquire(order_data['variant_id']):
+            try:
+                order = place_order(request.user, **order_data, on_created=record_response)
+            finally:
+                admission.release(order_data['variant_id'])
+            return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+        ticket = admission.enqueue(request.user, order_data)
+        if ticket is None:
+            return Response({"detail": "Too many orders right now, please retry later."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={'Retry-After': str(admission.admission_settings()['RETRY_AFTER'])})
+        data = OrderTicketSerializer(ticket).data
+        data['poll_url'] = request.build_absolute_uri(reverse('order-ticket', kwargs={'ticket_id': ticket.id}))
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+    def record_response(self, request):
+        def on_created(order):
+            # Response được lưu cùng transaction với đơn: thử lại sau khi đơn đã commit không tạo đơn thứ hai,
+            # kể cả khi phần sau của request (gọi MoMo) lỗi
+            if idempotency.pending(request):
+                order.refresh_from_db(fields=['Total', 'ItemCount', 'Status'])
+                idempotency.complete(request, status.HTTP_201_CREATED, OrderSerializer(order).data)
+        return on_created
+
+    @action(detail=False, methods=['get'], url_path=r'tickets/(?P<ticket_id>[0-9]+)', url_name='ticket')
+    def ticket(self, request, ticket_id=None):
+        ticket = get_object_or_404(OrderTicket, id=ticket_id, User=request.user)
+        return Response(OrderTicketSerializer(ticket).data)
 
     @action(detail=False, methods=['get'], url_path='my-orders')
     def my_orders(self, request):
+        # Số query cố định cho mỗi trang: đếm, danh sách đơn, OrderDetail kèm Variant và Product
+        # Đơn đã lưu trữ nối tiếp sau các đơn ở bảng chính (xem apiphoneshop.retention)
         user = request.user
-        orders = Order.objects.filter(User=user).prefetch_related('order_details')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        orders = [model.objects.filter(User=user).order_by('-created_date', '-id')
+                  .prefetch_related(Prefetch('order_details',
+                                             queryset=detail_model.objects.select_related('Variant__Product')
+                                             .defer('Variant__Product__Description')))
+                  for model, detail_model in [(Order, OrderDetail), (ArchivedOrder, ArchivedOrderDetail)]]
+        if not read_plans.enabled():
+            page = self.paginate_queryset(retention.OrderHistory(*orders))
+            return self.get_paginated_response(OrderHistorySerializer(page, many=True).data)
+        page = self.paginate_queryset(retention.OrderHistory(*map(read_plans.order_history_queryset, orders)))
+        return self.get_paginated_response(read_plans.order_history(page))
 
     @action(detail=False, methods=['post'], url_path='check-order')
     def check_order(self, request):
@@ -285,7 +403,7 @@ class OrderViewSet(viewsets.ViewSet, generics.CreateAPIView):
             return Response({"detail": "Phone number and order code are required."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Fetch the order
-        order = Order.objects.filter(User__Phone_number=phone_number, id=order_code).first()
+        order = retention.find_order(User__Phone_number=phone_number, id=order_code)
 
         if not order:
             return Response({"detail": "Order not found or phone number does not match."},
@@ -306,30 +424,101 @@ class OrderViewSet(viewsets.ViewSet, generics.CreateAPIView):
         except ValueError:
             return Response({"detail": "Year must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
 
-        revenue_data = []
-
-        for month in range(1, 13):
-            orders = OrderDetail.objects.filter(Order__ShipDate__year=year, Order__ShipDate__month=month)
-            total_revenue = sum(order.Price * order.Quantity for order in orders)
-            revenue_data.append({"month": month, "revenue": total_revenue})
+        # Một truy vấn GROUP BY tháng cho mỗi bảng; __year được dịch thành khoảng ShipDate nên dùng order_shipdate_idx
+        monthly = Counter()
+        for details in retention.order_details(Order__ShipDate__year=year):
+            rows = (details.annotate(month=ExtractMonth('Order__ShipDate')).values('month').order_by()
+                    .annotate(revenue=Sum(F('Price') * F('Quantity'))))
+            for row in rows:
+                monthly[row['month']] += row['revenue']
+        revenue_data = [{"month": month, "revenue": monthly[month]} for month in range(1, 13)]
 
         return Response({"year": year, "monthly_revenue": revenue_data}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], url_path='sales-analytics')
+    def sales_analytics(self, request):
+        # Top variant/brand/màu/bộ nhớ trong khoảng ngày, chỉ đọc bảng tổng hợp DailyVariantSales
+        query = SalesAnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(top_sellers(**query.validated_data))
+
 
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+COMMENT_FEED_KEY = 'comments:variant:%s:first:%s'
+COMMENT_FEED_VERSION_KEY = 'comments:variant:%s:version'
+
+
+class CommentViewSet(ReplicaReadMixin, PrimaryStickyWriteMixin, viewsets.ModelViewSet):
+    """
+    /cmt/?variant=<id> hoặc /cmt/?product=<id>: bình luận mới nhất trước, phân trang bằng cursor.
+    Trang đầu của mỗi variant (không có tham số nào khác) được cache theo phiên bản của variant; phiên bản đổi
+    sau khi thay đổi bình luận được commit, nên trang cũ do một request chạy song song ghi vào không bao giờ được đọc.
+    """
+    queryset = Comment.objects.select_related('User')
     serializer_class = CommentSerializer
+    pagination_class = CommentFeedPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    replica_actions = ('list',)
+
+    def feed_filters(self):
+        query = CommentFeedQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        return query.validated_data
+
+    def cached_variant(self):
+        """id variant nếu request là trang đầu của feed một variant, None nếu không."""
+        if self.action == 'list' and set(self.request.query_params) == {'variant'}:
+            return self.feed_filters()['variant']
+        return None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        queryset = filter_comment_feed(queryset, self.feed_filters())
+        if self.cached_variant() is not None:
+            # Trang sắp được cache đọc từ primary: replica trễ có thể đưa lại bình luận vừa xóa vào cache
+            queryset = queryset.using(DEFAULT_DB_ALIAS)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        variant = self.cached_variant()
+        if variant is None:
+            return super().list(request, *args, **kwargs)
+        # Lấy phiên bản trước khi đọc database: trang đọc trước một thay đổi chỉ được lưu dưới phiên bản cũ
+        version = self.feed_version(variant)
+        key = COMMENT_FEED_KEY % (variant, version)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, getattr(settings, 'COMMENT_FEED_CACHE_SECONDS', 5 * 60))
+        return Response(data)
+
+    def feed_version(self, variant):
+        key = COMMENT_FEED_VERSION_KEY % variant
+        version = cache.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        return version
+
+    def forget_first_page(self, *variant_ids):
+        keys = [COMMENT_FEED_VERSION_KEY % variant_id for variant_id in set(variant_ids)]
+        transaction.on_commit(lambda: cache.delete_many(keys))
 
     def perform_create(self, serializer):
-        serializer.save(User=self.request.user)
+        comment = serializer.save(User=self.request.user)
+        self.forget_first_page(comment.Variant_id)
 
     def perform_update(self, serializer):
         if not self.get_object().User == self.request.user:
             raise PermissionDenied("You do not have permission to edit this comment.")
-        serializer.save()
+        old_variant = serializer.instance.Variant_id
+        comment = serializer.save()
+        self.forget_first_page(old_variant, comment.Variant_id)
 
     def perform_destroy(self, instance):
         if not instance.User == self.request.user:
             raise PermissionDenied("You do not have permission to delete this comment.")
         instance.delete()
+        self.forget_first_page(instance.Variant_id)
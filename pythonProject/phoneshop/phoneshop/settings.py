@@ -47,12 +47,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apiphoneshop.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apiphoneshop.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'phoneshop.urls'
@@ -87,7 +89,31 @@ WSGI_APPLICATION = 'phoneshop.wsgi.application'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
-    )
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'apiphoneshop.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'apiphoneshop.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Nén response JSON/CSS/JS lớn hơn MIN_SIZE byte (xem apiphoneshop.middleware)
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+}
+
+# Profile request của staff gửi header X-Profile hoặc lấy mẫu theo action, xem tại /profiles/ (xem apiphoneshop.profiling)
+PROFILING = {
+    'ENABLED': True,
+    'SAMPLE_RATES': {},
+    'DIR': os.path.join(BASE_DIR, 'profiles'),
+    'KEEP': 50,
 }
 
 # Database
@@ -103,6 +129,32 @@ DATABASES = {
     }
 }
 
+# Read replica: khai báo thêm alias trong DATABASES rồi liệt kê ở REPLICA_DATABASES
+DATABASE_ROUTERS = ['apiphoneshop.db_router.ReplicaRouter']
+REPLICA_DATABASES = []
+# Số giây người dùng được ghim vào primary sau khi ghi (giỏ hàng, đơn hàng, bình luận)
+REPLICA_PIN_SECONDS = 10
+# Chu kỳ kiểm tra lại kết nối tới từng replica
+REPLICA_HEALTH_CHECK_INTERVAL = 5
+
+# Cache dùng chung cho mọi worker (ghim primary sau khi ghi, ảnh chụp catalog, flash sale, bình luận, giá...):
+# mặc định là bảng trong database (chạy `python manage.py createcachetable` khi deploy), đặt REDIS_URL để dùng Redis.
+# Không dùng LocMemCache: mỗi process có một bản riêng nên worker này không thấy thay đổi của worker khác.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -144,14 +196,92 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-import cloudinary
+# Changelist admin dùng số dòng ước lượng khi bảng không lọc vượt quá ngưỡng này
+ADMIN_COUNT_ESTIMATE_THRESHOLD = 10000
+
+# Thời gian (giây) giữ chỗ tồn kho cho sản phẩm trong giỏ hàng
+CART_RESERVATION_TTL = 15 * 60
+
+# Giới hạn số đơn hàng xử lý đồng thời cho mỗi variant, phần vượt quá vào hàng đợi (xem apiphoneshop.admission).
+# Khi bật cần cache dùng chung có incr nguyên tử (Redis/Memcached)
+ORDER_ADMISSION = {
+    'ENABLED': False,
+    'MAX_INFLIGHT_PER_VARIANT': 8,
+    'MAX_QUEUE': 5000,
+    'SLOT_TIMEOUT': 60,
+    'RETRY_AFTER': 5,
+    'STALE_AFTER': 10 * 60,
+}
+
+# Thời gian (giây) lưu response cho mỗi Idempotency-Key
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Số sản phẩm "thường được mua cùng" giữ lại cho mỗi sản phẩm
+COOCCURRENCE_TOP_K = 20
+
+# Số điện thoại tương tự (theo thông số kỹ thuật và giá) giữ lại cho mỗi sản phẩm
+SIMILAR_PRODUCTS_TOP_K = 10
 
-cloudinary.config(
-    cloud_name="dqsw7jfw4",
-    api_key="775723474445265",
-    api_secret="YSKnMr-cRHmlTudOiNyOFge1GVA",
-    api_proxy="http://proxy.server:3128"
-)
+# Cache giá variant và mã giảm giá dùng cho đặt hàng và /cart/quote/ (xem apiphoneshop.pricing)
+PRICING = {
+    'CACHE_SECONDS': 5 * 60,
+}
+
+# Danh sách sản phẩm, ảnh chụp catalog và lịch sử đơn hàng dựng JSON từ values_list() thay vì ModelSerializer
+# (xem apiphoneshop.read_plans); False để dùng lại serializer
+FAST_LIST_SERIALIZATION = True
+
+# Độ dài (ký tự) của Product.Excerpt, trả về thay cho Description trong danh sách sản phẩm
+PRODUCT_EXCERPT_LENGTH = 300
+# Lọc HTML của Description (bỏ script, on*, javascript:...) trước khi trả về ở trang chi tiết, kết quả được cache
+PRODUCT_DESCRIPTION_SANITIZE = False
+PRODUCT_DESCRIPTION_CACHE_SECONDS = 60 * 60
+
+# Thời gian cache trang đầu bình luận của mỗi variant (/cmt/?variant=<id>), bị xóa khi có bình luận thay đổi
+COMMENT_FEED_CACHE_SECONDS = 5 * 60
+
+# Ảnh chụp catalog nén sẵn, phục vụ trực tiếp bởi web server (xem apiphoneshop.snapshot)
+CATALOG_SNAPSHOT = {
+    'DIR': os.path.join(MEDIA_ROOT, 'catalog'),
+    'URL': MEDIA_URL + 'catalog/',
+    'DEBOUNCE': 30,
+    'MAX_DELAY': 300,
+    'KEEP': 3,
+    'REFRESH': 6 * 60 * 60,
+}
+
+# Feed đồng bộ /sync/catalog/ (xem apiphoneshop.sync)
+SYNC_CATALOG = {
+    'PAGE_SIZE': 500,
+    'LAG': 5,
+    'TOMBSTONE_DAYS': 30,
+}
+
+# Lệnh apply_retention: xóa giỏ hàng bỏ quên và chuyển đơn hàng cũ sang bảng lưu trữ (xem apiphoneshop.retention)
+ORDER_RETENTION = {
+    'CART_IDLE_DAYS': 30,
+    'ARCHIVE_AFTER_DAYS': 365,
+    'BATCH_SIZE': 1000,
+}
+
+# Ảnh ListImg/Variant được lưu cục bộ rồi tải lên Cloudinary bởi lệnh process_image_uploads (xem apiphoneshop.images)
+IMAGE_INGEST = {
+    'ENABLED': True,
+    'UPLOADER': 'cloudinary.uploader.upload',
+    'WORKERS': 4,
+    'BATCH_SIZE': 32,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 30,
+    'THUMBNAIL_SIZE': (320, 320),
+}
+
+# cloudinary đọc CLOUDINARY khi được import lần đầu (qua CloudinaryField), settings không cần import cloudinary
+CLOUDINARY = {
+    'cloud_name': "dqsw7jfw4",
+    'api_key': "775723474445265",
+    'api_secret': "YSKnMr-cRHmlTudOiNyOFge1GVA",
+    'api_proxy': "http://proxy.server:3128",
+}
 
 Client_id = "aytZMoJ2eOP93EFCdVzPQyHkwmbS1ruE7R5tttzt"
 Client_secret = "eQc8PAdZwLjgGS3s4KNu3qvRDGPQNEAQz2X7rKDtrwfccOX16SWzyJw1actmf7LksFqGtKK9yIXjbRFYE4bRAkXR0VcttoJGTlxpX2tUka36jGBB1DoFLaH9UHpsEE1B"
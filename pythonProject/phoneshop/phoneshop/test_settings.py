@@ -0,0 +1,37 @@
+"""
+Settings for running the test suite locally without MySQL:
+
+    python manage.py test --settings=phoneshop.test_settings
+
+Uses two separate SQLite databases so the read-replica router can be exercised.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-replica.sqlite3',
+    },
+}
+
+REPLICA_DATABASES = ['replica']
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Test chạy trong một process nên LocMemCache đóng vai cache dùng chung (và không thêm query vào các test đếm query).
+# Alias 'database' chỉ để test runner tạo bảng django_cache cho các test dùng DatabaseCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'database': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    },
+}